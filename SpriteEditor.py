@@ -7,7 +7,7 @@
 # WARNING! All changes made in this file will be lost!
 
 from PyQt5 import QtGui, QtWidgets
-from PyQt5.QtCore import QPoint, QSize, QRect
+from PyQt5.QtCore import QPoint, QSize, QRect, Qt, QTimer
 
 import logging
 import sys
@@ -18,14 +18,65 @@ import os
 import frameView
 import sequenceTree
 import spritesheetView
+import slicing
+import sliceDialog
+import atlasPacker
+import animationRender
+import projectFile
+import editHistory
+import projectSaver
+import editJournal
+import imageLoader
+import previewGrid
+import sequencerView
 from animationTypes import AnimationData
+from imageStore import image_store
 
 class MainWindow(QtWidgets.QMainWindow):
 	animation_data = None
 	unsaved_changes = False
 
+	JOURNAL_FLUSH_INTERVAL = 2000 # Milliseconds between writes of the buffered edit journal
+	REFRESH_INTERVAL = 16 # Milliseconds, views are renewed at most once per display frame
+
 	def __init__(self):
 		super(MainWindow, self).__init__()
+
+		self.history = editHistory.History()
+
+		# Saves run on a worker thread, a save asked for while one runs is queued behind it
+		self.saver = projectSaver.ProjectSaver(self)
+		self.saver.progress.connect(self.save_progress)
+		self.saver.saved.connect(self.save_finished)
+		self.saver.failed.connect(self.save_failed)
+		self.save_pending = False
+
+		# Edits since the last full save, for recovery after a crash
+		self.journal = None
+		self.history.applied.connect(self.journal_command)
+		self.journal_timer = QTimer(self)
+		self.journal_timer.setInterval(self.JOURNAL_FLUSH_INTERVAL)
+		self.journal_timer.timeout.connect(self.flush_journal)
+		self.journal_timer.start()
+
+		# Changes reported by the views are gathered and the other views renewed once per display frame
+		self.stale_views = []
+		self.refresh_timer = QTimer(self)
+		self.refresh_timer.setSingleShot(True)
+		self.refresh_timer.setInterval(self.REFRESH_INTERVAL)
+		self.refresh_timer.timeout.connect(self.refresh_views)
+
+		# Spritesheets are decoded on a worker thread, the views get them when they are ready
+		self.image_loader = imageLoader.ImageLoader(self)
+		self.image_loader.preview.connect(self.spritesheet_preview)
+		self.image_loader.progress.connect(self.spritesheet_progress)
+		self.image_loader.loaded.connect(self.spritesheet_loaded)
+		self.image_loader.failed.connect(self.spritesheet_failed)
+		self.image_loader.cancelled.connect(self.spritesheet_cancelled)
+		
+		# Play the selected sequences side by side or one after another, made the first time they are asked for
+		self.preview_window = None
+		self.sequencer_window = None
 		
 		self.init_ui()
 		
@@ -74,6 +125,21 @@ class MainWindow(QtWidgets.QMainWindow):
 		self.menubar = QtWidgets.QMenuBar(self)
 		self.menubar.setGeometry(QRect(0, 0, 1109, 21))
 		self.menubar.setObjectName("menubar")
+
+		self.statusbar = QtWidgets.QStatusBar(self)
+		self.statusbar.setObjectName("statusbar")
+		self.setStatusBar(self.statusbar)
+
+		self.load_progress = QtWidgets.QProgressBar()
+		self.load_progress.setMaximumSize(QSize(200, 16))
+		self.load_progress.setRange(0, 100)
+		self.load_progress.hide()
+		self.statusbar.addPermanentWidget(self.load_progress)
+
+		self.load_cancel_btn = QtWidgets.QPushButton("Cancel")
+		self.load_cancel_btn.clicked.connect(self.image_loader.cancel)
+		self.load_cancel_btn.hide()
+		self.statusbar.addPermanentWidget(self.load_cancel_btn)
 		
 		self.menuFile = QtWidgets.QMenu(self.menubar)
 		self.menuFile.setObjectName("menuFile")
@@ -91,6 +157,16 @@ class MainWindow(QtWidgets.QMainWindow):
 		self.actionSave.setObjectName("actionSave")
 		self.actionSave.triggered.connect(self.save_animation_data)
 		self.actionSave.setEnabled(False)
+
+		self.actionExportAtlas = QtWidgets.QAction(self)
+		self.actionExportAtlas.setObjectName("actionExportAtlas")
+		self.actionExportAtlas.triggered.connect(self.export_atlas)
+		self.actionExportAtlas.setEnabled(False)
+
+		self.actionRenderAnimations = QtWidgets.QAction(self)
+		self.actionRenderAnimations.setObjectName("actionRenderAnimations")
+		self.actionRenderAnimations.triggered.connect(self.render_animations)
+		self.actionRenderAnimations.setEnabled(False)
 		
 		self.actionExit = QtWidgets.QAction(self)
 		self.actionExit.setObjectName("actionExit")
@@ -100,10 +176,62 @@ class MainWindow(QtWidgets.QMainWindow):
 		self.menuFile.addAction(self.actionOpen)
 		self.menuFile.addSeparator()
 		self.menuFile.addAction(self.actionSave)
+		self.menuFile.addAction(self.actionExportAtlas)
+		self.menuFile.addAction(self.actionRenderAnimations)
 		self.menuFile.addSeparator()
 		self.menuFile.addAction(self.actionExit)
 		self.menubar.addAction(self.menuFile.menuAction())
 
+		self.menuEdit = QtWidgets.QMenu(self.menubar)
+		self.menuEdit.setObjectName("menuEdit")
+
+		self.actionUndo = QtWidgets.QAction(self)
+		self.actionUndo.setObjectName("actionUndo")
+		self.actionUndo.setShortcut(QtGui.QKeySequence.Undo)
+		self.actionUndo.triggered.connect(self.undo)
+		self.actionUndo.setEnabled(False)
+
+		self.actionRedo = QtWidgets.QAction(self)
+		self.actionRedo.setObjectName("actionRedo")
+		self.actionRedo.setShortcuts([QtGui.QKeySequence.Redo, QtGui.QKeySequence("Ctrl+Y")])
+		self.actionRedo.triggered.connect(self.redo)
+		self.actionRedo.setEnabled(False)
+
+		self.menuEdit.addAction(self.actionUndo)
+		self.menuEdit.addAction(self.actionRedo)
+		self.menubar.addAction(self.menuEdit.menuAction())
+		self.history.changed.connect(self.update_undo_actions)
+
+		self.menuTools = QtWidgets.QMenu(self.menubar)
+		self.menuTools.setObjectName("menuTools")
+
+		self.actionAutoSlice = QtWidgets.QAction(self)
+		self.actionAutoSlice.setObjectName("actionAutoSlice")
+		self.actionAutoSlice.triggered.connect(self.auto_slice)
+		self.actionAutoSlice.setEnabled(False)
+
+		self.actionSliceGrid = QtWidgets.QAction(self)
+		self.actionSliceGrid.setObjectName("actionSliceGrid")
+		self.actionSliceGrid.triggered.connect(self.slice_grid)
+		self.actionSliceGrid.setEnabled(False)
+
+		self.actionPreview = QtWidgets.QAction(self)
+		self.actionPreview.setObjectName("actionPreview")
+		self.actionPreview.triggered.connect(self.preview_sequences)
+		self.actionPreview.setEnabled(False)
+
+		self.menuTools.addAction(self.actionAutoSlice)
+		self.menuTools.addAction(self.actionSliceGrid)
+		self.actionSequencer = QtWidgets.QAction(self)
+		self.actionSequencer.setObjectName("actionSequencer")
+		self.actionSequencer.triggered.connect(self.sequence_selected)
+		self.actionSequencer.setEnabled(False)
+
+		self.menuTools.addSeparator()
+		self.menuTools.addAction(self.actionPreview)
+		self.menuTools.addAction(self.actionSequencer)
+		self.menubar.addAction(self.menuTools.menuAction())
+
 		""" DELETE KEY SHORTCUT """
 		self.shortcut_del_frame = QtWidgets.QShortcut(QtGui.QKeySequence("Del"), self)
 		self.shortcut_del_frame.activated.connect(self.delete_action)
@@ -119,7 +247,16 @@ class MainWindow(QtWidgets.QMainWindow):
 		self.actionNew.setText("New")
 		self.actionSave.setText("Save")
 		self.actionOpen.setText("Open")
+		self.actionExportAtlas.setText("Export Atlas...")
+		self.actionRenderAnimations.setText("Render Animations...")
 		self.actionExit.setText("Exit")
+		self.menuEdit.setTitle("Edit")
+		self.update_undo_actions()
+		self.menuTools.setTitle("Tools")
+		self.actionAutoSlice.setText("Auto-slice sprites")
+		self.actionSliceGrid.setText("Slice grid...")
+		self.actionPreview.setText("Preview selected sequences")
+		self.actionSequencer.setText("Play selected sequences in order")
 
 	def new_sprite_animation(self):
 		path = QtWidgets.QFileDialog.getOpenFileName(self, 'Open file', 'spritesheets',"Image files (*.jpg *.png)")[0]
@@ -132,6 +269,9 @@ class MainWindow(QtWidgets.QMainWindow):
 				logging.error("Tried to open a spritesheet that doesn't exist")
 				return
 
+			if not self.close_project():
+				return
+
 			logging.info("Opening sprite sheet " + path)
 			self.save_location = None
 			self.spritesheetView.spritesheet_dir_label.setText(path)
@@ -140,84 +280,436 @@ class MainWindow(QtWidgets.QMainWindow):
 			self.load_animation_data(AnimationData(path))
 		
 	def open_spritesheet_sequence_file(self):
-		path = QtWidgets.QFileDialog.getOpenFileName(self, 'Open file', 'spritesheets',"Json files (*.json)")[0]
+		path = QtWidgets.QFileDialog.getOpenFileName(self, 'Open file', 'spritesheets',"Project files (*.json *%s)" % projectFile.EXTENSION)[0]
 		if path:
+			if not self.close_project():
+				return
+
 			logging.info("Opening Animation Data " + path)
 			try:
-				with open(path, 'r') as infile:
-					data = json.load(infile)
+				animation_data = self.read_animation_data(path)
 
-				if not os.path.exists(data['fpath']):
+				if not os.path.exists(animation_data.spritesheet_path):
 					# Spritesheet image not found
 					self.displayError("Could not open spritesheet",
-									  "Cannot find spritesheet image. Can't find " + data['fpath'])
+									  "Cannot find spritesheet image. Can't find " + animation_data.spritesheet_path)
 				else:
+					journal = self.recover_journal(path, animation_data)
+
 					self.save_location = path
-					self.load_animation_data(AnimationData.import_data(data))
+					self.load_animation_data(journal.animation_data, journal)
 					self.trigger_update()
+					# Only edits recovered from the journal are left to save
+					self.unsaved_changes = journal.written > 0
 
-			except json.JSONDecodeError as error:
-				logging.error("Unable to open JSON file.")
+			except ValueError as error:
+				# Includes json.JSONDecodeError
+				logging.error("Unable to open project file.")
 				logging.error(error)
 
-	def save_animation_data(self):
+	def read_animation_data(self, path):
+		if projectFile.is_binary(path):
+			return projectFile.load_binary(path, AnimationData)
+		with open(path, 'r') as infile:
+			return AnimationData.import_data(json.load(infile))
+
+	def recover_journal(self, path, animation_data):
+		""" Replays the edits journaled since the project was last saved, which are only left behind by a crash.
+			Returns the journal to go on with, a new one when there was nothing to replay.
+			A new journal makes no file until the first edit is written """
+		journal = editJournal.Journal(path, animation_data)
 		try:
+			recovered = journal.replay()
+		except (ValueError, OSError) as error:
+			logging.error(error)
+			self.displayError("Could not recover edits", "The edits made after the last save could not be recovered.")
+
+			# Replaying may have stopped halfway, the project is read again as it was saved
+			# and the journal that can't be replayed is removed
+			journal.discard()
+			journal = editJournal.Journal(path, self.read_animation_data(path))
+			recovered = None
+
+		if recovered:
+			logging.info("Recovered %s edits made after the last save" % recovered)
+		return journal
+
+	def journal_command(self, command, undone):
+		if self.journal is not None:
+			self.journal.record(command, undone)
+
+	def write_journal(self):
+		if self.journal is None:
+			return
 
-			if self.save_location is None:
-				name = QtWidgets.QFileDialog.getSaveFileName(self, 'Save File', "spritesheets", "JSON Files(*.json)")
-				if name[0] == '':
-					return
-				else:
-					self.save_location = name[0]
+		try:
+			self.journal.flush()
+		except OSError as error:
+			logging.error("Could not write the edit journal")
+			logging.error(error)
+
+	def flush_journal(self):
+		self.write_journal()
+		if self.journal is not None and self.journal.needs_compaction() and not self.saver.isRunning():
+			logging.info("Compacting the edit journal into a full save")
+			self.save_animation_data()
 
-			#spritesheet_name = self.animation_data.spritesheet_fname
-			data = self.animation_data.export_data()
-			with open(self.save_location, 'w') as outfile:
-				json.dump(data, outfile)
-				logging.info("Animation Data Saved Successfully")
-			self.unsaved_changes = False
+	def discard_journal(self):
+		if self.journal is not None:
+			self.journal.discard()
+			self.journal = None
+
+	def close_project(self):
+		""" Lets the user save the open project before another one is opened, then removes its journal
+			so its edits aren't recovered as if the editor had crashed. Returns False when the user cancels """
+		if self.unsaved_changes:
+			reply = QtWidgets.QMessageBox()
+			reply.setIcon(QtWidgets.QMessageBox.Question)
+			reply.setWindowTitle("Save Changes")
+			reply.setText("Save changes before opening another project?")
+			reply.setStandardButtons(QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No | QtWidgets.QMessageBox.Cancel)
+
+			save = reply.exec_()
+
+			if save == QtWidgets.QMessageBox.Yes:
+				self.save_animation_data()
+				if self.save_location is None or not self.finish_saving():
+					return False
+			elif save != QtWidgets.QMessageBox.No:
+				return False
+		elif not self.finish_saving():
+			return False
+
+		self.discard_journal()
+		self.unsaved_changes = False
+		return True
+
+	def shut_down(self):
+		""" Stops work on other threads and removes the journal, for when the window closes with nothing unsaved """
+		self.image_loader.cancel()
+		self.image_loader.wait()
+		self.spriteView.view.frame_cache.stop()
+		for window in (self.preview_window, self.sequencer_window):
+			if window is not None:
+				window.close()
+		self.discard_journal()
 
-		except ValueError:
-			self.displayError("Could not save", "There was an error while trying to save.")
+	def save_animation_data(self):
+		if self.save_location is None:
+			name = QtWidgets.QFileDialog.getSaveFileName(self, 'Save File', "spritesheets",
+														 "JSON Files(*.json);;Binary Project Files(*%s)" % projectFile.EXTENSION)
+			if name[0] == '':
+				return
+			else:
+				self.save_location = name[0]
+
+		if not self.start_save():
+			self.save_pending = True
+			return
+
+		self.unsaved_changes = False
+		self.statusbar.showMessage("Saving " + self.save_location)
+
+	def start_save(self):
+		""" Snapshots the project for the saver. Returns False while a save is still running """
+		# Only the snapshot is taken here, the file is written on the saver's thread
+		if not self.saver.save(self.animation_data, self.save_location):
+			return False
+
+		if self.journal is None:
+			self.journal = editJournal.Journal(self.save_location, self.animation_data)
+		self.journal.mark_snapshot()
+		return True
+
+	def save_progress(self, written, total):
+		if total > 0:
+			self.statusbar.showMessage("Saving %s... %s%%" % (self.save_location, written * 100 // total))
+
+	def save_finished(self, path):
+		logging.info("Animation Data Saved Successfully")
+		if self.journal is not None and self.journal.project_path == path:
+			try:
+				self.journal.rebase()
+			except OSError as error:
+				logging.error("Could not restart the edit journal")
+				logging.error(error)
+
+		self.statusbar.showMessage("Saved " + path, 5000)
+		if self.save_pending:
+			self.save_pending = False
+			self.save_animation_data()
+
+	def save_failed(self, path, message):
+		if self.journal is not None:
+			self.journal.mark = None
+		self.unsaved_changes = True
+		self.save_pending = False
+		self.statusbar.clearMessage()
+		self.displayError("Could not save", message)
+
+	def finish_saving(self):
+		""" Waits for a running save, and one queued behind it, to be written. Returns False when saving failed """
+		self.saver.wait()
+		if self.save_pending:
+			self.save_pending = False
+			self.start_save()
+			self.saver.wait()
+		return self.saver.error is None
+
+
+	def export_atlas(self):
+		name = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Atlas', "spritesheets", "JSON Files(*.json)")
+		if name[0] == '':
+			return
+
+		# Rotated frames have to be turned back by whatever reads the atlas, so it's opt in
+		reply = QtWidgets.QMessageBox()
+		reply.setIcon(QtWidgets.QMessageBox.Question)
+		reply.setWindowTitle("Export Atlas")
+		reply.setText("Allow frames to be rotated to pack them tighter?")
+		reply.setStandardButtons(QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No | QtWidgets.QMessageBox.Cancel)
+		reply.setDefaultButton(QtWidgets.QMessageBox.No)
+
+		answer = reply.exec_()
+		if answer == QtWidgets.QMessageBox.Cancel:
+			return
+
+		QtWidgets.QApplication.setOverrideCursor(Qt.WaitCursor)
+		try:
+			packer = atlasPacker.AtlasPacker(allow_rotate=answer == QtWidgets.QMessageBox.Yes)
+			packer.export(self.animation_data, image_store.get(self.animation_data.spritesheet_path), name[0])
+			logging.info("Atlas exported to " + name[0])
+		except ValueError as error:
+			self.displayError("Could not export atlas", str(error))
 		except IOError:
-			self.displayError("Could not save", "Could not write to the animation data file.")
+			self.displayError("Could not export atlas", "Could not write the atlas files.")
+		finally:
+			QtWidgets.QApplication.restoreOverrideCursor()
+
+	def render_animations(self):
+		formats = list(animationRender.FORMATS.items())
+		label, ok = QtWidgets.QInputDialog.getItem(self, 'Render Animations', "Format",
+												   [name for _, name in formats], 0, False)
+		if not ok:
+			return
 
+		directory = QtWidgets.QFileDialog.getExistingDirectory(self, 'Render Animations', "spritesheets")
+		if directory == '':
+			return
 
-	def load_animation_data(self, animation_data):
+		QtWidgets.QApplication.setOverrideCursor(Qt.WaitCursor)
+		try:
+			output_format = next(key for key, name in formats if name == label)
+			results = animationRender.render_animation(self.animation_data, directory, output_format)
+			logging.info("Rendered %s sequences to %s" % (len(results), directory))
+		except ValueError as error:
+			self.displayError("Could not render animations", str(error))
+		except IOError:
+			self.displayError("Could not render animations", "Could not write the animation files.")
+		finally:
+			QtWidgets.QApplication.restoreOverrideCursor()
+
+	def load_animation_data(self, animation_data, journal=None):
+		""" Shows animation_data, once close_project has let the project before it go """
 		self.actionSave.setEnabled(True)
+		self.actionRenderAnimations.setEnabled(True)
 		self.animation_data = animation_data
+		self.history.clear()
+		self.journal = journal
+
+		for window in (self.preview_window, self.sequencer_window):
+			if window is not None:
+				window.close()
 
-		self.treeView.load_animation_data(animation_data)
-		self.spritesheetView.load_animation_data(animation_data)
-		self.spriteView.load_animation_data(animation_data)
+		self.treeView.load_animation_data(animation_data, self.history)
+		self.spritesheetView.load_animation_data(animation_data, self.history)
+		self.spriteView.load_animation_data(animation_data, self.history)
 
+		self.load_spritesheet(animation_data.spritesheet_path)
+
+	def load_spritesheet(self, path):
+		""" Hands the views the spritesheet, decoding it on the loader's thread unless it is already decoded """
+		if image_store.contains(path):
+			self.image_loader.cancel()
+			self.set_spritesheet_image(image_store.get(path))
+			return
+
+		self.set_image_actions_enabled(False)
+		self.load_progress.setValue(0)
+		self.load_progress.show()
+		self.load_cancel_btn.show()
+		self.statusbar.showMessage("Loading " + path)
+		self.image_loader.load(path)
+
+	def set_spritesheet_image(self, image):
+		self.spritesheetView.view.set_spritesheet_image(image)
+		self.spriteView.set_spritesheet_image(image)
+		self.set_image_actions_enabled(True)
+
+	def set_image_actions_enabled(self, enabled):
+		# Actions that read the spritesheet's pixels
+		self.actionExportAtlas.setEnabled(enabled)
+		self.actionAutoSlice.setEnabled(enabled)
+		self.actionSliceGrid.setEnabled(enabled)
+		self.actionPreview.setEnabled(enabled)
+		self.actionSequencer.setEnabled(enabled)
+
+	def loading_current_sheet(self, path):
+		return self.animation_data is not None and path == self.animation_data.spritesheet_path
+
+	def end_loading(self):
+		self.load_progress.hide()
+		self.load_cancel_btn.hide()
+		self.statusbar.clearMessage()
+
+	def spritesheet_preview(self, path, image, size):
+		if self.loading_current_sheet(path):
+			self.spritesheetView.view.set_preview(image, size)
+
+	def spritesheet_progress(self, path, percent):
+		if self.loading_current_sheet(path):
+			self.load_progress.setValue(percent)
+
+	def spritesheet_loaded(self, path, image):
+		image_store.insert(path, image)
+		if self.loading_current_sheet(path):
+			self.end_loading()
+			self.set_spritesheet_image(image_store.get(path))
+
+	def spritesheet_failed(self, path, message):
+		if self.loading_current_sheet(path):
+			self.end_loading()
+			self.displayError("Could not open spritesheet", message)
+
+	def spritesheet_cancelled(self, path):
+		if self.loading_current_sheet(path):
+			self.end_loading()
+			self.statusbar.showMessage("Loading cancelled", 5000)
+
+
+	def auto_slice(self):
+		# Every sprite found on the sheet becomes a frame of one new sequence
+		QtWidgets.QApplication.setOverrideCursor(Qt.WaitCursor)
+		try:
+			frames = slicing.auto_slice(image_store.get(self.animation_data.spritesheet_path))
+		finally:
+			QtWidgets.QApplication.restoreOverrideCursor()
+
+		if not frames:
+			self.displayError("Could not auto-slice", "No sprites were found on the spritesheet.")
+			return
+
+		logging.info("Auto-slice created %s frames" % len(frames))
+		sequence = self.animation_data.new_sequence(active=True, frames=frames)
+		self.history.push(editHistory.AddSequence(self.animation_data, sequence, "Auto-slice"))
+		self.trigger_update()
+
+	def slice_grid(self):
+		image = image_store.get(self.animation_data.spritesheet_path)
+		dialog = sliceDialog.GridSliceDialog(self, image.size())
+		if dialog.exec_() != QtWidgets.QDialog.Accepted:
+			return
+
+		sequence = self.animation_data.slice_grid(dialog.cell_size(), dialog.offset(), dialog.spacing(),
+												  dialog.skip_empty(), image)
+		if sequence is None:
+			self.displayError("Could not slice grid", "The grid has no cells with sprites in them.")
+			return
+
+		logging.info("Grid slice created %s frames" % len(sequence.frames))
+		self.history.push(editHistory.AddSequence(self.animation_data, sequence, "Slice grid"))
+		self.trigger_update()
+
+	def preview_sequences(self):
+		""" Plays the selected sequences side by side, every sequence when none are selected """
+		sequences = list(self.animation_data.selected) or list(self.animation_data.sequences)
+		if not sequences:
+			return
+
+		if self.preview_window is None:
+			self.preview_window = previewGrid.PreviewWindow(self)
+		self.preview_window.show()
+		self.preview_window.show_sequences(self.animation_data, sequences, image_store.get(self.animation_data.spritesheet_path))
+		self.preview_window.raise_()
+
+	def sequence_selected(self):
+		""" Plays the selected sequences back to back in the order they were selected, every sequence when none are """
+		sequences = list(self.animation_data.selected) or list(self.animation_data.sequences)
+		if not sequences:
+			return
+
+		if self.sequencer_window is None:
+			self.sequencer_window = sequencerView.SequencerWindow(self)
+		self.sequencer_window.show()
+		self.sequencer_window.show_sequences(self.animation_data, sequences, image_store.get(self.animation_data.spritesheet_path))
+		self.sequencer_window.raise_()
 
 	def trigger_update(self):
+		""" Schedules a renew of the views other than the one the change came from """
 		source = self.sender()
 
-		if source != self.spritesheetView.view:
-			self.spritesheetView.renew()
-		if source != self.spriteView.view:
-			self.spriteView.renew()
+		for view in (self.spritesheetView, self.spriteView):
+			if source != view.view and view not in self.stale_views:
+				self.stale_views.append(view)
 
 		self.unsaved_changes = True
+		if not self.refresh_timer.isActive():
+			self.refresh_timer.start()
+
+	def refresh_views(self):
+		views, self.stale_views = self.stale_views, []
+		for view in views:
+			view.renew()
 
 
 	def delete_action(self):
+		with self.animation_data.transaction():
+			self.delete_selected()
+		self.trigger_update()
+
+	def delete_selected(self):
+		# Each deletion is done as it is recorded, the rows and positions they keep are those at the time
+		commands = []
 		if self.spritesheetView.view.hasFocus():
 			for sequence in self.animation_data.selected:
-				for i in range(0, len(sequence.selected)):
-					frame = self.animation_data.active_sequence.selected.pop()
-					self.animation_data.active_sequence.remove_frame(frame)
+				if sequence.selected:
+					commands.append(editHistory.RemoveFrames(sequence, sequence.selected))
+					commands[-1].redo()
 
 		elif self.treeView.hasFocus():
-			for sequence in self.animation_data.selected:
-				self.animation_data.del_sequence(sequence)
+			for sequence in list(self.animation_data.selected):
+				commands.append(editHistory.RemoveSequence(self.animation_data, sequence))
+				commands[-1].redo()
 
 		elif self.spriteView.view.hasFocus():
-			self.animation_data.active_sequence.remove_frame(self.animation_data.active_frame)
-
-		self.trigger_update()
+			if self.animation_data.active_frame is not None:
+				commands.append(editHistory.RemoveFrames(self.animation_data.active_sequence, [self.animation_data.active_frame]))
+				commands[-1].redo()
+
+		if len(commands) == 1:
+			self.history.push(commands[0])
+		elif commands:
+			self.history.push(editHistory.Batch(commands, "Delete"))
+
+	def undo(self):
+		with self.animation_data.transaction():
+			command = self.history.undo()
+		if command is not None:
+			self.trigger_update()
+
+	def redo(self):
+		with self.animation_data.transaction():
+			command = self.history.redo()
+		if command is not None:
+			self.trigger_update()
+
+	def update_undo_actions(self):
+		undo_label = self.history.undo_label()
+		redo_label = self.history.redo_label()
+		self.actionUndo.setEnabled(undo_label is not None)
+		self.actionRedo.setEnabled(redo_label is not None)
+		self.actionUndo.setText("Undo " + undo_label if undo_label else "Undo")
+		self.actionRedo.setText("Redo " + redo_label if redo_label else "Redo")
 
 	def displayError(self, title, message):
 		box = QtWidgets.QMessageBox()
@@ -230,7 +722,8 @@ class MainWindow(QtWidgets.QMainWindow):
 	""" EVENTS """
 	def closeEvent(self, event: QtGui.QCloseEvent) -> None:
 
-		if self.unsaved_changes is False:
+		if self.unsaved_changes is False and self.finish_saving():
+			self.shut_down()
 			event.accept()
 			return
 
@@ -245,9 +738,14 @@ class MainWindow(QtWidgets.QMainWindow):
 		if save == QtWidgets.QMessageBox.Yes:
 			logging.info("Saving and exiting")
 			self.save_animation_data()
-			event.accept()
+			if self.finish_saving():
+				self.shut_down()
+				event.accept()
+			else:
+				event.ignore()
 		elif save == QtWidgets.QMessageBox.No:
 			logging.info("Exiting without saving")
+			self.shut_down()
 			event.accept()
 		else:
 			event.ignore()
@@ -0,0 +1,873 @@
+# -*- coding: utf-8 -*-
+
+""" The animation model without any Qt dependency, for headless tools and worker processes.
+	animationTypes adapts it to the Qt types and signals the editor uses """
+
+from contextlib import contextmanager
+from enum import Enum
+import logging
+
+from frameTable import FrameTable
+from spatialIndex import SpatialGrid
+
+
+class AnimationEvent(Enum):
+	NEW_SEQUENCE = 1
+	SEQUENCE_DELETED = 2
+	NEW_FRAME = 3
+	FRAME_DELETED = 4
+	FRAME_ALTERED = 5
+	ACTIVE_SEQUENCE_CHANGED = 6
+	ACTIVE_FRAME_CHANGED = 7
+	FRAME_SELECTION_CHANGED = 8
+	SEQUENCE_SELECTION_CHANGED = 9
+	SEQUENCE_ALTERED = 10
+
+
+class Signal:
+	""" A list of callbacks with the connect / emit interface of a Qt signal """
+
+	__slots__ = ("_callbacks",)
+
+	def __init__(self):
+		self._callbacks = []
+
+	def connect(self, callback):
+		self._callbacks.append(callback)
+
+	def disconnect(self, callback=None):
+		if callback is None:
+			self._callbacks.clear()
+		else:
+			self._callbacks.remove(callback)
+
+	def emit(self, *args):
+		# Copied, callbacks may connect or disconnect while being called
+		for callback in list(self._callbacks):
+			callback(*args)
+
+
+class Selection:
+	""" Frames or sequences in the order they were picked, with constant time membership.
+		Items are told apart by identity. Assigning a list to a selected attribute makes one of these """
+
+	__slots__ = ("_items",)
+
+	def __init__(self, items=()):
+		self._items = dict.fromkeys(items)
+
+	def __contains__(self, item):
+		return item in self._items
+
+	def __iter__(self):
+		return iter(self._items)
+
+	def __reversed__(self):
+		return reversed(self._items)
+
+	def __len__(self):
+		return len(self._items)
+
+	def __getitem__(self, i):
+		# The first and last item are what gets asked for, without making a list
+		if i == 0 and self._items:
+			return next(iter(self._items))
+		if i == -1 and self._items:
+			return next(reversed(self._items))
+		return list(self._items)[i]
+
+	def __eq__(self, other):
+		return list(self._items) == list(other)
+
+	def append(self, item):
+		self._items[item] = None
+
+	def remove(self, item):
+		try:
+			del self._items[item]
+		except KeyError:
+			raise ValueError("Selection.remove(item): item is not selected")
+
+	def discard(self, item):
+		self._items.pop(item, None)
+
+	def clear(self):
+		self._items.clear()
+
+	def __repr__(self):
+		return "Selection(%s)" % list(self._items)
+
+
+class Change:
+	""" What one edit did to the model, AnimationData.changes is emitted with a list of them.
+		event is NEW_FRAME, FRAME_DELETED or FRAME_ALTERED for frames of sequence,
+		or NEW_SEQUENCE or SEQUENCE_DELETED for sequence itself at position index, SEQUENCE_ALTERED when its name or speed changed.
+		before holds the rectangle (x, y, width, height) each altered frame had, None where it isn't known,
+		and is None altogether when no rectangles are known. The rectangles frames have now are read from the frames """
+
+	__slots__ = ("event", "sequence", "frames", "before", "index", "_rows")
+
+	def __init__(self, event, sequence, frames=(), before=None, index=None):
+		self.event = event
+		self.sequence = sequence
+		self.frames = list(frames)
+		self.before = before
+		self.index = index
+		self._rows = None # id(frame) -> position in frames, built on the first merge
+
+	def rects(self):
+		return [frame.values()[:4] for frame in self.frames]
+
+	def merge(self, change):
+		""" Folds a later alteration of frames of the same sequence into this one, keeping the first rectangle
+			each frame had. Returns False when the changes can't be merged """
+		if change.event is not AnimationEvent.FRAME_ALTERED or self.event is not AnimationEvent.FRAME_ALTERED:
+			return False
+		if change.sequence is not self.sequence or change.before is None or self.before is None:
+			return False
+
+		if self._rows is None:
+			self._rows = {id(frame): i for i, frame in enumerate(self.frames)}
+		for frame, rect in zip(change.frames, change.before):
+			if id(frame) not in self._rows:
+				self._rows[id(frame)] = len(self.frames)
+				self.frames.append(frame)
+				self.before.append(rect)
+		return True
+
+	def __repr__(self):
+		return "Change(%s, %s, %s frames)" % (self.event.name, self.sequence.name, len(self.frames))
+
+
+class AnimationFrame:
+	""" A frame is a handle to one row of its sequence's FrameTable.
+		A frame that is not in a sequence keeps its row in a table of its own """
+
+	__slots__ = ("_table", "_row")
+
+	def __init__(self, x=0, y=0, width=0, height=0, shift_x=0, shift_y=0):
+		self._table = FrameTable()
+		self._row = self._table.append(self, (x, y, width, height, shift_x, shift_y))
+
+	@classmethod
+	def view(cls, table, row):
+		""" Returns a new handle to an existing row of table """
+		frame = cls.__new__(cls)
+		frame._table = table
+		frame._row = row
+		table.handles[row] = frame
+		return frame
+
+	@classmethod
+	def from_values(cls, values, duration=0):
+		""" Returns a new frame, not in a sequence, from (x, y, width, height, shift_x, shift_y) """
+		table = FrameTable()
+		return cls.view(table, table.append(None, values, duration))
+
+	def move_to_table(self, table, row=None):
+		""" Moves the frame's row to the end of table, or in before row """
+		values = self._table.row(self._row)
+		duration = self._table.duration[self._row]
+		if row is None:
+			self._row = table.append(self, values, duration)
+		else:
+			table.insert(row, self, values, duration)
+			self._row = row
+		self._table = table
+
+	def values(self):
+		""" Returns (x, y, width, height, shift_x, shift_y) """
+		return self._table.row(self._row)
+
+	def set_values(self, values):
+		""" Sets (x, y, width, height, shift_x, shift_y) as values() returns them """
+		for column, value in zip(self._table.columns, values):
+			column[self._row] = value
+
+	def duration(self):
+		""" Milliseconds the frame is on show for, 0 when it lasts 1 / speed of its sequence """
+		return self._table.duration[self._row]
+
+	def set_duration(self, duration):
+		self._table.duration[self._row] = duration
+
+	def set_shift(self, shift_x, shift_y):
+		self._table.shift_x[self._row] = shift_x
+		self._table.shift_y[self._row] = shift_y
+
+	def x(self):
+		return self._table.x[self._row]
+
+	def y(self):
+		return self._table.y[self._row]
+
+	def width(self):
+		return self._table.width[self._row]
+
+	def height(self):
+		return self._table.height[self._row]
+
+	left = x
+	top = y
+
+	def right(self):
+		return self._table.x[self._row] + self._table.width[self._row] - 1
+
+	def bottom(self):
+		return self._table.y[self._row] + self._table.height[self._row] - 1
+
+	def setLeft(self, left):
+		table, row = self._table, self._row
+		table.width[row] += table.x[row] - left
+		table.x[row] = left
+
+	def setTop(self, top):
+		table, row = self._table, self._row
+		table.height[row] += table.y[row] - top
+		table.y[row] = top
+
+	def setRight(self, right):
+		self._table.width[self._row] = right - self._table.x[self._row] + 1
+
+	def setBottom(self, bottom):
+		self._table.height[self._row] = bottom - self._table.y[self._row] + 1
+
+	def set_position(self, x, y):
+		self._table.x[self._row] = x
+		self._table.y[self._row] = y
+
+	def translate(self, dx, dy):
+		self._table.x[self._row] += dx
+		self._table.y[self._row] += dy
+
+	def normalize(self):
+		table, row = self._table, self._row
+		if table.width[row] < 0:
+			table.x[row] += table.width[row]
+			table.width[row] = -table.width[row]
+
+		if table.height[row] < 0:
+			table.y[row] += table.height[row]
+			table.height[row] = -table.height[row]
+
+	def __repr__(self):
+		return "AnimationFrame(%s, %s, %s, %s, shift=(%s, %s))" % self.values()
+
+
+class AnimationSequence:
+	""" An ordered list of frames, their selection and the active frame """
+
+	__slots__ = ("_name", "_names", "table", "frames", "_active_frame", "_selected", "speed", "_index",
+				 "active_frame_changed", "changed", "__weakref__")
+
+	frame_class = AnimationFrame
+
+	def __init__(self, name):
+		self.active_frame_changed = Signal()
+		self.changed = Signal() # Emitted with a Change when frames are added, removed or altered, or the sequence is edited
+		self._names = None # Name to sequence map of the AnimationData the sequence is in
+		self._name = name
+		self.table = FrameTable()
+		self.frames = self.table.handles # Kept in row order by the table
+		self._active_frame = None
+		self.selected = []
+		self.speed = 20 #Frames per second
+		self._index = None # Spatial index, built on the first hit test
+
+	@property
+	def name(self):
+		return self._name
+
+	@name.setter
+	def name(self, name):
+		# Names are unique within an AnimationData
+		if self._names is not None:
+			if self._names.get(name, self) is not self:
+				raise ValueError("There is already a sequence named %s" % name)
+			del self._names[self._name]
+			self._names[name] = self
+		self._name = name
+
+	def edit(self, name, speed):
+		""" Renames the sequence and sets its speed, emitting a SEQUENCE_ALTERED change """
+		self.name = name
+		self.speed = speed
+		self.changed.emit(Change(AnimationEvent.SEQUENCE_ALTERED, self))
+
+	@property
+	def selected(self):
+		return self._selected
+
+	@selected.setter
+	def selected(self, frames):
+		self._selected = Selection(frames)
+
+	@property
+	def active_frame(self):
+		return self._active_frame
+
+	@active_frame.setter
+	def active_frame(self, frame):
+		if frame is None:
+			self._active_frame = None
+			self.active_frame_changed.emit()
+			return
+
+		if self.frame_index(frame) is None:
+			raise Exception('active frame assignment failed. Frame was not found in sequence %s.' % self.name)
+
+		self._active_frame = frame
+		self.active_frame_changed.emit()
+
+
+	def select(self, arg):
+		# TODO finish exception handling
+		if isinstance(arg, AnimationFrame):
+			if self.frame_index(arg) is None:
+				raise Exception("Tried to select frame that was not in the sequence")
+
+			if arg not in self.selected:
+				self.selected.append(arg)
+				self.active_frame = arg
+
+		elif type(arg) == int:
+			try:
+				if self.frames[arg] not in self.selected:
+					self.selected.append(self.frames[arg])
+					self.active_frame = self.frames[arg]
+			except:
+				pass
+
+	def deselect(self, arg):
+		if isinstance(arg, AnimationFrame):
+			if arg in self.selected:
+				self.selected.remove(arg)
+				if arg == self.active_frame:
+					self.active_frame = None
+		elif type(arg) == int:
+			try:
+				if self.frames[arg] in self.selected:
+					self.selected.remove(self.frames[arg])
+			except:
+				pass
+
+	def select_all(self):
+		self.selected = list(self.frames)
+
+	def deselect_all(self):
+		self.selected = []
+
+	def add_frame(self, frame):
+		frame.move_to_table(self.table)
+		if self._index is not None:
+			self.index_frame(frame)
+		self.changed.emit(Change(AnimationEvent.NEW_FRAME, self, [frame]))
+		self.active_frame = frame
+		self.selected = [frame]
+		
+	def add_frames(self, frames):
+		""" Appends many frames at once. The first becomes the active frame and active_frame_changed is emitted once """
+		if not frames:
+			return
+
+		for frame in frames:
+			frame.move_to_table(self.table)
+		self.frames_added(frames)
+
+	def add_columns(self, columns):
+		""" Appends a frame for each row of columns, given as (x, y, width, height, shift_x, shift_y) sequences
+			and optionally a sequence of durations. The values go straight into the frame table. Returns the new frames """
+		frames = [self.frame_class.view(self.table, row) for row in self.table.extend(columns)]
+		self.frames_added(frames)
+		return frames
+
+	def frames_added(self, frames):
+		if not frames:
+			return
+
+		if self._index is not None:
+			for frame in frames:
+				self.index_frame(frame)
+		self.changed.emit(Change(AnimationEvent.NEW_FRAME, self, frames))
+
+		self.selected = list(frames)
+		self.active_frame = frames[0]
+
+	def remove_frame(self, frame):
+		self.remove_frames([frame])
+
+	def remove_frames(self, frames):
+		""" Removes frames, the frames after them are renumbered once """
+		rows = []
+		for frame in frames:
+			row = self.frame_index(frame)
+			if row is None:
+				raise ValueError("Frame is not in sequence %s" % self.name)
+			rows.append(row)
+		if not rows:
+			return
+
+		# A removed frame keeps its values in a table of its own, the frames after it move up.
+		# Going from the last row up, the rows still to remove don't move
+		removed = []
+		for row in sorted(rows, reverse=True):
+			frame = self.frames[row]
+			removed.append(frame)
+			frame.move_to_table(FrameTable())
+			self.table.remove(row)
+
+			if self._index is not None:
+				self._index.remove(frame)
+
+			if frame in self.selected:
+				self.selected.remove(frame)
+
+			if frame is self.active_frame:
+				self.active_frame = None
+
+		self.renumber(min(rows))
+		self.changed.emit(Change(AnimationEvent.FRAME_DELETED, self, reversed(removed)))
+
+	def insert_frame(self, row, frame):
+		""" Puts a frame, one that was removed or is new, back into the sequence at row """
+		self.insert_frames([(row, frame)])
+
+	def insert_frames(self, rows):
+		""" Puts frames back at the rows they had, given as (row, frame) pairs in row order """
+		if not rows:
+			return
+
+		for row, frame in rows:
+			frame.move_to_table(self.table, row)
+		self.renumber(rows[0][0])
+
+		if self._index is not None:
+			for _, frame in rows:
+				self.index_frame(frame)
+		self.changed.emit(Change(AnimationEvent.NEW_FRAME, self, [frame for _, frame in rows]))
+
+	def renumber(self, start):
+		# Rows from start on have moved, their frames have to learn their new row
+		frames = self.frames
+		for i in range(start, len(frames)):
+			frames[i]._row = i
+
+	def translate_frames(self, dx, dy, frames=None):
+		""" Moves all frames, or only the given frames of this sequence, by dx, dy """
+		if frames is None:
+			self.table.translate(dx, dy)
+			self._index = None
+			self.changed.emit(Change(AnimationEvent.FRAME_ALTERED, self, self.frames))
+		else:
+			self.table.translate(dx, dy, [self.frame_index(frame) for frame in frames])
+			self.update_frames(frames)
+
+	def bounds(self):
+		""" Returns (x, y, width, height) around all frames, or None when there are none """
+		bounds = self.table.bounds()
+		if bounds is None:
+			return None
+		left, top, right, bottom = bounds
+		return left, top, right - left, bottom - top
+
+	@property
+	def index(self):
+		if self._index is None:
+			self._index = SpatialGrid()
+			for frame in self.frames:
+				self.index_frame(frame)
+		return self._index
+
+	def index_frame(self, frame):
+		x, y, width, height = frame.values()[:4]
+		self.index.update(frame, x, y, width, height)
+
+	def update_frame(self, frame):
+		self.update_frames([frame])
+
+	def update_frames(self, frames):
+		""" Call after changing the position, size or shift of frames, keeps the spatial index current.
+			The rectangles the frames had are taken from the index, as far as it has them """
+		before = []
+		for frame in frames:
+			if self._index is not None and frame in self._index:
+				before.append(self._index.bounds(frame))
+				self.index_frame(frame)
+			else:
+				before.append(None)
+		self.changed.emit(Change(AnimationEvent.FRAME_ALTERED, self, frames, before))
+
+	def frame_at(self, x, y):
+		frames = self.index.query_point(x, y)
+		if not frames:
+			return None
+
+		# Overlapping frames, the first one in the sequence wins
+		return min(frames, key=self.frame_index)
+
+	def frames_in(self, x, y, width, height):
+		return self.index.query_rect(x, y, width, height)
+
+	def set_sole(self, frame):
+		if self.frame_index(frame) is not None:
+			self.active_frame = frame
+			self.selected = [frame]
+
+	def get_frame_after(self, index):
+		if len(self.frames) > index + 1:
+			return None
+		else:
+			return self.frames[index + 1]
+
+
+
+	def get_frame_before(self, index):
+		if index == 0:
+			return None
+		else:
+			return self.frames[index + 1]
+
+	def next_frame(self):
+		# Sets the active frame to frame after the current active frame
+		if self.active_frame is None:
+			if len(self.frames) > 0:
+				self.active_frame = self.frames[0]
+			else:
+				self.active_frame = None
+
+		else:
+			active_frame_index = self.frame_index(self.active_frame)
+			if active_frame_index == len(self.frames) - 1:
+				self.active_frame = self.frames[0]
+			else:
+				self.active_frame = self.frames[active_frame_index + 1]
+			
+	def prev_frame(self):
+		if self.active_frame is None:
+			if len(self.frames) > 0:
+				self.active_frame = self.frames[0]
+			else:
+				self.active_frame = None
+
+		else:
+			# Sets the active frame to frame before the current active frame
+			active_frame_index = self.frame_index(self.active_frame)
+			if active_frame_index == 0:
+				self.active_frame = self.frames[len(self.frames) - 1]
+			else:
+				self.active_frame = self.frames[active_frame_index - 1]
+
+
+
+
+	# def get_next_frame(self):
+	# 	if self.active_frame is None:
+	# 		if len(self.frames) > 0:
+	# 			return self.frames[0]
+	# 		else:
+	# 			return None
+	#
+	# 	else:
+	# 		active_frame_index = self.frames.index(self.active_frame)
+	# 		if active_frame_index == len(self.frames) - 1:
+	# 			return self.frames[0]
+	# 		else:
+	# 			return self.frames[active_frame_index + 1]
+	#
+	# def get_previous_frame(self):
+	# 	if self.active_frame is None:
+	# 		if len(self.frames) > 0:
+	# 			return self.frames[0]
+	# 		else:
+	# 			return None
+
+		# else:
+		# 	active_frame_index = self.frames.index(self.active_frame)
+		# 	if active_frame_index == 0:
+		# 		return self.frames[len(self.frames) - 1]
+		# 	else:
+		# 		return self.frames[active_frame_index - 1]
+
+	def frame_durations(self):
+		""" Milliseconds each frame is on show for, in row order. Frames without a duration of their own last 1 / speed """
+		default = 1000 / self.speed if self.speed > 0 else 0
+		return [duration or default for duration in self.table.duration]
+
+	def frame_index(self, frame):
+		# A frame knows its row, the row is its position in the sequence
+		if frame._table is self.table:
+			return frame._row
+		return None
+
+	def active_frame_index(self):
+		if self._active_frame is not None:
+			return self.frame_index(self._active_frame)
+		else:
+			return None
+
+
+class AnimationData:
+	""" The sequences of frames cut from one spritesheet.
+		Signals go out as soon as something changes, or once each when the outermost transaction ends """
+
+	__slots__ = ("spritesheet_path", "spritesheet_fname", "sequences", "_names", "_positions", "_active_sequence", "_selected",
+				 "active_sequence_changed", "active_frame_changed", "data_changed", "changes",
+				 "_transaction_depth", "_pending", "_changes", "__weakref__")
+
+	sequence_class = AnimationSequence
+
+	def __init__(self, spritesheet_fname):
+		self.active_sequence_changed = Signal()
+		self.active_frame_changed = Signal()
+		self.data_changed = Signal() # Emitted with an AnimationEvent
+		self.changes = Signal() # Emitted with a list of Change records
+		self.spritesheet_path = spritesheet_fname
+		self.spritesheet_fname = self.spritesheet_path.split("/")[-1][:-4]
+		self.sequences = []
+		self._names = {} # Name -> sequence, kept current by the sequences as they are renamed
+		self._positions = {} # id(sequence) -> index in sequences, checked on every lookup and rebuilt when stale
+		self._active_sequence = None
+		self.selected = []
+		self._transaction_depth = 0
+		self._pending = {} # (signal name, arguments) held back by a transaction, in the order they came
+		self._changes = [] # Change records held back by a transaction
+
+	@contextmanager
+	def transaction(self):
+		""" Holds back the signals of the changes made in the block. When the outermost block ends,
+			each distinct signal is emitted once however many times it was held back """
+		self._transaction_depth += 1
+		try:
+			yield self
+		finally:
+			self._transaction_depth -= 1
+			if self._transaction_depth == 0:
+				self.flush_signals()
+
+	def in_transaction(self):
+		return self._transaction_depth > 0
+
+	def notify(self, signal, *args):
+		""" Emits the signal attribute named signal, or holds it back until the transaction ends """
+		if self._transaction_depth:
+			self._pending.setdefault((signal, args), None)
+		else:
+			getattr(self, signal).emit(*args)
+
+	def flush_signals(self):
+		# Slots may change the data again while the held back signals go out, those are sent in a later round
+		while self._pending or self._changes:
+			changes, self._changes = self._changes, []
+			if changes:
+				self.changes.emit(changes)
+
+			pending, self._pending = self._pending, {}
+			for signal, args in pending:
+				getattr(self, signal).emit(*args)
+
+	def frame_signal(self):
+		self.notify("active_frame_changed")
+
+	@property
+	def selected(self):
+		return self._selected
+
+	@selected.setter
+	def selected(self, sequences):
+		self._selected = Selection(sequences)
+
+	def position(self, sequence):
+		""" Index of sequence in sequences """
+		index = self._positions.get(id(sequence))
+		if index is None or index >= len(self.sequences) or self.sequences[index] is not sequence:
+			self._positions = {id(item): i for i, item in enumerate(self.sequences)}
+			index = self._positions.get(id(sequence))
+			if index is None:
+				raise ValueError("Sequence %s is not in the project" % sequence.name)
+		return index
+
+	def unique_name(self, name):
+		""" Returns name, or name with the first free number appended when a sequence already has it """
+		if name not in self._names:
+			return name
+		number = 1
+		while "%s_%s" % (name, number) in self._names:
+			number += 1
+		return "%s_%s" % (name, number)
+
+	def adopt(self, sequence):
+		# The sequence's name becomes unique and is kept in the name map from now on
+		sequence.name = self.unique_name(sequence.name)
+		self._names[sequence.name] = sequence
+		sequence._names = self._names
+
+	def disown(self, sequence):
+		del self._names[sequence.name]
+		sequence._names = None
+
+	def add_change(self, change):
+		""" Emits a Change, or holds it back until the transaction ends. Alterations of the same frames
+			made one after the other in a transaction are merged """
+		if not self._transaction_depth:
+			self.changes.emit([change])
+		elif not self._changes or not self._changes[-1].merge(change):
+			self._changes.append(change)
+
+	def new_sequence(self, name=None, active=False, frames=None, columns=None):
+		""" Adds a sequence with the given frames, or frames made from columns as AnimationSequence.add_columns takes them """
+		if name is None:
+			name = "Sequence_" + str(len(self.sequences))
+
+		sequence = self.sequence_class(name=name)
+		self.adopt(sequence)
+		sequence.active_frame_changed.connect(self.frame_signal)
+		sequence.changed.connect(self.add_change)
+
+		# Signals go out once the sequence is in place and active, slots of active_frame_changed look at both
+		with self.transaction():
+			self.sequences.append(sequence)
+			if active:
+				self.active_sequence = sequence
+				self.selected = [sequence]
+
+			# Bulk insert, the sequence is announced once with all of its frames
+			if frames:
+				sequence.add_frames(frames)
+			if columns is not None:
+				sequence.add_columns(columns)
+
+			self.add_change(Change(AnimationEvent.NEW_SEQUENCE, sequence, index=len(self.sequences) - 1))
+			self.notify("data_changed", AnimationEvent.NEW_SEQUENCE)
+		return sequence
+
+	def insert_sequence(self, index, sequence):
+		""" Puts a sequence, one that was deleted, back at index. It is renamed if its name has been taken since """
+		self.adopt(sequence)
+		self.sequences.insert(index, sequence)
+		self.add_change(Change(AnimationEvent.NEW_SEQUENCE, sequence, index=index))
+		self.notify("data_changed", AnimationEvent.NEW_SEQUENCE)
+
+	def get_sequence(self, name):
+		return self._names.get(name)
+
+	def del_sequence(self, sequence):
+		if sequence == self.active_sequence:
+			self.active_sequence = None
+		self.selected.discard(sequence)
+		index = self.position(sequence)
+		del self.sequences[index]
+		self.disown(sequence)
+		self.add_change(Change(AnimationEvent.SEQUENCE_DELETED, sequence, index=index))
+		self.notify("data_changed", AnimationEvent.SEQUENCE_DELETED)
+
+	@property
+	def active_sequence(self):
+		return self._active_sequence
+
+	@active_sequence.setter
+	def active_sequence(self, sequence):
+		self._active_sequence = sequence
+		self.notify("active_sequence_changed")
+		self.notify("data_changed", AnimationEvent.ACTIVE_SEQUENCE_CHANGED)
+		logging.debug("active sequence changed")
+
+	@active_sequence.deleter
+	def active_sequence(self):
+		for frame in self._active_sequence.frames:
+			del frame
+		index = self.position(self._active_sequence)
+		del self.sequences[index]
+		self.disown(self._active_sequence)
+		self.selected.remove(self._active_sequence)
+		self.add_change(Change(AnimationEvent.SEQUENCE_DELETED, self._active_sequence, index=index))
+		self._active_sequence = None
+		self.notify("data_changed", AnimationEvent.SEQUENCE_DELETED)
+		self.notify("data_changed", AnimationEvent.SEQUENCE_SELECTION_CHANGED)
+		self.notify("data_changed", AnimationEvent.ACTIVE_SEQUENCE_CHANGED)
+
+	@property
+	def active_frame(self):
+		if self.active_sequence is not None:
+			return self.active_sequence.active_frame
+		else:
+			return None
+
+	@active_frame.setter
+	def active_frame(self, frame):
+		self.active_sequence.active_frame = frame
+
+	@active_frame.deleter
+	def active_frame(self):
+		if self.active_sequence.active_frame is not None:
+			self.active_sequence.remove_frame(self.active_frame)
+
+	def select(self, name):
+		""" Selects a sequence, given as itself or by name """
+		seq = name if isinstance(name, AnimationSequence) else self.get_sequence(name)
+		if seq not in self.selected:
+			self.selected.append(seq)
+			self.notify("data_changed", AnimationEvent.SEQUENCE_SELECTION_CHANGED)
+	
+	def selected_frames(self):
+		frames = []
+		for sequence in self.selected:
+			for frame in sequence.selected:
+				frames.append(frame)
+				
+		return frames
+	
+	def deselect(self, name):
+		seq = name if isinstance(name, AnimationSequence) else self.get_sequence(name)
+		if seq in self.selected:
+			self.selected.remove(seq)
+			self.notify("data_changed", AnimationEvent.SEQUENCE_SELECTION_CHANGED)
+
+	def select_all(self):
+		self.selected = self.sequences
+		self.notify("data_changed", AnimationEvent.SEQUENCE_SELECTION_CHANGED)
+
+	def deselect_all(self):
+		self.selected = []
+		self.active_sequence = None
+		self.notify("data_changed", AnimationEvent.SEQUENCE_SELECTION_CHANGED)
+
+
+	def export_data(self):
+		sequence_data = []
+		for sequence in self.sequences:
+			frame_data = []
+			for (x, y, width, height, shift_x, shift_y), duration in zip(sequence.table.rows(), sequence.table.duration):
+				frame = {
+					"pos": (x, y),
+					"size": (width, height),
+					"shift": (shift_x, shift_y)
+				}
+				# Only frames that don't last 1 / speed have a duration
+				if duration:
+					frame["duration"] = duration
+				frame_data.append(frame)
+			sequence_data.append({
+				"name": sequence.name,
+				"speed": sequence.speed,
+				"frames": frame_data
+			})
+
+		output = {
+			"fpath": self.spritesheet_path,
+			"sequences": sequence_data
+		}
+
+		return output
+
+	@classmethod
+	def import_data(cls, data):
+		animation_data = cls(data['fpath'])
+		for sequence in data['sequences']:
+			rows = [(frame['pos'][0], frame['pos'][1], frame['size'][0], frame['size'][1],
+					 frame['shift'][0], frame['shift'][1], frame.get('duration', 0)) for frame in sequence['frames']]
+			new_sequence = animation_data.new_sequence(sequence['name'], active=True, columns=tuple(zip(*rows)))
+			new_sequence.speed = sequence['speed']
+			if new_sequence.frames:
+				new_sequence.set_sole(new_sequence.frames[-1])
+
+		return animation_data
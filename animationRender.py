@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+
+""" Renders animation sequences to animated GIF, APNG or numbered PNG files.
+
+	Frames are composited one at a time onto a canvas that fits every frame of the sequence
+	and handed straight to a streaming writer, so a sequence is never held in memory as a whole.
+	Independent sequences are rendered in a process pool. Its workers are spawned, not forked,
+	as the editor has Qt threads running that a forked child could deadlock on.
+"""
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import QPoint, QRect, Qt, QBuffer, QIODevice
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from array import array
+import logging
+import multiprocessing
+import os
+import re
+import struct
+import time
+import zlib
+
+from animationTypes import AnimationFrame
+from frameTable import FrameTable
+from imageStore import image_store
+
+FORMATS = {
+	"gif": "Animated GIF",
+	"apng": "Animated PNG",
+	"png": "PNG sequence"
+}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Channel values rounded to 6 levels, sheets with too many colours for a GIF palette are posterized with it
+POSTERIZE = bytes(round(value / 51) * 51 for value in range(256))
+
+UNSAFE_NAME = re.compile(r'[^\w\-. ]+')
+
+
+def frame_offset(frame):
+	""" Top left of the frame relative to the anchor point, as AnimationPlayer.drawFrame places it """
+	return QPoint(frame.shift.x(), frame.shift.y() - frame.size().height())
+
+
+def sequence_canvas(frames):
+	""" Returns the rect, relative to the anchor point, that every frame of the sequence fits in """
+	canvas = QRect()
+	for frame in frames:
+		canvas = canvas.united(QRect(frame_offset(frame), frame.normalized().size()))
+	return canvas
+
+
+def render_frames(frames, image, canvas):
+	""" Yields each frame composited onto its own transparent canvas sized image, one at a time """
+	origin = -canvas.topLeft()
+	for frame in frames:
+		target = QtGui.QImage(canvas.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+		target.fill(Qt.transparent)
+
+		qp = QtGui.QPainter()
+		qp.begin(target)
+		qp.drawImage(origin + frame_offset(frame), image, frame.normalized())
+		qp.end()
+
+		yield target
+
+
+def encode_png(image):
+	""" Returns the PNG encoding of image as a list of (type, data) chunks """
+	buffer = QBuffer()
+	buffer.open(QIODevice.WriteOnly)
+	if not image.save(buffer, "PNG"):
+		raise IOError("Could not encode frame")
+	data = bytes(buffer.data())
+
+	chunks = []
+	offset = len(PNG_SIGNATURE)
+	while offset < len(data):
+		length, chunk_type = struct.unpack(">I4s", data[offset:offset + 8])
+		chunks.append((chunk_type, data[offset + 8:offset + 8 + length]))
+		offset += length + 12
+	return chunks
+
+
+def png_chunk(chunk_type, data):
+	return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def frame_delays(frame_count, speed, unit, durations=None):
+	""" Yields the delay of each frame in ticks of 1 / unit seconds. Frames last 1 / speed,
+		or the milliseconds durations gives them when it isn't 0. The rounding error is carried
+		over to the next frame, so the whole animation keeps the duration the frames add up to """
+	default = Fraction(1000) / Fraction(speed)
+	elapsed_ms = Fraction(0)
+	previous = 0
+	for i in range(frame_count):
+		elapsed_ms += durations[i] if durations and durations[i] else default
+		elapsed = round(elapsed_ms * unit / 1000)
+		yield elapsed - previous
+		previous = elapsed
+
+
+class PngSequenceWriter:
+	""" Writes every frame to its own numbered PNG in a directory """
+
+	extension = ""
+
+	def __init__(self, path, size, frame_count, speed, durations=None):
+		os.makedirs(path, exist_ok=True)
+		self.path = path
+		self.digits = max(4, len(str(frame_count - 1)))
+		self.index = 0
+
+	def add_frame(self, image):
+		name = os.path.join(self.path, "%s_%0*d.png" % (os.path.basename(self.path), self.digits, self.index))
+		if not image.save(name, "PNG"):
+			raise IOError("Could not write " + name)
+		self.index += 1
+
+	def close(self):
+		pass
+
+
+class ApngWriter:
+	""" Streams frames into an animated PNG. Each frame is encoded by Qt and its image data
+		rewrapped into APNG frame chunks as it arrives """
+
+	extension = ".png"
+
+	def __init__(self, path, size, frame_count, speed, durations=None, loops=0):
+		self.file = open(path, 'wb')
+		self.size = size
+		self.frame_count = frame_count
+		self.loops = loops
+		self.header = None
+		self.sequence_number = 0
+
+		# fcTL delays are a fraction of a second, 1 / speed or the frame's own duration when it fits in 16 bits
+		default = Fraction(1) / Fraction(speed).limit_denominator(1000)
+		self.delays = iter([self.fit_delay(Fraction(durations[i], 1000) if durations and durations[i] else default)
+							for i in range(frame_count)])
+
+	@staticmethod
+	def fit_delay(delay):
+		return delay.limit_denominator(0xFFFF) if delay.numerator <= 0xFFFF else Fraction(0xFFFF, 1)
+
+	def add_frame(self, image):
+		chunks = encode_png(image.convertToFormat(QtGui.QImage.Format_ARGB32))
+
+		if self.header is None:
+			# The first frame is also the default image, its header and ancillary chunks start the file
+			self.header = chunks[0][1]
+			self.file.write(PNG_SIGNATURE)
+			self.file.write(png_chunk(b'IHDR', self.header))
+			self.file.write(png_chunk(b'acTL', struct.pack(">II", self.frame_count, self.loops)))
+			for chunk_type, data in chunks[1:]:
+				if chunk_type == b'IDAT':
+					break
+				self.file.write(png_chunk(chunk_type, data))
+		elif chunks[0][1] != self.header:
+			raise ValueError("Frame %s was encoded differently from the first frame" % self.sequence_number)
+
+		delay = next(self.delays)
+		self.file.write(png_chunk(b'fcTL', struct.pack(">IIIIIHHBB", self.next_sequence_number(),
+													   self.size.width(), self.size.height(), 0, 0,
+													   delay.numerator, delay.denominator,
+													   0, 0))) # Leave the canvas as is, replace it with the frame
+
+		first_frame = self.sequence_number == 1
+		for chunk_type, data in chunks:
+			if chunk_type == b'IDAT':
+				if first_frame:
+					self.file.write(png_chunk(b'IDAT', data))
+				else:
+					self.file.write(png_chunk(b'fdAT', struct.pack(">I", self.next_sequence_number()) + data))
+
+	def next_sequence_number(self):
+		number = self.sequence_number
+		self.sequence_number += 1
+		return number
+
+	def close(self):
+		self.file.write(png_chunk(b'IEND', b''))
+		self.file.close()
+
+
+class GifWriter:
+	""" Streams frames into an animated GIF. Every frame gets its own palette of the colours it uses,
+		with one entry kept for pixels that are less than half opaque """
+
+	extension = ".gif"
+
+	def __init__(self, path, size, frame_count, speed, durations=None, loops=0):
+		self.file = open(path, 'wb')
+		self.size = size
+		self.delays = frame_delays(frame_count, speed, 100, durations) # Centiseconds
+
+		self.file.write(b'GIF89a')
+		self.file.write(struct.pack("<HHBBB", size.width(), size.height(), 0, 0, 0))
+		self.file.write(b'\x21\xff\x0bNETSCAPE2.0' + struct.pack("<BBHB", 3, 1, loops, 0))
+
+	def add_frame(self, image):
+		palette, transparent, pixels = self.index_colors(image)
+
+		bits = max(1, (len(palette) - 1).bit_length())
+		palette += [0] * ((1 << bits) - len(palette))
+		color_table = b''.join(struct.pack(">I", color)[1:] for color in palette)
+
+		# Dispose to background, so transparent pixels don't show the frame before
+		self.file.write(b'\x21\xf9\x04' + struct.pack("<BHBB", 2 << 2 | 1, next(self.delays), transparent, 0))
+		self.file.write(b'\x2c' + struct.pack("<HHHHB", 0, 0, self.size.width(), self.size.height(), 0x80 | (bits - 1)))
+		self.file.write(color_table)
+
+		min_code_size = max(2, bits)
+		data = lzw_encode(pixels, min_code_size)
+		self.file.write(bytes((min_code_size,)))
+		for start in range(0, len(data), 255):
+			block = data[start:start + 255]
+			self.file.write(bytes((len(block),)) + block)
+		self.file.write(b'\x00')
+
+	@staticmethod
+	def index_colors(image):
+		""" Returns (palette, transparent index, one byte per pixel) for a frame """
+		image = image.convertToFormat(QtGui.QImage.Format_ARGB32)
+		raw = image.constBits().asstring(image.sizeInBytes())
+
+		colors = array('I', raw) # Rows of 32 bit pixels are never padded
+		unique = set(colors)
+		opaque = {color | 0xFF000000 for color in unique if color >> 24 >= 128}
+		if len(opaque) > 255:
+			colors = array('I', raw.translate(POSTERIZE))
+			unique = set(colors)
+			opaque = {color | 0xFF000000 for color in unique if color >> 24 >= 128}
+
+		palette = sorted(opaque)
+		transparent = len(palette)
+		indices = {color: i for i, color in enumerate(palette)}
+		lookup = {color: indices.get(color | 0xFF000000, transparent) if color >> 24 >= 128 else transparent
+				  for color in unique}
+
+		palette.append(0)
+		return palette, transparent, bytes(map(lookup.__getitem__, colors))
+
+	def close(self):
+		self.file.write(b'\x3b')
+		self.file.close()
+
+
+def lzw_encode(pixels, min_code_size):
+	""" Variable length LZW as GIF image data uses it, codes are packed least significant bit first """
+	clear_code = 1 << min_code_size
+	first_code = clear_code + 2
+	code_size = min_code_size + 1
+	next_code = first_code
+	table = {}
+
+	output = bytearray()
+	buffer = clear_code
+	buffered = code_size
+
+	prefix = pixels[0]
+	for pixel in pixels[1:]:
+		key = prefix << 8 | pixel
+		code = table.get(key)
+		if code is not None:
+			prefix = code
+			continue
+
+		buffer |= prefix << buffered
+		buffered += code_size
+
+		if next_code == 4096:
+			# Table full, start over
+			buffer |= clear_code << buffered
+			buffered += code_size
+			table = {}
+			next_code = first_code
+			code_size = min_code_size + 1
+		else:
+			if next_code == 1 << code_size:
+				code_size += 1
+			table[key] = next_code
+			next_code += 1
+
+		while buffered >= 8:
+			output.append(buffer & 0xFF)
+			buffer >>= 8
+			buffered -= 8
+
+		prefix = pixel
+
+	buffer |= prefix << buffered
+	buffered += code_size
+	buffer |= (clear_code + 1) << buffered
+	buffered += code_size
+	while buffered > 0:
+		output.append(buffer & 0xFF)
+		buffer >>= 8
+		buffered -= 8
+
+	return bytes(output)
+
+
+WRITERS = {
+	"gif": GifWriter,
+	"apng": ApngWriter,
+	"png": PngSequenceWriter
+}
+
+
+def output_name(name):
+	""" Sequence names are free text, keep them usable as file names """
+	return UNSAFE_NAME.sub("_", str(name)).strip() or "sequence"
+
+
+def render_sequence(spritesheet_path, sequence_data, path, output_format):
+	""" Renders one exported sequence to path. Runs in a worker process, so it only takes and returns plain data """
+	start = time.perf_counter()
+	table = FrameTable()
+	rows = table.extend(tuple(zip(*[(frame['pos'][0], frame['pos'][1], frame['size'][0], frame['size'][1],
+									 frame['shift'][0], frame['shift'][1], frame.get('duration', 0))
+									for frame in sequence_data['frames']])))
+	frames = [AnimationFrame.view(table, row) for row in rows]
+
+	image = image_store.get(spritesheet_path)
+	if image.isNull():
+		raise IOError("spritesheet '%s' can't be read" % spritesheet_path)
+
+	canvas = sequence_canvas(frames)
+	if canvas.isEmpty():
+		raise ValueError("sequence '%s' has no frames with pixels" % sequence_data['name'])
+
+	writer = WRITERS[output_format](path, canvas.size(), len(frames), sequence_data['speed'], table.duration)
+	try:
+		for rendered in render_frames(frames, image, canvas):
+			writer.add_frame(rendered)
+	finally:
+		writer.close()
+
+	return {"path": path, "frames": len(frames), "seconds": time.perf_counter() - start}
+
+
+def render_animation(animation_data, directory, output_format="gif", sequences=None, workers=None):
+	""" Renders every sequence with frames, or only those given, into directory.
+		Returns the results of render_sequence in sequence order """
+	if output_format not in WRITERS:
+		raise ValueError("Unknown output format '%s'" % output_format)
+	os.makedirs(directory, exist_ok=True)
+
+	data = animation_data.export_data()
+	chosen = animation_data.sequences if sequences is None else sequences
+	names = set()
+	jobs = []
+	for sequence, sequence_data in zip(animation_data.sequences, data['sequences']):
+		if sequence not in chosen or not sequence_data['frames'] or sequence_data['speed'] <= 0:
+			continue
+
+		name = output_name(sequence_data['name'])
+		unique_name, number = name, 1
+		while unique_name.lower() in names:
+			number += 1
+			unique_name = "%s_%s" % (name, number)
+		names.add(unique_name.lower())
+
+		path = os.path.join(directory, unique_name + WRITERS[output_format].extension)
+		jobs.append((data['fpath'], sequence_data, path, output_format))
+
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	if workers == 1 or len(jobs) <= 1:
+		results = [render_sequence(*job) for job in jobs]
+	else:
+		with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=multiprocessing.get_context("spawn")) as executor:
+			results = list(executor.map(render_sequence, *zip(*jobs)))
+
+	logging.info("Rendered %s sequences as %s" % (len(results), FORMATS[output_format]))
+	return results
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import QPoint, QRect, Qt
+import hashlib
+import json
+import logging
+import os
+
+
+class SkylineBin:
+	""" One atlas page, packed bottom-left against a skyline of the rects placed so far.
+		The skyline is a list of [x, y, width] segments spanning the page width """
+
+	def __init__(self, width, height, allow_rotate=False):
+		self.width = width
+		self.height = height
+		self.allow_rotate = allow_rotate
+		self.skyline = [[0, 0, width]]
+		self.used_width = 0
+		self.used_height = 0
+
+	def fit(self, index, width, height):
+		""" Returns the y a width x height rect would rest at when placed on segment index, or None """
+		x = self.skyline[index][0]
+		if x + width > self.width:
+			return None
+
+		y = 0
+		remaining = width
+		while remaining > 0:
+			_, segment_y, segment_w = self.skyline[index]
+			y = max(y, segment_y)
+			if y + height > self.height:
+				return None
+			remaining -= segment_w
+			index += 1
+		return y
+
+	def find_position(self, width, height):
+		""" Returns (x, y, rotated) of the lowest, then leftmost spot for a width x height rect, or None """
+		best = None
+		best_score = None
+
+		for w, h, rotated in ((width, height, False), (height, width, True)):
+			if rotated and (not self.allow_rotate or width == height):
+				continue
+			for index in range(len(self.skyline)):
+				y = self.fit(index, w, h)
+				if y is not None:
+					score = (y + h, self.skyline[index][0])
+					if best_score is None or score < best_score:
+						best_score = score
+						best = (self.skyline[index][0], y, rotated)
+
+		return best
+
+	def place(self, x, y, width, height):
+		""" Raises the skyline under a placed rect """
+		index = 0
+		while self.skyline[index][0] != x:
+			index += 1
+
+		self.skyline.insert(index, [x, y + height, width])
+
+		# Trim the segments now covered by the new one
+		right = x + width
+		i = index + 1
+		while i < len(self.skyline) and self.skyline[i][0] < right:
+			segment = self.skyline[i]
+			segment_right = segment[0] + segment[2]
+			if segment_right <= right:
+				del self.skyline[i]
+			else:
+				segment[2] = segment_right - right
+				segment[0] = right
+				break
+
+		# Merge neighbours of the same height
+		i = max(index - 1, 0)
+		while i < len(self.skyline) - 1 and i <= index + 1:
+			if self.skyline[i][1] == self.skyline[i + 1][1]:
+				self.skyline[i][2] += self.skyline[i + 1][2]
+				del self.skyline[i + 1]
+			else:
+				i += 1
+
+		self.used_width = max(self.used_width, right)
+		self.used_height = max(self.used_height, y + height)
+
+
+class AtlasPacker:
+	""" Packs the frames of an animation into as few, tightly packed atlas pages as possible.
+		Frames with the same pixels are packed once and shared. """
+
+	EMPTY_KEY = "empty"
+
+	def __init__(self, max_size=2048, padding=1, allow_rotate=False):
+		self.max_size = max_size
+		self.padding = padding
+		self.allow_rotate = allow_rotate
+
+	def pack(self, animation_data, image):
+		""" Returns (sprites, pages, placements, frame_keys).
+			sprites maps each unique sprite key to its source rect on the spritesheet,
+			pages is a list of atlas (width, height), placements maps sprite keys to (page, x, y, rotated)
+			and frame_keys holds the sprite key of every frame, per sequence """
+		sprites = {} # key -> source QRect
+		frame_keys = []
+
+		sheet_rect = image.rect()
+		for sequence in animation_data.sequences:
+			keys = []
+			for frame in sequence.frames:
+				source = frame.normalized().intersected(sheet_rect)
+				key = self.sprite_key(image, source) if not source.isEmpty() else self.EMPTY_KEY
+				sprites.setdefault(key, source)
+				keys.append(key)
+			frame_keys.append(keys)
+
+		# Frames outside of the spritesheet have no pixels to pack
+		empty = sprites.pop(self.EMPTY_KEY, None)
+
+		# Biggest first packs tighter
+		order = sorted(sprites.items(), key=lambda item: (max(item[1].width(), item[1].height()),
+														   item[1].width() * item[1].height()), reverse=True)
+
+		bins = []
+		placements = {}
+		for key, source in order:
+			width = source.width() + self.padding
+			height = source.height() + self.padding
+			if width > self.max_size or height > self.max_size:
+				raise ValueError("Frame of %sx%s does not fit in a %s atlas" % (source.width(), source.height(), self.max_size))
+
+			for page, atlas in enumerate(bins):
+				position = atlas.find_position(width, height)
+				if position is not None:
+					break
+			else:
+				atlas = SkylineBin(self.max_size, self.max_size, self.allow_rotate)
+				bins.append(atlas)
+				page = len(bins) - 1
+				position = atlas.find_position(width, height)
+
+			x, y, rotated = position
+			if rotated:
+				atlas.place(x, y, height, width)
+			else:
+				atlas.place(x, y, width, height)
+			placements[key] = (page, x, y, rotated)
+
+		if empty is not None:
+			# On no page, there is nothing to draw
+			sprites[self.EMPTY_KEY] = QRect()
+			placements[self.EMPTY_KEY] = (None, 0, 0, False)
+
+		pages = [(atlas.used_width, atlas.used_height) for atlas in bins]
+		return sprites, pages, placements, frame_keys
+
+	@staticmethod
+	def sprite_key(image, source):
+		""" Identical pixels give identical keys, so repeated frames are only packed once """
+		pixels = image.copy(source)
+		digest = hashlib.sha1(pixels.constBits().asstring(pixels.sizeInBytes())).hexdigest()
+		return "%sx%s:%s" % (source.width(), source.height(), digest)
+
+	@staticmethod
+	def packed_shift(frame, source):
+		""" Shift of the part of frame inside the sheet, source, so it is drawn where it was in the whole frame.
+			The shift places the bottom left corner, cutting the left moves it right and cutting the bottom moves it up """
+		if source.isEmpty():
+			return frame.shift.x(), frame.shift.y()
+		whole = frame.normalized()
+		return (frame.shift.x() + source.x() - whole.x(),
+				frame.shift.y() - (whole.y() + whole.height() - source.y() - source.height()))
+
+	def export(self, animation_data, image, path):
+		""" Writes the atlas pages next to path as <name>_<page>.png and the frame data to path.
+			Frames keep their unrotated size, rotated frames are stored turned 90 degrees clockwise.
+			Frames that go past the sheet are packed cut down to it, with their shift moved to match.
+			Frames entirely outside of the sheet have a null atlas """
+		sprites, pages, placements, frame_keys = self.pack(animation_data, image)
+
+		base = os.path.splitext(path)[0]
+		page_paths = []
+		rotate = QtGui.QTransform().rotate(90)
+
+		for page, (width, height) in enumerate(pages):
+			atlas = QtGui.QImage(max(width, 1), max(height, 1), QtGui.QImage.Format_ARGB32_Premultiplied)
+			atlas.fill(Qt.transparent)
+
+			qp = QtGui.QPainter()
+			qp.begin(atlas)
+			qp.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+			for key, (sprite_page, x, y, rotated) in placements.items():
+				if sprite_page != page or key == self.EMPTY_KEY:
+					continue
+				if rotated:
+					qp.drawImage(QPoint(x, y), image.copy(sprites[key]).transformed(rotate))
+				else:
+					qp.drawImage(QPoint(x, y), image, sprites[key])
+			qp.end()
+
+			page_path = "%s_%s.png" % (base, page)
+			if not atlas.save(page_path, "PNG"):
+				raise IOError("Could not write atlas page " + page_path)
+			page_paths.append(os.path.basename(page_path))
+
+		sheet_rect = image.rect()
+		sequence_data = []
+		for sequence, keys in zip(animation_data.sequences, frame_keys):
+			frame_data = []
+			for frame, key in zip(sequence.frames, keys):
+				page, x, y, rotated = placements[key]
+				source = sprites[key]
+				frame_data.append({
+					"atlas": page,
+					"pos": (x, y),
+					"size": (source.width(), source.height()),
+					"rotated": rotated,
+					"shift": self.packed_shift(frame, frame.normalized().intersected(sheet_rect))
+				})
+			sequence_data.append({
+				"name": sequence.name,
+				"speed": sequence.speed,
+				"frames": frame_data
+			})
+
+		output = {
+			"atlases": page_paths,
+			"sequences": sequence_data
+		}
+
+		with open(path, 'w') as outfile:
+			outfile.write(json.dumps(output))
+
+		packed_area = sum(width * height for width, height in pages)
+		logging.info("Packed %s frames (%s unique) into %s atlas pages, %s pixels" %
+					 (sum(len(keys) for keys in frame_keys), len(sprites), len(pages), packed_area))
+
+		return output
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+""" Undo and redo.
+
+	Every edit is journaled as a small command holding only what it changed: the values of the frames it altered,
+	or the frames and sequences it took out. Undoing or redoing a command costs the same however big the project is.
+	The journal keeps commands up to a byte budget and forgets the oldest ones past it.
+"""
+
+from collections import deque
+import logging
+from operator import itemgetter
+
+from animationCore import Signal
+
+DEFAULT_BUDGET = 16 * 1024 * 1024
+
+# Estimated memory of a command and of each frame it holds on to, in bytes
+COMMAND_BYTES = 200
+EDIT_BYTES = 200 # Two value tuples
+DETACHED_FRAME_BYTES = 1150 # A frame out of its sequence keeps a frame table of its own
+SEQUENCE_FRAME_BYTES = 120 # A row of a sequence's frame table and its frame
+
+
+def capture(frames):
+	""" Returns the values of frames followed by their duration, to hand to EditFrames before and after an edit """
+	return [frame.values() + (frame.duration(),) for frame in frames]
+
+
+class Command:
+	""" An edit that has been done and can be undone. Commands pushed with the same gesture are merged into one
+		when they allow it, so a drag or a held key is undone in one step """
+
+	__slots__ = ("label", "gesture")
+
+	def __init__(self, label, gesture=None):
+		self.label = label
+		self.gesture = gesture
+
+	def undo(self):
+		raise NotImplementedError
+
+	def redo(self):
+		raise NotImplementedError
+
+	def merge(self, command):
+		""" Folds a later command of the same gesture into this one, returns False when it can't """
+		return False
+
+	def size(self):
+		""" Estimated bytes held by the command """
+		return COMMAND_BYTES
+
+
+class EditFrames(Command):
+	""" Position, size, shift or duration changes of frames. Holds the values of each frame before and after """
+
+	__slots__ = ("sequences", "frames", "before", "after")
+
+	def __init__(self, sequences, frames, before, after, label="Edit frames", gesture=None):
+		super(EditFrames, self).__init__(label, gesture)
+		self.sequences = list(sequences)
+		self.frames = list(frames)
+		self.before = before
+		self.after = after
+
+	def apply(self, values):
+		for frame, frame_values in zip(self.frames, values):
+			frame.set_values(frame_values[:-1])
+			frame.set_duration(frame_values[-1])
+		# Each sequence is told about its own frames only
+		for sequence in self.sequences:
+			frames = [frame for frame in self.frames if sequence.frame_index(frame) is not None]
+			if frames:
+				sequence.update_frames(frames)
+
+	def undo(self):
+		self.apply(self.before)
+
+	def redo(self):
+		self.apply(self.after)
+
+	def merge(self, command):
+		if type(command) is not EditFrames or len(command.frames) != len(self.frames):
+			return False
+		if any(a is not b for a, b in zip(command.frames, self.frames)):
+			return False
+
+		self.after = command.after
+		return True
+
+	def size(self):
+		return COMMAND_BYTES + EDIT_BYTES * len(self.frames)
+
+
+class RemoveFrames(Command):
+	""" Frames taken out of a sequence. Undo puts them back at the rows they had """
+
+	__slots__ = ("sequence", "rows")
+
+	def __init__(self, sequence, frames, label="Delete frames", gesture=None):
+		super(RemoveFrames, self).__init__(label, gesture)
+		self.sequence = sequence
+		self.rows = sorted(((sequence.frame_index(frame), frame) for frame in frames), key=itemgetter(0))
+
+	def remove(self):
+		self.sequence.remove_frames([frame for _, frame in self.rows])
+
+	def restore(self):
+		self.sequence.insert_frames(self.rows)
+
+		frames = [frame for _, frame in self.rows]
+		self.sequence.selected = frames
+		self.sequence.active_frame = frames[-1]
+
+	def undo(self):
+		self.restore()
+
+	def redo(self):
+		self.remove()
+
+	def size(self):
+		return COMMAND_BYTES + DETACHED_FRAME_BYTES * len(self.rows)
+
+
+class AddFrames(RemoveFrames):
+	""" Frames added to a sequence, the reverse of RemoveFrames """
+
+	__slots__ = ()
+
+	def __init__(self, sequence, frames, label="Add frames", gesture=None):
+		super(AddFrames, self).__init__(sequence, frames, label, gesture)
+
+	def undo(self):
+		self.remove()
+
+	def redo(self):
+		self.restore()
+
+
+class RemoveSequence(Command):
+	""" A sequence deleted from the project. The sequence object is kept whole, not copied """
+
+	__slots__ = ("animation_data", "sequence", "position", "frame_count")
+
+	def __init__(self, animation_data, sequence, label="Delete sequence", gesture=None):
+		super(RemoveSequence, self).__init__(label, gesture)
+		self.animation_data = animation_data
+		self.sequence = sequence
+		self.position = animation_data.position(sequence)
+		self.frame_count = len(sequence.frames)
+
+	def remove(self):
+		self.animation_data.del_sequence(self.sequence)
+
+	def restore(self):
+		self.animation_data.insert_sequence(self.position, self.sequence)
+		self.animation_data.active_sequence = self.sequence
+		self.animation_data.selected = [self.sequence]
+
+	def undo(self):
+		self.restore()
+
+	def redo(self):
+		self.remove()
+
+	def size(self):
+		return COMMAND_BYTES + SEQUENCE_FRAME_BYTES * self.frame_count
+
+
+class AddSequence(RemoveSequence):
+	""" A sequence added to the project, the reverse of RemoveSequence """
+
+	__slots__ = ()
+
+	def __init__(self, animation_data, sequence, label="New sequence", gesture=None):
+		super(AddSequence, self).__init__(animation_data, sequence, label, gesture)
+
+	def undo(self):
+		self.remove()
+
+	def redo(self):
+		self.restore()
+
+
+class EditSequence(Command):
+	""" Name or speed change of a sequence. Holds (name, speed) before and after """
+
+	__slots__ = ("sequence", "before", "after")
+
+	def __init__(self, sequence, before, after, label="Edit sequence", gesture=None):
+		super(EditSequence, self).__init__(label, gesture)
+		self.sequence = sequence
+		self.before = before
+		self.after = after
+
+	def undo(self):
+		self.sequence.edit(*self.before)
+
+	def redo(self):
+		self.sequence.edit(*self.after)
+
+	def merge(self, command):
+		if type(command) is not EditSequence or command.sequence is not self.sequence:
+			return False
+
+		self.after = command.after
+		return True
+
+
+class Batch(Command):
+	""" Several commands done and undone as one """
+
+	__slots__ = ("commands",)
+
+	def __init__(self, commands, label, gesture=None):
+		super(Batch, self).__init__(label, gesture)
+		self.commands = list(commands)
+
+	def undo(self):
+		for command in reversed(self.commands):
+			command.undo()
+
+	def redo(self):
+		for command in self.commands:
+			command.redo()
+
+	def size(self):
+		return COMMAND_BYTES + sum(command.size() for command in self.commands)
+
+
+class History:
+	""" The undo and redo stacks of one project, within a byte budget """
+
+	def __init__(self, budget=DEFAULT_BUDGET):
+		self.budget = budget
+		self.undo_stack = deque()
+		self.redo_stack = []
+		self.bytes = 0
+		self.changed = Signal()
+		self.applied = Signal() # Emitted with each command done, undone or redone and whether it was undone
+
+	def push(self, command):
+		""" Records a command that has already been done """
+		self.clear_redo()
+
+		top = self.undo_stack[-1] if self.undo_stack else None
+		if top is not None and command.gesture is not None and top.gesture == command.gesture:
+			old_size = top.size()
+			if top.merge(command):
+				self.bytes += top.size() - old_size
+				self.evict()
+				self.applied.emit(command, False)
+				self.changed.emit()
+				return
+
+		self.undo_stack.append(command)
+		self.bytes += command.size()
+		self.evict()
+		self.applied.emit(command, False)
+		self.changed.emit()
+
+	def apply(self, command):
+		""" Does a command and records it """
+		command.redo()
+		self.push(command)
+
+	def undo(self):
+		if not self.undo_stack:
+			return None
+
+		command = self.undo_stack.pop()
+		command.undo()
+		self.redo_stack.append(command)
+		self.applied.emit(command, True)
+		self.changed.emit()
+		logging.debug("Undo " + command.label)
+		return command
+
+	def redo(self):
+		if not self.redo_stack:
+			return None
+
+		command = self.redo_stack.pop()
+		command.redo()
+		self.undo_stack.append(command)
+		self.applied.emit(command, False)
+		self.changed.emit()
+		logging.debug("Redo " + command.label)
+		return command
+
+	def can_undo(self):
+		return len(self.undo_stack) > 0
+
+	def can_redo(self):
+		return len(self.redo_stack) > 0
+
+	def undo_label(self):
+		return self.undo_stack[-1].label if self.undo_stack else None
+
+	def redo_label(self):
+		return self.redo_stack[-1].label if self.redo_stack else None
+
+	def clear_redo(self):
+		for command in self.redo_stack:
+			self.bytes -= command.size()
+		self.redo_stack = []
+
+	def clear(self):
+		self.undo_stack.clear()
+		self.redo_stack = []
+		self.bytes = 0
+		self.changed.emit()
+
+	def evict(self):
+		# The newest command is always kept, even when it alone is over the budget
+		while self.bytes > self.budget and len(self.undo_stack) > 1:
+			self.bytes -= self.undo_stack.popleft().size()
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+""" Append-only journal of edits, kept next to a project file.
+
+	Every command done, undone or redone in the edit history is appended as a compact binary record of what it changed,
+	with sequences and frames addressed by position. Records are buffered and flushed in batches.
+	After a crash the journal is replayed on top of the last full save of the project.
+	A full save starts the journal over with only the records made since its snapshot.
+	Opening a project doesn't make a journal file, the first edit written or the first save does.
+
+	header      magic, version, size and modification time in nanoseconds of the project file it applies to
+	records     operation, payload length and payload of each edit
+
+	All values are little endian. A record cut short by a crash is ignored.
+"""
+
+from array import array
+import logging
+import os
+import struct
+import sys
+
+import editHistory
+import projectFile
+
+SUFFIX = ".journal"
+MAGIC = b'SPRJ'
+VERSION = 2
+
+HEADER = struct.Struct("<4sHQq")
+RECORD = struct.Struct("<BI")
+COUNT = struct.Struct("<II") # Sequence position, number of entries
+FRAME_ROW = struct.Struct("<I7i") # Row, x, y, width, height, shift x, shift y, duration
+SEQUENCE = struct.Struct("<IdI") # Position, speed, name length
+
+SET_FRAMES = 1 # Frames at rows have new values
+INSERT_FRAMES = 2 # Frames put in at rows, in row order
+REMOVE_FRAMES = 3 # Frames taken out at rows, given in row order as they were before
+INSERT_SEQUENCE = 4 # Sequence with its frames put in at a position
+REMOVE_SEQUENCE = 5 # Sequence taken out at a position
+SET_SEQUENCE = 6 # Sequence at a position has a new speed and name
+
+FLUSH_BYTES = 64 * 1024 # Buffered records are written once they pass this
+COMPACT_BYTES = 4 * 1024 * 1024 # A journal past this should be compacted into a full save
+
+
+def journal_path(project_path):
+	return project_path + SUFFIX
+
+
+def project_stamp(project_path):
+	""" Identifies a saved project file by its size and modification time """
+	stat = os.stat(project_path)
+	return stat.st_size, stat.st_mtime_ns
+
+
+def pack_name(name):
+	return str(name).encode('utf-8')
+
+
+def read_records(data):
+	""" Returns [(operation, payload)] of the records in data after the header, and where the last whole record ends """
+	records = []
+	position = HEADER.size
+	while position + RECORD.size <= len(data):
+		operation, length = RECORD.unpack_from(data, position)
+		end = position + RECORD.size + length
+		if end > len(data):
+			break
+		records.append((operation, data[position + RECORD.size:end]))
+		position = end
+	return records, position
+
+
+def apply_record(animation_data, operation, payload):
+	""" Redoes one record on animation_data """
+	try:
+		if operation in (SET_FRAMES, INSERT_FRAMES, REMOVE_FRAMES):
+			position, count = COUNT.unpack_from(payload, 0)
+			sequence = animation_data.sequences[position]
+
+			if operation == REMOVE_FRAMES:
+				rows = struct.unpack_from("<%sI" % count, payload, COUNT.size)
+				sequence.remove_frames([sequence.frames[row] for row in rows])
+				return
+
+			entries = [FRAME_ROW.unpack_from(payload, COUNT.size + i * FRAME_ROW.size) for i in range(count)]
+			if operation == SET_FRAMES:
+				frames = []
+				for entry in entries:
+					frame = sequence.frames[entry[0]]
+					frame.set_values(entry[1:-1])
+					frame.set_duration(entry[-1])
+					frames.append(frame)
+				sequence.update_frames(frames)
+			else:
+				sequence.insert_frames([(entry[0], sequence.frame_class.from_values(entry[1:-1], entry[-1])) for entry in entries])
+
+		elif operation == INSERT_SEQUENCE:
+			position, speed, name_length = SEQUENCE.unpack_from(payload, 0)
+			name = payload[SEQUENCE.size:SEQUENCE.size + name_length].decode('utf-8')
+
+			frames = array('i')
+			frames.frombytes(payload[SEQUENCE.size + name_length:])
+			if sys.byteorder != 'little':
+				frames.byteswap()
+
+			columns = [frames[field::projectFile.FRAME_FIELDS] for field in range(projectFile.FRAME_FIELDS)]
+			sequence = animation_data.new_sequence(name, columns=columns)
+			sequence.speed = projectFile.speed_value(speed)
+			animation_data.sequences.insert(position, animation_data.sequences.pop())
+
+		elif operation == REMOVE_SEQUENCE:
+			position, = struct.unpack_from("<I", payload, 0)
+			animation_data.del_sequence(animation_data.sequences[position])
+
+		elif operation == SET_SEQUENCE:
+			position, speed, name_length = SEQUENCE.unpack_from(payload, 0)
+			name = payload[SEQUENCE.size:SEQUENCE.size + name_length].decode('utf-8')
+			animation_data.sequences[position].edit(name, projectFile.speed_value(speed))
+
+		else:
+			raise ValueError("Unknown journal record %s" % operation)
+
+	except (IndexError, struct.error, UnicodeDecodeError) as error:
+		raise ValueError("Journal record %s does not fit the project: %s" % (operation, error))
+
+
+class Journal:
+	""" The journal of one project. Until the project has been saved once, records are only buffered """
+
+	def __init__(self, project_path, animation_data):
+		self.path = journal_path(project_path)
+		self.project_path = project_path
+		self.animation_data = animation_data
+		self.buffer = bytearray()
+		self.started = False # The file exists and has a header
+		self.written = 0 # Record bytes in the file
+		self.mark = None # Record bytes there were when the snapshot of a running save was taken
+
+	def replay(self):
+		""" Redoes the records of a journal left behind by a crash and carries on appending to it.
+			Returns the number of records replayed, None when there was no journal for the saved project """
+		try:
+			with open(self.path, 'rb') as infile:
+				data = infile.read()
+		except FileNotFoundError:
+			return None
+
+		if len(data) < HEADER.size:
+			return None
+		magic, version, size, mtime = HEADER.unpack_from(data, 0)
+		if magic != MAGIC or version > VERSION:
+			raise ValueError("Not a journal this editor can read")
+		if version < VERSION:
+			logging.warning("Journal %s was written by an older editor, it is ignored" % self.path)
+			return None
+		if (size, mtime) != project_stamp(self.project_path):
+			logging.warning("Journal %s is for another save of the project, it is ignored" % self.path)
+			return None
+
+		records, end = read_records(data)
+		with self.animation_data.transaction():
+			for operation, payload in records:
+				apply_record(self.animation_data, operation, payload)
+
+		# A record cut short is dropped, new records follow the last whole one
+		with open(self.path, 'r+b') as outfile:
+			outfile.truncate(end)
+		self.started = True
+		self.written = end - HEADER.size
+		return len(records)
+
+	def record(self, command, undone=False):
+		""" Appends what command changed, as done or undone """
+		if isinstance(command, editHistory.Batch):
+			for part in (reversed(command.commands) if undone else command.commands):
+				self.record(part, undone)
+			return
+
+		if isinstance(command, editHistory.EditFrames):
+			for sequence in command.sequences:
+				rows = [(sequence.frame_index(frame), frame) for frame in command.frames]
+				rows = [(row, frame) for row, frame in rows if row is not None]
+				if rows:
+					self.add_frame_rows(SET_FRAMES, sequence, rows)
+
+		elif isinstance(command, editHistory.RemoveFrames):
+			if isinstance(command, editHistory.AddFrames) == undone:
+				rows = [row for row, _ in command.rows]
+				self.add(REMOVE_FRAMES, COUNT.pack(self.position(command.sequence), len(rows)) +
+						 struct.pack("<%sI" % len(rows), *rows))
+			else:
+				self.add_frame_rows(INSERT_FRAMES, command.sequence, command.rows)
+
+		elif isinstance(command, editHistory.RemoveSequence):
+			if isinstance(command, editHistory.AddSequence) == undone:
+				self.add(REMOVE_SEQUENCE, struct.pack("<I", command.position))
+			else:
+				sequence = command.sequence
+				name = pack_name(sequence.name)
+				frames = array('i')
+				for row, duration in zip(sequence.table.rows(), sequence.table.duration):
+					frames.extend(row)
+					frames.append(duration)
+				if sys.byteorder != 'little':
+					frames.byteswap()
+				self.add(INSERT_SEQUENCE, SEQUENCE.pack(command.position, sequence.speed, len(name)) + name + frames.tobytes())
+
+		elif isinstance(command, editHistory.EditSequence):
+			name = pack_name(command.sequence.name)
+			self.add(SET_SEQUENCE, SEQUENCE.pack(self.position(command.sequence), command.sequence.speed, len(name)) + name)
+
+		else:
+			logging.warning("%s is not journaled" % type(command).__name__)
+
+	def position(self, sequence):
+		return self.animation_data.position(sequence)
+
+	def add_frame_rows(self, operation, sequence, rows):
+		payload = bytearray(COUNT.pack(self.position(sequence), len(rows)))
+		for row, frame in rows:
+			payload += FRAME_ROW.pack(row, *frame.values(), frame.duration())
+		self.add(operation, payload)
+
+	def add(self, operation, payload):
+		self.buffer += RECORD.pack(operation, len(payload))
+		self.buffer += payload
+		if len(self.buffer) >= FLUSH_BYTES:
+			self.flush()
+
+	def start(self):
+		""" Starts the file, records written from now on apply on top of the project file as it is """
+		with open(self.path, 'wb') as outfile:
+			outfile.write(HEADER.pack(MAGIC, VERSION, *project_stamp(self.project_path)))
+		self.started = True
+		self.written = 0
+
+	def flush(self):
+		""" Writes the buffered records, starting the file if need be. Records of a project
+			that has never been saved stay buffered until it is """
+		if not self.buffer:
+			return
+		if not self.started:
+			if not os.path.exists(self.project_path):
+				return
+			self.start()
+
+		with open(self.path, 'ab') as outfile:
+			outfile.write(self.buffer)
+			outfile.flush()
+			os.fsync(outfile.fileno())
+		self.written += len(self.buffer)
+		self.buffer.clear()
+
+	def size(self):
+		return HEADER.size + self.written + len(self.buffer)
+
+	def needs_compaction(self):
+		return self.size() > COMPACT_BYTES
+
+	def mark_snapshot(self):
+		""" Call when a full save takes its snapshot, records from here on are kept when the save is done """
+		self.flush()
+		self.mark = self.written + len(self.buffer)
+
+	def rebase(self):
+		""" Call when a full save is done. The journal starts over on top of the saved file,
+			holding only the records made after the save's snapshot """
+		mark = self.mark if self.mark is not None else 0
+		self.mark = None
+
+		records = b''
+		if self.started:
+			with open(self.path, 'rb') as infile:
+				records = infile.read()[HEADER.size:]
+		records += self.buffer
+
+		with projectFile.replace_file(self.path, 'wb') as outfile:
+			outfile.write(HEADER.pack(MAGIC, VERSION, *project_stamp(self.project_path)))
+			outfile.write(records[mark:])
+
+		self.started = True
+		self.written = len(records) - mark
+		self.buffer.clear()
+
+	def discard(self):
+		""" Removes the journal, for when the project is closed with nothing left to recover """
+		self.buffer.clear()
+		self.started = False
+		self.written = 0
+		self.mark = None
+		try:
+			os.remove(self.path)
+		except FileNotFoundError:
+			pass
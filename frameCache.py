@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+""" Frames of a sequence pre-rendered for playback.
+
+	Each frame is cut out of the spritesheet and scaled to the player's zoom once, so a tick of the player is one blit.
+	Frames of the sequence being played are rendered ahead on a worker thread, a frame that isn't ready yet
+	is rendered when it is first drawn. Entries are keyed by the frame and checked against its values,
+	so a frame that was moved, resized or shifted is rendered again.
+"""
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import QObject, QRect, QThread, Qt, pyqtSignal
+from collections import OrderedDict
+import threading
+
+
+def render_frame(image, values, scale):
+	""" Returns the sprite of a frame with (x, y, width, height, shift_x, shift_y) values, scaled like the player draws it """
+	x, y, width, height = values[:4]
+	sprite = QRect(x, y, width, height).normalized()
+	scaled = image.copy(sprite)
+	if scale != 1:
+		scaled = scaled.scaled(max(1, round(sprite.width() * scale)), max(1, round(sprite.height() * scale)),
+							   Qt.IgnoreAspectRatio, Qt.FastTransformation)
+	return scaled
+
+
+class FrameRenderer(QThread):
+	""" Renders frames on a worker thread. Frames are only used as keys there, their values are passed along """
+
+	RENDER_BATCH = 32 # Frames rendered before the results are handed over
+
+	rendered = pyqtSignal(int, list) # Generation, [(frame, values, image)]
+
+	def __init__(self, parent=None):
+		super(FrameRenderer, self).__init__(parent)
+		self.generation = 0
+		self.image = None
+		self.jobs = []
+		self.scale = 1
+		self._cancel = threading.Event()
+
+	def render(self, generation, image, jobs, scale):
+		""" Starts rendering jobs, (frame, values) pairs, cancelling a render that is still running """
+		self.cancel()
+		self.wait()
+
+		self.generation = generation
+		self.image = image
+		self.jobs = jobs
+		self.scale = scale
+		self._cancel.clear()
+		self.start()
+
+	def cancel(self):
+		self._cancel.set()
+
+	def run(self):
+		results = []
+		for frame, values in self.jobs:
+			if self._cancel.is_set():
+				return
+			results.append((frame, values, render_frame(self.image, values, self.scale)))
+			if len(results) >= self.RENDER_BATCH:
+				self.rendered.emit(self.generation, results)
+				results = []
+
+		if results:
+			self.rendered.emit(self.generation, results)
+
+
+class FrameCache(QObject):
+	""" Pixmaps of frames at one scale, in an LRU cache with a memory budget """
+
+	DEFAULT_BUDGET = 64 * 1024 * 1024 # Bytes
+
+	def __init__(self, parent=None, budget=DEFAULT_BUDGET):
+		super(FrameCache, self).__init__(parent)
+		self.image = None
+		self.scale = 1
+		self.budget = budget
+
+		self._entries = OrderedDict() # frame -> (values, QImage from the worker or QPixmap once drawn)
+		self._bytes = 0
+		self._generation = 0 # Renders started before the image or scale last changed are ignored
+
+		self.hits = 0
+		self.misses = 0
+
+		self.renderer = FrameRenderer(self)
+		self.renderer.rendered.connect(self.store)
+
+	def set_image(self, image):
+		self.image = image
+		self.clear()
+
+	def set_scale(self, scale):
+		if scale != self.scale:
+			self.scale = scale
+			self.clear()
+
+	def clear(self):
+		self.renderer.cancel()
+		self._generation += 1
+		self._entries.clear()
+		self._bytes = 0
+
+	def stop(self):
+		""" Call before the cache goes away, waits for the worker to finish """
+		self.renderer.cancel()
+		self.renderer.wait()
+
+	def stats(self):
+		return {
+			"frames": len(self._entries),
+			"bytes": self._bytes,
+			"budget": self.budget,
+			"hits": self.hits,
+			"misses": self.misses
+		}
+
+	@staticmethod
+	def image_bytes(image):
+		return image.width() * image.height() * 4
+
+	def fill(self, frames):
+		""" Renders the frames that aren't cached on the worker thread, as many as fit the budget """
+		if self.image is None:
+			return
+
+		jobs = []
+		budget = self.budget - self._bytes
+		for frame in frames:
+			entry = self._entries.get(frame)
+			values = frame.values()
+			if entry is not None and entry[0] == values:
+				continue
+
+			budget -= abs(values[2] * values[3]) * self.scale * self.scale * 4
+			if budget < 0:
+				break
+			jobs.append((frame, values))
+
+		if jobs:
+			self._generation += 1
+			self.renderer.render(self._generation, self.image, jobs, self.scale)
+
+	def store(self, generation, results):
+		if generation != self._generation:
+			return
+		for frame, values, image in results:
+			# The frame may have changed while it was being rendered
+			if frame.values() == values:
+				self.add(frame, values, image)
+
+	def add(self, frame, values, image):
+		self.discard(frame)
+		self._entries[frame] = (values, image)
+		self._bytes += self.image_bytes(image)
+
+		while self._bytes > self.budget and len(self._entries) > 1:
+			_, (_, evicted) = self._entries.popitem(last=False)
+			self._bytes -= self.image_bytes(evicted)
+
+	def discard(self, frame):
+		entry = self._entries.pop(frame, None)
+		if entry is not None:
+			self._bytes -= self.image_bytes(entry[1])
+
+	def get(self, frame):
+		""" Returns the pixmap of a frame, rendering it now if it isn't cached. None while there is no spritesheet """
+		if self.image is None:
+			return None
+
+		values = frame.values()
+		entry = self._entries.get(frame)
+		if entry is not None and entry[0] == values:
+			self.hits += 1
+			self._entries.move_to_end(frame)
+			pixmap = entry[1]
+			if isinstance(pixmap, QtGui.QImage):
+				# Pixmaps can only be made on the GUI thread
+				pixmap = QtGui.QPixmap.fromImage(pixmap)
+				self._entries[frame] = (values, pixmap)
+			return pixmap
+
+		self.misses += 1
+		pixmap = QtGui.QPixmap.fromImage(render_frame(self.image, values, self.scale))
+		self.add(frame, values, pixmap)
+		return pixmap
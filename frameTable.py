@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from itertools import repeat
+import operator
+
+FIELDS = ("x", "y", "width", "height", "shift_x", "shift_y")
+
+
+class FrameTable:
+	""" Frame geometry of a sequence stored by column, one array of ints per field and one row per frame.
+		handles holds the frame object viewing each row, in row order, and is the sequence's frame list.
+		duration holds the milliseconds each frame is on show for, 0 for a frame that lasts as long as the speed says """
+
+	def __init__(self):
+		self.x = array('i')
+		self.y = array('i')
+		self.width = array('i')
+		self.height = array('i')
+		self.shift_x = array('i')
+		self.shift_y = array('i')
+		self.columns = (self.x, self.y, self.width, self.height, self.shift_x, self.shift_y)
+		self.duration = array('i')
+		self.handles = []
+
+	def __len__(self):
+		return len(self.handles)
+
+	def row(self, row):
+		""" Returns (x, y, width, height, shift_x, shift_y) of a row """
+		return tuple(column[row] for column in self.columns)
+
+	def rows(self):
+		""" Iterates (x, y, width, height, shift_x, shift_y) of every row """
+		return zip(*self.columns)
+
+	def append(self, handle, values, duration=0):
+		""" Adds a row and returns its number """
+		for column, value in zip(self.columns, values):
+			column.append(value)
+		self.duration.append(duration)
+		self.handles.append(handle)
+		return len(self.handles) - 1
+
+	def extend(self, columns):
+		""" Adds one row for each value in columns, given in FIELDS order and optionally followed by a column
+			of durations. Returns the rows added """
+		start = len(self.handles)
+		for column, values in zip(self.columns, columns):
+			column.extend(values)
+
+		count = len(self.x) - start
+		if len(columns) > len(FIELDS):
+			self.duration.extend(columns[len(FIELDS)])
+		else:
+			self.duration.extend(repeat(0, count))
+		if any(len(column) != start + count for column in self.columns + (self.duration,)):
+			raise ValueError("Frame columns have different lengths")
+		self.handles.extend(repeat(None, count))
+		return range(start, start + count)
+
+	def insert(self, row, handle, values, duration=0):
+		""" Adds a row before row. Rows after it move down by one, their handles have to be renumbered """
+		for column, value in zip(self.columns, values):
+			column.insert(row, value)
+		self.duration.insert(row, duration)
+		self.handles.insert(row, handle)
+
+	def remove(self, row):
+		""" Removes a row and returns its values. Rows after it move up by one, their handles have to be renumbered """
+		values = self.row(row)
+		for column in self.columns:
+			del column[row]
+		del self.duration[row]
+		del self.handles[row]
+		return values
+
+	def translate(self, dx, dy, rows=None):
+		""" Moves every row, or only the given rows, by dx, dy """
+		if rows is None:
+			count = len(self.x)
+			self.x[:] = array('i', map(operator.add, self.x, repeat(dx, count)))
+			self.y[:] = array('i', map(operator.add, self.y, repeat(dy, count)))
+		else:
+			for row in rows:
+				self.x[row] += dx
+				self.y[row] += dy
+
+	def bounds(self):
+		""" Returns (left, top, right, bottom) around every row, right and bottom exclusive, or None when empty.
+			Rows with a negative size count from the other side, as they are when normalized """
+		if not self.handles:
+			return None
+
+		ends_x = array('i', map(operator.add, self.x, self.width))
+		ends_y = array('i', map(operator.add, self.y, self.height))
+		return (min(min(self.x), min(ends_x)), min(min(self.y), min(ends_y)),
+				max(max(self.x), max(ends_x)), max(max(self.y), max(ends_y)))
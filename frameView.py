@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 
 from PyQt5 import QtGui, QtWidgets
-from PyQt5.QtCore import QPoint, QSize, QRect, Qt, pyqtSignal, QTimer
+from PyQt5.QtCore import QPoint, QPointF, QSize, QRect, Qt, pyqtSignal, QTimer
 import logging
+import math
 
-from animationTypes import AnimationData, AnimationSequence, AnimationFrame
+from animationTypes import AnimationData, AnimationSequence, AnimationFrame, AnimationEvent
+from imageStore import image_store
+import editHistory
+import frameCache
+import playbackClock
 
 btn_rect = QRect(0, 0, 30, 30)
 btn_size = QSize(30, 30)
@@ -105,6 +110,17 @@ class SpriteAnimatorWidget(QtWidgets.QVBoxLayout):
 		self.speed_widget.setValue(30)
 		self.speed_widget.valueChanged.connect(self.view.set_sequence_speed)
 		self.tool_bar.addWidget(self.speed_widget)
+
+		# Milliseconds the active frame is on show for, 0 leaves it to the speed
+		self.duration_widget = QtWidgets.QSpinBox()
+		self.duration_widget.setMinimumSize(QSize(80, btn_size.height()))
+		self.duration_widget.setMinimum(0)
+		self.duration_widget.setMaximum(60000)
+		self.duration_widget.setSingleStep(10)
+		self.duration_widget.setSuffix(" ms")
+		self.duration_widget.setSpecialValueText("Speed")
+		self.duration_widget.valueChanged.connect(self.view.set_frame_duration)
+		self.tool_bar.addWidget(self.duration_widget)
 		
 		spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
 		self.tool_bar.addItem(spacerItem)
@@ -149,6 +165,7 @@ class SpriteAnimatorWidget(QtWidgets.QVBoxLayout):
 		self.toggle_frame_border_btn.setEnabled(False)
 		self.toggle_ghost_btn.setEnabled(False)
 		self.speed_widget.setEnabled(False)
+		self.duration_widget.setEnabled(False)
 		
 	def enable_buttons(self):
 		self.play_btn.setEnabled(True)
@@ -159,28 +176,56 @@ class SpriteAnimatorWidget(QtWidgets.QVBoxLayout):
 		self.toggle_frame_border_btn.setEnabled(True)
 		self.toggle_ghost_btn.setEnabled(True)
 		self.speed_widget.setEnabled(True)
+		self.duration_widget.setEnabled(True)
 	
-	def load_animation_data(self, animation_data):
+	def load_animation_data(self, animation_data, history=None):
 		self.animation_data = animation_data
 		self.view.animation_data = animation_data
-		self.view.spritesheet = QtGui.QImage(animation_data.spritesheet_path)
+		self.view.history = history
 		self.animation_data.active_frame_changed.connect(self.reset_view)
+		self.animation_data.active_sequence_changed.connect(self.view.sequence_changed)
+		self.animation_data.changes.connect(self.view.handle_changes)
+		self.animation_data.changes.connect(self.handle_changes)
+
+		# A sheet that is still being decoded is set by set_spritesheet_image once it is ready
+		path = animation_data.spritesheet_path
+		self.set_spritesheet_image(image_store.get(path) if image_store.contains(path) else None)
 
 		self.renew()
+		self.view.update()
+
+	def set_spritesheet_image(self, image):
+		self.view.set_spritesheet(image)
+
+	def handle_changes(self, changes):
+		# Undo and redo change the speed of the sequence on show too
+		sequence = self.animation_data.active_sequence
+		if any(change.event is AnimationEvent.SEQUENCE_ALTERED and change.sequence is sequence for change in changes):
+			self.speed_widget.setValue(sequence.speed)
+		# And the duration of the active frame
+		frame = self.animation_data.active_frame
+		if any(change.event is AnimationEvent.FRAME_ALTERED and frame in change.frames for change in changes):
+			self.show_frame_duration()
+
+	def show_frame_duration(self):
+		frame = self.animation_data.active_frame
+		if frame is not None and frame.duration() != self.duration_widget.value():
+			self.duration_widget.setValue(frame.duration())
 
 	def reset_view(self):
 		self.play_btn.setIcon( self.play_icon )
 		self.view.reset()
+		self.show_frame_duration()
 
 	def renew(self):
 		if self.animation_data is None:
 			return
 
-		self.view.update()
-		
+		# The player repaints itself when the frames it shows change
 		if self.animation_data.active_sequence:
 			self.enable_buttons()
 			self.speed_widget.setValue(self.animation_data.active_sequence.speed)
+			self.show_frame_duration()
 			
 			if len(self.animation_data.active_sequence.frames) == 1:
 				self.play_btn.setEnabled(False)
@@ -238,6 +283,11 @@ class AnimationPlayer(QtWidgets.QFrame):
 
 		self.frames_per_second = 30
 		self.animation_data = None
+		self.history = None
+		self.spritesheet = None
+
+		# Frames of the active sequence, rendered ahead at the current scale
+		self.frame_cache = frameCache.FrameCache(self)
 		
 		self.setParent(parent)
 		self.update()
@@ -249,10 +299,14 @@ class AnimationPlayer(QtWidgets.QFrame):
 		#State for back and forth repeat mode
 		self.going_forwards = True
 		
-		#Play timer
+		#Says which frame is due, from the time since playback started
+		self.clock = playbackClock.PlaybackClock()
+
+		#Play timer, set for when the next frame is due
 		self.timer = QTimer(self)
+		self.timer.setTimerType(Qt.PreciseTimer)
 		self.timer.timeout.connect(self.handle_timer_elapse)
-		self.timer.setSingleShot(False)
+		self.timer.setSingleShot(True)
 		
 		self.show_axis = False
 		self.show_frame_border = False
@@ -266,10 +320,27 @@ class AnimationPlayer(QtWidgets.QFrame):
 
 		self.setFocusPolicy(Qt.ClickFocus)
 		
+	def set_spritesheet(self, image):
+		self.spritesheet = image
+		self.frame_cache.set_image(image)
+		self.fill_cache()
+		self.update()
+
+	def sequence_changed(self):
+		self.fill_cache()
+		self.update_durations()
+		self.update()
+
+	def fill_cache(self):
+		if self.animation_data is not None and self.animation_data.active_sequence is not None:
+			self.frame_cache.fill(self.animation_data.active_sequence.frames)
+
 	def reset(self):
-		self.current_index = self.animation_data.active_sequence.active_frame_index()
+		sequence = self.animation_data.active_sequence
+		self.current_index = sequence.active_frame_index() if sequence is not None else None
 		self.state = "STOPPED"
 		self.timer.stop()
+		self.clock.stop()
 		self.update()
 		
 	def toggle_play(self):
@@ -279,13 +350,18 @@ class AnimationPlayer(QtWidgets.QFrame):
 			self.state = "PLAY"
 			#Start timer
 			print("Timer started")
-			msec_per_frame = (1000 / self.frames_per_second)
-			self.timer.start(msec_per_frame)
+			self.clock.repeat_mode = self.repeat_mode
+			self.clock.set_durations(self.animation_data.active_sequence.frame_durations(), self.current_index)
+			self.clock.reset_stats()
+			self.clock.start()
+			self.schedule_tick()
 			
 		elif self.state == "PLAY":
 			self.state = "STOPPED"
 			#Stop timer
 			self.timer.stop()
+			self.clock.stop()
+			logging.debug("Playback %s" % self.clock.stats())
 
 	@property
 	def current_index(self):
@@ -314,15 +390,105 @@ class AnimationPlayer(QtWidgets.QFrame):
 			
 		elif self.repeat_mode == "BACK_AND_FORTH":
 			self.repeat_mode = "LOOP"
+
+		self.clock.set_repeat_mode(self.repeat_mode)
+		if self.state == "PLAY":
+			self.schedule_tick()
 		
 	def set_sequence_speed(self, speed):
 		self.frames_per_second = int(speed)
-		self.animation_data.active_sequence.speed = speed
+
+		# Steps of the spin box on one sequence are undone together
+		sequence = self.animation_data.active_sequence
+		if speed != sequence.speed:
+			before = (sequence.name, sequence.speed)
+			sequence.edit(sequence.name, speed)
+			if self.history is not None:
+				self.history.push(editHistory.EditSequence(sequence, before, (sequence.name, speed), "Change speed",
+														   gesture=("speed", id(sequence))))
 		# Loop da loop and OH GOD WHAT IS HAPPENING
 		#self.animation_data_changed_signal.emit()
 
-		msec_per_frame = (1000 / self.frames_per_second)
-		self.timer.setInterval(msec_per_frame)
+		self.update_durations()
+
+	def set_frame_duration(self, duration):
+		""" Gives the active frame a duration of its own, 0 has it last 1 / speed again """
+		if self.animation_data is None or self.animation_data.active_frame is None:
+			return
+		frame = self.animation_data.active_frame
+		sequence = self.animation_data.active_sequence
+		if duration == frame.duration() or sequence.frame_index(frame) is None:
+			return
+
+		# Steps of the spin box on one frame are undone together
+		before = editHistory.capture([frame])
+		frame.set_duration(duration)
+		sequence.update_frames([frame])
+		if self.history is not None:
+			self.history.push(editHistory.EditFrames([sequence], [frame], before, editHistory.capture([frame]),
+													 "Change duration", gesture=("duration", id(frame))))
+
+	def update_durations(self):
+		""" Gives the clock the frame durations of the sequence on show, carrying on from the frame on show """
+		if self.animation_data is None or self.animation_data.active_sequence is None:
+			return
+
+		self.clock.set_durations(self.animation_data.active_sequence.frame_durations(), self.current_index)
+		if self.state == "PLAY":
+			self.schedule_tick()
+
+	def schedule_tick(self):
+		wait = self.clock.until_next()
+		if wait is not None:
+			self.timer.start(math.ceil(wait))
+
+	def seek(self, t):
+		""" Shows the frame due t milliseconds into playback, for scrubbing through the sequence """
+		self.clock.seek(t)
+		index = self.clock.index()
+		if index is None:
+			return
+
+		self._current_index = index
+		self.going_forwards = self.clock.going_forwards()
+		self.update()
+		if self.state == "PLAY":
+			self.schedule_tick()
+
+	def shown_frames(self):
+		""" The frames paintEvent draws, the current one and the ghost frames either side of it """
+		frames = self.animation_data.active_sequence.frames
+		if self.current_index is None or self.current_index >= len(frames):
+			return []
+		return [frames[self.current_index - 1], frames[self.current_index], frames[(self.current_index + 1) % len(frames)]]
+
+	def handle_changes(self, changes):
+		""" Repaints when frames were added to or removed from the sequence on show, or frames it shows were altered """
+		if self.animation_data is None or self.animation_data.active_sequence is None:
+			return
+
+		for change in changes:
+			if change.event is AnimationEvent.FRAME_ALTERED or change.event is AnimationEvent.FRAME_DELETED:
+				for frame in change.frames:
+					self.frame_cache.discard(frame)
+
+		shown = None
+		for change in changes:
+			if change.sequence is not self.animation_data.active_sequence:
+				continue
+			if change.event is not AnimationEvent.FRAME_ALTERED:
+				self.update_durations()
+				self.update()
+				return
+			# Altered frames may have been given a duration of their own
+			if self.clock.timeline.durations != change.sequence.frame_durations():
+				self.update_durations()
+
+			if shown is None:
+				shown = set(id(frame) for frame in self.shown_frames())
+			if any(id(frame) in shown for frame in change.frames):
+				self.update()
+				return
 
 	def previous_frame(self):
 		self.current_index -= 1
@@ -337,36 +503,20 @@ class AnimationPlayer(QtWidgets.QFrame):
 		self.showFullScreen()
 	
 	def handle_timer_elapse(self):
-		#print("Timer trigger")
-		if self._current_index is None:
-			self._current_index = 0
-		
-		if self.repeat_mode == "LOOP":
-			self.current_index += 1
-		elif self.repeat_mode == "BACK_AND_FORTH":
-			if self.going_forwards:
-				#Get next frame
-				if self.current_index == len(self.animation_data.active_sequence.frames) - 1:
-					#If reached end, reverse and get previous frame
-					self.going_forwards = False
-					self.current_index -= 1
-				else:
-					self.current_index += 1
-					
-			else: #Going Backwards
-				#Get previous frame
-				if	self.current_index == 0:
-					#If reached beginning, reverse and get next frame.
-					self.going_forwards = True
-					self.current_index += 1
-				else:
-					#Else, get previous frame
-					self.current_index -= 1
+		# The clock says which frame is due, frames a late tick missed are skipped
+		index = self.clock.tick()
+		if index is None:
+			return
 
+		self._current_index = index
+		self.going_forwards = self.clock.going_forwards()
 		self.update()
+		self.schedule_tick()
 				
 	def set_scale(self, scale):
 		self.scale = scale
+		self.frame_cache.set_scale(scale)
+		self.fill_cache()
 		self.update()
 		
 	def toggle_axis(self):
@@ -429,7 +579,6 @@ class AnimationPlayer(QtWidgets.QFrame):
 	
 	def drawFrame(self, painter, frame, opacity=1, border=False):
 		painter.setOpacity(opacity)
-		sprite = frame.normalized() # Source
 		view_rect = QSize(self.rect().width()/self.scale, self.rect().height()/self.scale)
 		
 		
@@ -441,7 +590,13 @@ class AnimationPlayer(QtWidgets.QFrame):
 		
 		
 		
-		painter.drawImage(target, self.spritesheet, sprite)
+		pixmap = self.frame_cache.get(frame)
+		if pixmap is not None:
+			# Cached at the current scale, blitted without the painter's scaling
+			painter.save()
+			painter.resetTransform()
+			painter.drawPixmap(QPointF(target.x() * self.scale, target.y() * self.scale), pixmap)
+			painter.restore()
 		painter.setOpacity(1)
 		
 		# Draw border around frame
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+""" Decodes spritesheets on a worker thread.
+
+	The file is read into memory and decoded by QImageReader through a buffer that reports how far decoding got
+	and can stop it part way when the load is cancelled. Formats the reader can decode straight to a smaller size,
+	like JPEG, are first decoded to a preview that is shown until the full image is ready.
+"""
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QSize, QThread, Qt, pyqtSignal
+import threading
+
+from imageStore import ImageStore
+
+PREVIEW_SIZE = QSize(1024, 1024) # Previews fit in this
+PREVIEW_FORMATS = (b'jpeg', b'jpg') # Decoded to a smaller size without decoding at full size first
+
+
+class ProgressBuffer(QBuffer):
+	""" In memory file for QImageReader. Every read reports the position, reads fail once cancelled is set """
+
+	def __init__(self, data, progress, cancelled):
+		super(ProgressBuffer, self).__init__()
+		self.setData(QByteArray(data))
+		self.progress = progress
+		self.cancelled = cancelled
+
+	def readData(self, maxlen):
+		if self.cancelled.is_set():
+			return None
+		data = super(ProgressBuffer, self).readData(maxlen)
+		self.progress(self.pos(), self.size())
+		return data
+
+
+class ImageLoader(QThread):
+	""" Loads one image at a time. Signals are delivered on the thread the loader was made on """
+
+	preview = pyqtSignal(str, QtGui.QImage, QSize) # Path, preview, size of the full image
+	progress = pyqtSignal(str, int) # Path, percent
+	loaded = pyqtSignal(str, QtGui.QImage) # Path, image in ImageStore.IMAGE_FORMAT
+	failed = pyqtSignal(str, str) # Path, message
+	cancelled = pyqtSignal(str) # Path
+
+	def __init__(self, parent=None):
+		super(ImageLoader, self).__init__(parent)
+		self.path = None
+		self._cancel = threading.Event()
+		self._percent = -1
+
+	def load(self, path):
+		""" Starts loading path, cancelling a load that is still running """
+		self.cancel()
+		self.wait()
+
+		self.path = path
+		self._cancel.clear()
+		self._percent = -1
+		self.start()
+
+	def cancel(self):
+		self._cancel.set()
+
+	def report(self, position, size):
+		percent = position * 100 // size if size else 0
+		if percent != self._percent:
+			self._percent = percent
+			self.progress.emit(self.path, percent)
+
+	def open_reader(self, data, progress):
+		device = ProgressBuffer(data, progress, self._cancel)
+		device.open(QIODevice.ReadOnly)
+		reader = QtGui.QImageReader(device)
+		return reader, device
+
+	def run(self):
+		path = self.path
+		try:
+			with open(path, 'rb') as infile:
+				data = infile.read()
+		except OSError as error:
+			self.failed.emit(path, "Could not read %s: %s" % (path, error.strerror))
+			return
+
+		reader, device = self.open_reader(data, self.report)
+		size = reader.size()
+
+		if reader.format() in PREVIEW_FORMATS and size.isValid() and \
+				(size.width() > PREVIEW_SIZE.width() or size.height() > PREVIEW_SIZE.height()):
+			preview_reader, preview_device = self.open_reader(data, lambda position, size: None)
+			preview_reader.setScaledSize(size.scaled(PREVIEW_SIZE, Qt.KeepAspectRatio))
+			preview = preview_reader.read()
+			if not preview.isNull() and not self._cancel.is_set():
+				self.preview.emit(path, preview, size)
+
+		image = reader.read()
+		if self._cancel.is_set():
+			self.cancelled.emit(path)
+			return
+		if image.isNull():
+			self.failed.emit(path, "Could not decode %s: %s" % (path, reader.errorString()))
+			return
+
+		self.loaded.emit(path, ImageStore.prepare(image))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+from PyQt5 import QtGui
+import logging
+import os
+
+
+class ImageStore:
+	""" Process wide store of decoded spritesheets.
+		Each sheet is decoded once, converted to a paint friendly format and shared by every view.
+		Entries are keyed by path and invalidated when the file's mtime or size changes. """
+
+	IMAGE_FORMAT = QtGui.QImage.Format_ARGB32_Premultiplied
+
+	def __init__(self):
+		self._images = {} # path -> (file key, QImage)
+
+	@staticmethod
+	def normalize_path(path):
+		return os.path.normcase(os.path.abspath(path))
+
+	@staticmethod
+	def file_key(path):
+		try:
+			stat = os.stat(path)
+		except OSError:
+			return None
+		return stat.st_mtime_ns, stat.st_size
+
+	def get(self, path):
+		""" Returns the decoded image for path, decoding it only if it isn't already held """
+		norm_path = self.normalize_path(path)
+		key = self.file_key(norm_path)
+
+		entry = self._images.get(norm_path)
+		if entry is not None and entry[0] == key:
+			return entry[1]
+
+		image = self.decode(path)
+		if image.isNull():
+			logging.error("Unable to decode spritesheet " + path)
+			return image
+
+		self.insert(path, image)
+		return image
+
+	def contains(self, path):
+		""" True when the image for path is held and the file hasn't changed since """
+		norm_path = self.normalize_path(path)
+		entry = self._images.get(norm_path)
+		return entry is not None and entry[0] == self.file_key(norm_path)
+
+	def insert(self, path, image):
+		""" Holds an image decoded elsewhere, by imageLoader for one, as the image for path """
+		norm_path = self.normalize_path(path)
+		self._images[norm_path] = (self.file_key(norm_path), self.prepare(image))
+		logging.info("Decoded spritesheet %s (%s bytes)" % (path, image.sizeInBytes()))
+
+	@classmethod
+	def prepare(cls, image):
+		""" Converts a decoded image to the format the store holds """
+		if not image.isNull() and image.format() != cls.IMAGE_FORMAT:
+			image = image.convertToFormat(cls.IMAGE_FORMAT)
+		return image
+
+	def decode(self, path):
+		return self.prepare(QtGui.QImage(path))
+
+	def release(self, path):
+		self._images.pop(self.normalize_path(path), None)
+
+	def clear(self):
+		self._images.clear()
+
+	def resident_bytes(self):
+		""" Returns a dictionary of path -> bytes held for that sheet """
+		return {path: image.sizeInBytes() for path, (_, image) in self._images.items()}
+
+	def total_bytes(self):
+		return sum(self.resident_bytes().values())
+
+
+image_store = ImageStore()
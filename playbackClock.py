@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+""" When each frame of a sequence is on show during playback, without any Qt dependency.
+
+	The frame on show is worked out from the time elapsed on a monotonic clock since playback started,
+	not from how many timer ticks there have been. A tick that comes late shows the frame that is due by then
+	and skips the ones in between, so playback keeps time under load instead of slowing down.
+	Frames can each last their own time. Their start times are prefix sums of the durations,
+	so the frame at any time is found with a binary search.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+import time
+
+LOOP = "LOOP"
+BACK_AND_FORTH = "BACK_AND_FORTH"
+
+LATE_MS = 4 # A frame shown more than this after it was due counts as late
+
+
+class Timeline:
+	""" Start times of frames in milliseconds, from their durations """
+
+	__slots__ = ("durations", "starts", "total")
+
+	def __init__(self, durations=()):
+		self.durations = list(durations)
+		self.starts = [0] + list(accumulate(self.durations)) # starts[i] is when frame i begins, starts[-1] the end
+		self.total = self.starts[-1]
+
+	def __len__(self):
+		return len(self.durations)
+
+	def start(self, index):
+		return self.starts[index]
+
+	def end(self, index):
+		return self.starts[index + 1]
+
+	def index_at(self, t):
+		""" The frame on show t milliseconds in, the last frame from the end on """
+		if not self.durations:
+			return None
+		return min(max(bisect_right(self.starts, t) - 1, 0), len(self.durations) - 1)
+
+	def index_before(self, t):
+		""" The frame on show just before t milliseconds in, for playing backwards """
+		return min(max(bisect_left(self.starts, t) - 1, 0), len(self.durations) - 1)
+
+
+class Stopwatch:
+	""" Playback time, standing still while stopped, and stats of the frames shown as it runs.
+		clock returns seconds and defaults to time.monotonic, a virtual clock can be passed in to step through time """
+
+	def __init__(self, clock=time.monotonic):
+		self.clock = clock
+		self.late_ms = LATE_MS
+		self._origin = None # Clock time playback time 0 was at, while playing
+		self._position = 0 # Playback time in milliseconds, while stopped
+		self._step = None # Frames shown since playback time 0 when last ticked
+
+		self.shown = 0
+		self.late = 0
+		self.dropped = 0
+		self.max_late = 0
+
+	def playing(self):
+		return self._origin is not None
+
+	def start(self):
+		if self._origin is None:
+			self._origin = self.clock() - self._position / 1000
+			self._step = None
+
+	def stop(self):
+		if self._origin is not None:
+			self._position = self.elapsed()
+			self._origin = None
+
+	def elapsed(self):
+		""" Playback time in milliseconds """
+		if self._origin is None:
+			return self._position
+		# Rounded to a nanosecond, so waiting until_next lands on the next frame despite float error
+		return round((self.clock() - self._origin) * 1000, 6)
+
+	def seek(self, t):
+		""" Moves playback to t milliseconds in """
+		self._position = t
+		if self._origin is not None:
+			self._origin = self.clock() - t / 1000
+		self._step = None
+
+	def count(self, step, t, start):
+		""" Counts the frame at step, which came on show at start, as shown at t. Frames skipped since the last
+			frame counted are dropped, the frame is late when t is more than late_ms after start """
+		if self._step is not None and step != self._step:
+			self.shown += 1
+			self.dropped += max(step - self._step - 1, 0)
+			late = t - start
+			if late > self.late_ms:
+				self.late += 1
+			self.max_late = max(self.max_late, late)
+		self._step = step
+
+	def reset_stats(self):
+		self.shown = 0
+		self.late = 0
+		self.dropped = 0
+		self.max_late = 0
+
+	def stats(self):
+		return {
+			"shown": self.shown,
+			"late": self.late,
+			"dropped": self.dropped,
+			"max_late_ms": round(self.max_late, 1)
+		}
+
+
+class PlaybackClock(Stopwatch):
+	""" Plays a Timeline, looping or back and forth """
+
+	def __init__(self, durations=(), repeat_mode=LOOP, clock=time.monotonic):
+		super(PlaybackClock, self).__init__(clock)
+		self.timeline = Timeline(durations)
+		self.repeat_mode = repeat_mode
+
+	def seek_frame(self, index):
+		""" Moves playback to the start of a frame """
+		if self.timeline.durations:
+			self.seek(self.timeline.start(index))
+
+	def set_durations(self, durations, index=None):
+		""" Plays frames of new durations from the start of frame index, or from where playback is in the new timeline """
+		self.timeline = Timeline(durations)
+		if index is not None and index < len(self.timeline):
+			self.seek_frame(index)
+		else:
+			self.seek(self.elapsed())
+
+	def set_repeat_mode(self, repeat_mode):
+		""" Changes the repeat mode keeping the frame on show """
+		index = self.index()
+		self.repeat_mode = repeat_mode
+		if index is not None:
+			self.seek_frame(index)
+
+	def period(self):
+		""" Milliseconds before playback repeats itself """
+		timeline = self.timeline
+		if self.repeat_mode == BACK_AND_FORTH and len(timeline) > 2:
+			# Forwards through every frame, back through all but the first and last
+			return 2 * timeline.total - timeline.durations[0] - timeline.durations[-1]
+		return timeline.total
+
+	def locate(self, t):
+		""" (frame index, step, start) at t milliseconds in. Step counts the frames shown since time 0,
+			start is when the frame came on show """
+		timeline = self.timeline
+		count = len(timeline)
+		if count == 0:
+			return None, 0, 0
+		period = self.period()
+		if period <= 0 or t < 0:
+			return 0, 0, 0
+
+		cycles, offset = divmod(t, period)
+		base = cycles * period
+		if offset < timeline.total:
+			index = timeline.index_at(offset)
+			step = index
+			start = timeline.start(index)
+		else:
+			# Playing back from the second to last frame, time runs down from where the last frame began
+			back = timeline.start(count - 1) - (offset - timeline.total)
+			index = timeline.index_before(back)
+			step = count + (count - 2 - index)
+			start = timeline.total + timeline.start(count - 1) - timeline.end(index)
+
+		steps_per_cycle = count if self.repeat_mode == LOOP or count <= 2 else 2 * count - 2
+		return index, int(cycles) * steps_per_cycle + step, base + start
+
+	def index(self):
+		return self.locate(self.elapsed())[0]
+
+	def going_forwards(self):
+		""" False when the frame on show was come to going back through the frames in back and forth mode """
+		count = len(self.timeline)
+		if self.repeat_mode != BACK_AND_FORTH or count <= 2:
+			return True
+		_, step, _ = self.locate(self.elapsed())
+		return step == 0 or 0 < step % (2 * count - 2) < count
+
+	def tick(self):
+		""" The frame to show now, counted in the stats """
+		t = self.elapsed()
+		index, step, start = self.locate(t)
+		if index is None:
+			return None
+
+		self.count(step, t, start)
+		return index
+
+	def until_next(self):
+		""" Milliseconds until the frame after the one on show is due """
+		t = self.elapsed()
+		index, step, start = self.locate(t)
+		if index is None or self.period() <= 0:
+			return None
+
+		timeline = self.timeline
+		return max(start + timeline.durations[index] - t, 0)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+""" Plays many sequences side by side.
+
+	Each cell of the grid plays one sequence on a PlaybackClock of its own, but every clock reads the same time
+	and one timer drives the whole grid. A tick asks each clock for its frame, the cells whose frame changed
+	are marked and the grid repaints them together, at most once per display frame.
+	Frames of all the sequences come out of one FrameCache at one scale, so drawing a cell is a blit.
+"""
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPointF, QRect, Qt, QTimer
+import logging
+import math
+import time
+
+from animationTypes import AnimationEvent
+import frameCache
+import playbackClock
+
+
+def sequence_extent(sequence):
+	""" (left, top, right, bottom) around every frame of sequence drawn the way the player draws them, about the axes """
+	table = sequence.table
+	if not len(table):
+		return 0, 0, 0, 0
+	return (min(table.shift_x), min(shift_y - height for shift_y, height in zip(table.shift_y, table.height)),
+			max(shift_x + width for shift_x, width in zip(table.shift_x, table.width)), max(table.shift_y))
+
+
+class PreviewCell:
+	""" One sequence on show in the grid. Not a widget, the grid paints every cell itself """
+
+	__slots__ = ("sequence", "clock", "index", "rect", "anchor")
+
+	def __init__(self, sequence, clock):
+		self.sequence = sequence
+		self.clock = playbackClock.PlaybackClock(sequence.frame_durations(), clock=clock)
+		self.index = 0 if sequence.frames else None
+		self.rect = QRect()
+		self.anchor = QPointF() # Where the player's axes would cross, frames are drawn relative to it
+
+	def extent(self):
+		return sequence_extent(self.sequence)
+
+
+class PreviewGrid(QtWidgets.QWidget):
+	""" Cells laid out in rows as wide as the grid """
+
+	CELL_SIZE = 128 # Pixels square a sequence is fit in
+	LABEL_HEIGHT = 16
+	SPACING = 4
+	MAX_SCALE = 4
+	FRAME_INTERVAL = 16 # Milliseconds, the grid repaints at most once per display frame
+
+	def __init__(self, parent=None, clock=time.monotonic):
+		super(PreviewGrid, self).__init__(parent)
+		self.clock = clock
+		self.cells = []
+		self.scale = 1
+		self._playing = False
+
+		self.frame_cache = frameCache.FrameCache(self)
+
+		self.timer = QTimer(self)
+		self.timer.setTimerType(Qt.PreciseTimer)
+		self.timer.setSingleShot(True)
+		self.timer.timeout.connect(self.tick)
+
+	def set_sequences(self, sequences, image):
+		""" Shows sequences, in order, cut from image """
+		self.cells = [PreviewCell(sequence, self.clock) for sequence in sequences]
+		for cell in self.cells:
+			# Frames due between display frames wait for the next one, that isn't counted as late
+			cell.clock.late_ms = self.FRAME_INTERVAL + playbackClock.LATE_MS
+
+		self.frame_cache.set_image(image)
+		self.fit_scale()
+		self.frame_cache.fill(self.frames())
+
+		self.layout_cells(self.width())
+
+	def frames(self):
+		return [frame for cell in self.cells for frame in cell.sequence.frames]
+
+	def fit_scale(self):
+		""" Sets one scale for all, the largest sequence fits its cell. Returns True when the scale changed,
+			the frame cache is emptied then """
+		extents = [cell.extent() for cell in self.cells]
+		width = max([right - left for left, _, right, _ in extents] + [1])
+		height = max([bottom - top for _, top, _, bottom in extents] + [1])
+		scale = min(self.CELL_SIZE / width, self.CELL_SIZE / height, self.MAX_SCALE)
+
+		changed = scale != self.scale
+		self.scale = scale
+		self.frame_cache.set_scale(scale)
+		return changed
+
+	def columns(self, width):
+		return max(1, (width - self.SPACING) // (self.CELL_SIZE + self.SPACING))
+
+	def height_for_width(self, width):
+		rows = math.ceil(len(self.cells) / self.columns(width))
+		return self.SPACING + rows * (self.CELL_SIZE + self.LABEL_HEIGHT + self.SPACING)
+
+	def layout_cells(self, width):
+		""" Places the cells in rows that fit width and sizes the grid to hold them """
+		columns = self.columns(width)
+		for i, cell in enumerate(self.cells):
+			row, column = divmod(i, columns)
+			cell.rect = QRect(self.SPACING + column * (self.CELL_SIZE + self.SPACING),
+							  self.SPACING + row * (self.CELL_SIZE + self.LABEL_HEIGHT + self.SPACING),
+							  self.CELL_SIZE, self.CELL_SIZE + self.LABEL_HEIGHT)
+
+			self.place_anchor(cell)
+
+		self.resize(width, self.height_for_width(width))
+		self.update()
+
+	def place_anchor(self, cell):
+		""" Centres the sequence's frames in the cell """
+		left, top, right, bottom = cell.extent()
+		cell.anchor = QPointF(cell.rect.x() + (self.CELL_SIZE - (right - left) * self.scale) / 2 - left * self.scale,
+							  cell.rect.y() + (self.CELL_SIZE - (bottom - top) * self.scale) / 2 - top * self.scale)
+
+	def playing(self):
+		return self._playing
+
+	def play(self):
+		self._playing = True
+		for cell in self.cells:
+			cell.clock.start()
+		self.tick()
+
+	def stop(self):
+		self._playing = False
+		self.timer.stop()
+		for cell in self.cells:
+			cell.clock.stop()
+		logging.debug("Preview of %s sequences %s" % (len(self.cells), self.stats()))
+
+	def stats(self):
+		""" Playback stats of all cells added up """
+		stats = {"shown": 0, "late": 0, "dropped": 0, "max_late_ms": 0}
+		for cell in self.cells:
+			for key, value in cell.clock.stats().items():
+				stats[key] = max(stats[key], value) if key == "max_late_ms" else stats[key] + value
+		return stats
+
+	def tick(self):
+		""" Moves every cell to its frame due now, repaints the ones that changed and waits for the next frame due """
+		dirty = QtGui.QRegion()
+		wait = None
+		for cell in self.cells:
+			index = cell.clock.tick()
+			if index != cell.index:
+				cell.index = index
+				dirty += cell.rect
+
+			until_next = cell.clock.until_next()
+			if until_next is not None and (wait is None or until_next < wait):
+				wait = until_next
+
+		if not dirty.isEmpty():
+			self.update(dirty)
+		if wait is not None:
+			self.timer.start(max(math.ceil(wait), self.FRAME_INTERVAL))
+
+	def cell_of(self, sequence):
+		for cell in self.cells:
+			if cell.sequence is sequence:
+				return cell
+		return None
+
+	def handle_changes(self, changes):
+		""" Follows frames added to, taken out of or altered in the sequences on show """
+		relayout = False
+		reshaped = [] # Cells whose frames grew, shrank or moved
+		for change in changes:
+			if change.event is AnimationEvent.SEQUENCE_DELETED:
+				cells = [cell for cell in self.cells if cell.sequence is not change.sequence]
+				relayout = relayout or len(cells) != len(self.cells)
+				self.cells = cells
+				continue
+
+			cell = self.cell_of(change.sequence)
+			if cell is None:
+				continue
+
+			if change.event is AnimationEvent.FRAME_ALTERED or change.event is AnimationEvent.FRAME_DELETED:
+				for frame in change.frames:
+					self.frame_cache.discard(frame)
+			if (change.event is not AnimationEvent.FRAME_ALTERED or
+					cell.clock.timeline.durations != cell.sequence.frame_durations()):
+				cell.clock.set_durations(cell.sequence.frame_durations())
+				cell.index = cell.clock.index()
+			if change.event is not AnimationEvent.SEQUENCE_ALTERED and cell not in reshaped:
+				reshaped.append(cell)
+			self.update(cell.rect)
+
+		if not relayout and not reshaped:
+			return
+		# The scale follows the largest sequence, the anchor of a cell follows the extent of its sequence
+		if self.fit_scale():
+			self.frame_cache.fill(self.frames())
+			relayout = True
+		if relayout:
+			self.layout_cells(self.width())
+		else:
+			for cell in reshaped:
+				self.place_anchor(cell)
+
+	def paintEvent(self, event):
+		qp = QtGui.QPainter()
+		qp.begin(self)
+
+		region = event.region()
+		for cell in self.cells:
+			if not region.intersects(cell.rect):
+				continue
+
+			qp.fillRect(cell.rect, QtGui.QColor(255, 255, 255))
+			frames = cell.sequence.frames
+			if cell.index is not None and cell.index < len(frames):
+				frame = frames[cell.index]
+				pixmap = self.frame_cache.get(frame)
+				if pixmap is not None:
+					_, _, _, height, shift_x, shift_y = frame.values()
+					qp.setClipRect(QRect(cell.rect.x(), cell.rect.y(), self.CELL_SIZE, self.CELL_SIZE))
+					qp.drawPixmap(QPointF(cell.anchor.x() + shift_x * self.scale,
+										  cell.anchor.y() + (shift_y - height) * self.scale), pixmap)
+					qp.setClipping(False)
+
+			label = QRect(cell.rect.x(), cell.rect.bottom() - self.LABEL_HEIGHT + 1, cell.rect.width(), self.LABEL_HEIGHT)
+			qp.drawText(label, Qt.AlignCenter, qp.fontMetrics().elidedText(str(cell.sequence.name), Qt.ElideRight, label.width()))
+
+		qp.end()
+
+
+class PreviewWindow(QtWidgets.QDialog):
+	""" Plays the selected sequences in a grid, in a window beside the editor """
+
+	def __init__(self, parent=None):
+		super(PreviewWindow, self).__init__(parent)
+		self.animation_data = None
+		self.init_ui()
+
+	def init_ui(self):
+		self.setWindowTitle("Preview")
+		self.resize(700, 500)
+
+		layout = QtWidgets.QVBoxLayout(self)
+
+		self.grid = PreviewGrid()
+		self.scroll_area = QtWidgets.QScrollArea()
+		self.scroll_area.setWidget(self.grid)
+		self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+		layout.addWidget(self.scroll_area)
+
+		self.play_btn = QtWidgets.QPushButton("Pause")
+		self.play_btn.clicked.connect(self.toggle_play)
+		layout.addWidget(self.play_btn)
+
+	def show_sequences(self, animation_data, sequences, image):
+		if self.animation_data is not None:
+			self.animation_data.changes.disconnect(self.grid.handle_changes)
+		self.animation_data = animation_data
+		self.animation_data.changes.connect(self.grid.handle_changes)
+
+		self.grid.stop()
+		self.grid.set_sequences(sequences, image)
+		self.fit_grid()
+		self.setWindowTitle("Preview of %s sequences" % len(sequences))
+		self.grid.play()
+		self.play_btn.setText("Pause")
+
+	def fit_grid(self):
+		self.grid.layout_cells(self.scroll_area.viewport().width())
+
+	def toggle_play(self):
+		if self.grid.playing():
+			self.grid.stop()
+			self.play_btn.setText("Play")
+		else:
+			self.grid.play()
+			self.play_btn.setText("Pause")
+
+	def resizeEvent(self, event):
+		super(PreviewWindow, self).resizeEvent(event)
+		self.fit_grid()
+
+	def done(self, result):
+		# Closing the window stops playback and the frame cache's worker
+		self.grid.stop()
+		self.grid.frame_cache.stop()
+		if self.animation_data is not None:
+			self.animation_data.changes.disconnect(self.grid.handle_changes)
+			self.animation_data = None
+		super(PreviewWindow, self).done(result)
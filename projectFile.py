@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+""" Compact binary project files.
+
+	All values are little endian.
+
+	header      magic, version, flags, sequence count, frame count, spritesheet path offset and length
+	sequences   name offset and length, speed, first frame and frame count of each sequence
+	frames      pos x, pos y, width, height, shift x, shift y and duration of every frame as 32 bit integers.
+	            Version 1 files have no duration, their frames last 1 / speed
+	strings     UTF-8 text the other sections point into
+
+	Frames of all sequences are stored back to back, so the whole frame section is read as one array
+	straight out of a memory map.
+
+	Projects of either format are written to a temporary file that replaces the old file once it is complete,
+	so a failed or interrupted save leaves the old file as it was.
+"""
+
+from array import array
+from contextlib import contextmanager
+from itertools import chain
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+from animationCore import AnimationData
+
+EXTENSION = ".spb"
+MAGIC = b'SPRB'
+VERSION = 2
+
+HEADER = struct.Struct("<4sHHIIII")
+SEQUENCE = struct.Struct("<IIdII")
+FRAME_FIELDS = 7
+FRAME_FIELDS_V1 = 6
+
+WRITE_CHUNK = 16384 # Frames serialized at a time, progress is reported after each chunk
+
+
+def is_binary(path):
+	""" True when path starts like a binary project """
+	with open(path, 'rb') as infile:
+		return infile.read(len(MAGIC)) == MAGIC
+
+
+class Snapshot:
+	""" A copy of a project to be written while the project itself goes on being edited.
+		The frame columns of every sequence are copied as arrays, which is quick enough to do on the GUI thread """
+
+	__slots__ = ("fpath", "sequences", "frame_count")
+
+	def __init__(self, fpath, sequences):
+		self.fpath = fpath
+		self.sequences = sequences # (name, speed, columns in FIELDS order then durations) of each sequence
+		self.frame_count = sum(len(columns[0]) for _, _, columns in sequences)
+
+	@classmethod
+	def of(cls, animation_data):
+		return cls(animation_data.spritesheet_path,
+				   [(sequence.name, sequence.speed,
+					 tuple(column[:] for column in sequence.table.columns) + (sequence.table.duration[:],))
+					for sequence in animation_data.sequences])
+
+	@classmethod
+	def from_data(cls, data):
+		""" Snapshot of data in the format of AnimationData.export_data """
+		sequences = []
+		for sequence in data['sequences']:
+			columns = tuple(array('i') for _ in range(FRAME_FIELDS))
+			for frame in sequence['frames']:
+				for column, value in zip(columns, (frame['pos'][0], frame['pos'][1], frame['size'][0], frame['size'][1],
+												   frame['shift'][0], frame['shift'][1], frame.get('duration', 0))):
+					column.append(value)
+			sequences.append((sequence['name'], sequence['speed'], columns))
+		return cls(data['fpath'], sequences)
+
+
+@contextmanager
+def replace_file(path, mode='w'):
+	""" Opens a temporary file next to path, which replaces path once it has been written.
+		If writing fails the temporary file is removed and path is left untouched """
+	directory = os.path.dirname(os.path.abspath(path))
+	handle, temp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+	try:
+		with os.fdopen(handle, mode) as outfile:
+			yield outfile
+			outfile.flush()
+			os.fsync(outfile.fileno())
+
+		if os.path.exists(path):
+			shutil.copymode(path, temp_path)
+		else:
+			os.chmod(temp_path, 0o644)
+		os.replace(temp_path, path)
+	except BaseException:
+		try:
+			os.remove(temp_path)
+		except OSError:
+			pass
+		raise
+
+
+def frame_chunks(columns):
+	""" Splits frame columns into runs of WRITE_CHUNK rows, each given as columns """
+	for start in range(0, len(columns[0]), WRITE_CHUNK):
+		yield [column[start:start + WRITE_CHUNK] for column in columns]
+
+
+def write_binary_snapshot(snapshot, outfile, progress=None):
+	""" Writes a Snapshot as a binary project to an open file """
+	strings = bytearray()
+
+	def add_string(text):
+		encoded = str(text).encode('utf-8')
+		offset = len(strings)
+		strings.extend(encoded)
+		return offset, len(encoded)
+
+	fpath_offset, fpath_length = add_string(snapshot.fpath)
+
+	sequences = bytearray()
+	first = 0
+	for name, speed, columns in snapshot.sequences:
+		name_offset, name_length = add_string(name)
+		sequences += SEQUENCE.pack(name_offset, name_length, speed, first, len(columns[0]))
+		first += len(columns[0])
+
+	outfile.write(HEADER.pack(MAGIC, VERSION, 0, len(snapshot.sequences), snapshot.frame_count,
+							  fpath_offset, fpath_length))
+	outfile.write(sequences)
+
+	written = 0
+	for _, _, columns in snapshot.sequences:
+		for chunk in frame_chunks(columns):
+			# Columns interleaved into records
+			frames = array('i', chain.from_iterable(zip(*chunk)))
+			if sys.byteorder != 'little':
+				frames.byteswap()
+			outfile.write(frames.tobytes())
+
+			written += len(chunk[0])
+			if progress is not None:
+				progress(written, snapshot.frame_count)
+
+	outfile.write(strings)
+
+
+def frame_dict(x, y, width, height, shift_x, shift_y, duration):
+	""" A frame as export_data gives it, only frames that don't last 1 / speed have a duration """
+	frame = {"pos": (x, y), "size": (width, height), "shift": (shift_x, shift_y)}
+	if duration:
+		frame["duration"] = duration
+	return frame
+
+
+def write_json_snapshot(snapshot, outfile, progress=None):
+	""" Writes the same text as json.dumps of export_data, a chunk of frames at a time """
+	outfile.write('{"fpath": %s, "sequences": [' % json.dumps(snapshot.fpath))
+
+	written = 0
+	for i, (name, speed, columns) in enumerate(snapshot.sequences):
+		if i > 0:
+			outfile.write(', ')
+		outfile.write('{"name": %s, "speed": %s, "frames": [' % (json.dumps(name), json.dumps(speed)))
+
+		for j, chunk in enumerate(frame_chunks(columns)):
+			frame_data = [frame_dict(*row) for row in zip(*chunk)]
+			if j > 0:
+				outfile.write(', ')
+			# Without the list's brackets, chunks are joined into one list
+			outfile.write(json.dumps(frame_data)[1:-1])
+
+			written += len(chunk[0])
+			if progress is not None:
+				progress(written, snapshot.frame_count)
+
+		outfile.write(']}')
+
+	outfile.write(']}')
+
+
+def write_snapshot(snapshot, path, progress=None):
+	""" Writes a Snapshot as binary when path has the binary extension, as JSON otherwise.
+		progress, when given, is called with the frames written so far and the frame count """
+	if path.lower().endswith(EXTENSION):
+		with replace_file(path, 'wb') as outfile:
+			write_binary_snapshot(snapshot, outfile, progress)
+	else:
+		with replace_file(path, 'w') as outfile:
+			write_json_snapshot(snapshot, outfile, progress)
+
+
+def write_binary(data, path):
+	""" Writes data, in the format of AnimationData.export_data, as a binary project """
+	with replace_file(path, 'wb') as outfile:
+		write_binary_snapshot(Snapshot.from_data(data), outfile)
+
+
+def read_sections(buffer):
+	""" Returns (fpath, sequences, frames) of a binary project in buffer, where sequences holds
+		(name, speed, first frame, frame count) and frames is a flat array of FRAME_FIELDS ints per frame.
+		Frames of older versions are widened with a duration of 0 """
+	if len(buffer) < HEADER.size:
+		raise ValueError("File is too short to be a binary project")
+
+	magic, version, _, sequence_count, frame_count, fpath_offset, fpath_length = HEADER.unpack_from(buffer, 0)
+	if magic != MAGIC:
+		raise ValueError("Not a binary project")
+	if version > VERSION:
+		raise ValueError("Binary project version %s is newer than this editor supports" % version)
+
+	fields = FRAME_FIELDS if version >= 2 else FRAME_FIELDS_V1
+	frames_start = HEADER.size + sequence_count * SEQUENCE.size
+	strings_start = frames_start + frame_count * fields * 4
+	if len(buffer) < strings_start:
+		raise ValueError("Binary project is truncated")
+
+	# The small sections are copied out, the frames are read into an array in one go
+	strings = buffer[strings_start:]
+
+	def get_string(offset, length):
+		if offset + length > len(strings):
+			raise ValueError("Binary project is truncated")
+		return strings[offset:offset + length].decode('utf-8')
+
+	fpath = get_string(fpath_offset, fpath_length)
+
+	sequences = []
+	for name_offset, name_length, speed, first, count in SEQUENCE.iter_unpack(buffer[HEADER.size:frames_start]):
+		if first + count > frame_count:
+			raise ValueError("Binary project has a sequence past the last frame")
+		sequences.append((get_string(name_offset, name_length), speed, first, count))
+
+	frames = array('i')
+	with memoryview(buffer) as view:
+		with view[frames_start:strings_start] as frame_view:
+			frames.frombytes(frame_view)
+
+	if sys.byteorder != 'little':
+		frames.byteswap()
+
+	if fields != FRAME_FIELDS:
+		widened = array('i', bytes(frame_count * FRAME_FIELDS * 4))
+		for field in range(fields):
+			widened[field::FRAME_FIELDS] = frames[field::fields]
+		frames = widened
+
+	return fpath, sequences, frames
+
+
+def open_sections(path):
+	""" read_sections of a binary project file. The file is memory mapped rather than read """
+	with open(path, 'rb') as infile:
+		with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+			return read_sections(buffer)
+
+
+def speed_value(speed):
+	""" Speeds are stored as doubles, whole numbers come back as ints like they went in """
+	return int(speed) if speed.is_integer() else speed
+
+
+def read_binary(path):
+	""" Returns a binary project in the format of AnimationData.export_data """
+	fpath, sequences, frames = open_sections(path)
+
+	sequence_data = []
+	for name, speed, first, count in sequences:
+		frame_data = []
+		for i in range(first * FRAME_FIELDS, (first + count) * FRAME_FIELDS, FRAME_FIELDS):
+			frame_data.append(frame_dict(*frames[i:i + FRAME_FIELDS]))
+		sequence_data.append({
+			"name": name,
+			"speed": speed_value(speed),
+			"frames": frame_data
+		})
+
+	return {
+		"fpath": fpath,
+		"sequences": sequence_data
+	}
+
+
+def load_binary(path, data_class=AnimationData):
+	""" Returns the data_class instance, an AnimationData of the core or the Qt adapter, of a binary project.
+		Each field of the frame records is sliced out of the frame array straight into the sequence's frame table,
+		without going through the nested dicts import_data takes """
+	fpath, sequences, frames = open_sections(path)
+
+	animation_data = data_class(fpath)
+	for name, speed, first, count in sequences:
+		start, end = first * FRAME_FIELDS, (first + count) * FRAME_FIELDS
+		columns = [frames[start + field:end:FRAME_FIELDS] for field in range(FRAME_FIELDS)]
+
+		sequence = animation_data.new_sequence(name, active=True, columns=columns)
+		sequence.speed = speed_value(speed)
+		if sequence.frames:
+			sequence.set_sole(sequence.frames[-1])
+
+	return animation_data
+
+
+def read_project(path):
+	""" Returns a JSON or binary project in the format of AnimationData.export_data """
+	if is_binary(path):
+		return read_binary(path)
+	with open(path, 'r') as infile:
+		return json.load(infile)
+
+
+def write_project(data, path):
+	""" Writes a project as binary when path has the binary extension, as JSON otherwise """
+	if path.lower().endswith(EXTENSION):
+		write_binary(data, path)
+	else:
+		# dumps uses the C encoder, dump streams through the pure Python one
+		with replace_file(path, 'w') as outfile:
+			outfile.write(json.dumps(data))
+
+
+def convert(source, destination):
+	""" Converts between JSON and binary projects, the format of each side follows its extension """
+	write_project(read_project(source), destination)
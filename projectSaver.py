@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+""" Saves projects on a worker thread.
+
+	The project is copied into a projectFile.Snapshot on the GUI thread, serializing and writing it
+	happen on the thread, so editing goes on while a large project is saved.
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+import logging
+import struct
+
+import projectFile
+
+
+class ProjectSaver(QThread):
+	""" Writes one snapshot at a time. Signals are delivered on the thread the saver was made on,
+		saved and failed once the thread has finished, so their slots can start the next save """
+
+	progress = pyqtSignal(int, int) # Frames written, frame count
+	saved = pyqtSignal(str) # Path
+	failed = pyqtSignal(str, str) # Path, message
+
+	def __init__(self, parent=None):
+		super(ProjectSaver, self).__init__(parent)
+		self.snapshot = None
+		self.path = None
+		self.error = None
+		self.finished.connect(self.report)
+
+	def save(self, animation_data, path):
+		""" Snapshots animation_data and starts writing it to path. Returns False when a save is still running """
+		if self.isRunning():
+			return False
+
+		self.snapshot = projectFile.Snapshot.of(animation_data)
+		self.path = path
+		self.error = None
+		self.start()
+		return True
+
+	def run(self):
+		try:
+			projectFile.write_snapshot(self.snapshot, self.path, self.progress.emit)
+		except (ValueError, struct.error) as error:
+			logging.error(error)
+			self.error = "There was an error while trying to save."
+		except OSError as error:
+			logging.error(error)
+			self.error = "Could not write to the animation data file."
+		finally:
+			self.snapshot = None
+
+	def report(self):
+		# finished is emitted from the thread just before it stops running
+		self.wait()
+		if self.error is None:
+			self.saved.emit(self.path)
+		else:
+			self.failed.emit(self.path, self.error)
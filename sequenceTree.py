@@ -1,13 +1,209 @@
 # -*- coding: utf-8 -*-
 
 from PyQt5 import QtGui, QtWidgets
-from PyQt5.QtCore import QPoint, QSize, QRect, Qt, pyqtSignal, QItemSelection, QItemSelectionModel
+from PyQt5.QtCore import QPoint, QSize, QRect, Qt, pyqtSignal, QItemSelection, QItemSelectionModel, \
+	QAbstractItemModel, QModelIndex
 import logging
 
 from animationTypes import *
+import editHistory
 
 # TODO alot.
 
+class SequenceModel(QAbstractItemModel):
+	""" Sequences of an AnimationData as rows, with their frames as child rows.
+		Frame rows are fetched in batches as a sequence is expanded and scrolled through.
+		Rows are put in and taken out as Change records come in, so the view keeps its selection and expansion.
+		Records arrive after the data has changed, the model keeps its own list of sequences that follows them """
+
+	FETCH_BATCH = 256 # Frame rows made available per fetch
+
+	def __init__(self, parent=None):
+		super(SequenceModel, self).__init__(parent)
+		self.animation_data = None
+		self.history = None
+		self.sequences = [] # The sequences as the view knows them
+		self._fetched = {} # id(sequence) -> number of its frame rows the view has been told about
+		self._rows = None # id(sequence) -> row, rebuilt after sequences are added or deleted
+		self._fetching = False # Views may ask for more rows while being told about the last fetch
+
+	def set_animation_data(self, animation_data, history=None):
+		self.beginResetModel()
+		self.animation_data = animation_data
+		self.history = history
+		self.sequences = list(animation_data.sequences)
+		self._fetched = {}
+		self._rows = None
+		self.endResetModel()
+
+	def sequence(self, index):
+		""" The sequence of a sequence row, or of the frame row's parent """
+		if not index.isValid() or self.animation_data is None:
+			return None
+		parent = index.internalPointer()
+		return parent if parent is not None else self.sequences[index.row()]
+
+	def frame(self, index):
+		""" The frame of a frame row, None for a sequence row """
+		if not index.isValid() or index.internalPointer() is None:
+			return None
+		frames = index.internalPointer().frames
+		return frames[index.row()] if index.row() < len(frames) else None
+
+	def sequence_index(self, sequence):
+		if self._rows is None:
+			self._rows = {id(item): row for row, item in enumerate(self.sequences)}
+		row = self._rows.get(id(sequence))
+		return self.createIndex(row, 0) if row is not None else QModelIndex()
+
+	""" QAbstractItemModel """
+	def index(self, row, column, parent=QModelIndex()):
+		if self.animation_data is None or not self.hasIndex(row, column, parent):
+			return QModelIndex()
+		if not parent.isValid():
+			return self.createIndex(row, column)
+		return self.createIndex(row, column, self.sequences[parent.row()])
+
+	def parent(self, index):
+		if not index.isValid() or index.internalPointer() is None:
+			return QModelIndex()
+		return self.sequence_index(index.internalPointer())
+
+	def rowCount(self, parent=QModelIndex()):
+		if self.animation_data is None:
+			return 0
+		if not parent.isValid():
+			return len(self.sequences)
+		if parent.internalPointer() is None:
+			return self._fetched.get(id(self.sequence(parent)), 0)
+		return 0
+
+	def columnCount(self, parent=QModelIndex()):
+		return 1
+
+	def hasChildren(self, parent=QModelIndex()):
+		if self.animation_data is None:
+			return False
+		if not parent.isValid():
+			return len(self.sequences) > 0
+		if parent.internalPointer() is None:
+			return len(self.sequence(parent).frames) > 0
+		return False
+
+	def canFetchMore(self, parent):
+		if self._fetching or not parent.isValid() or parent.internalPointer() is not None:
+			return False
+		sequence = self.sequence(parent)
+		return self._fetched.get(id(sequence), 0) < len(sequence.frames)
+
+	def fetchMore(self, parent):
+		if not self.canFetchMore(parent):
+			return
+
+		sequence = self.sequence(parent)
+		fetched = self._fetched.get(id(sequence), 0)
+		count = min(len(sequence.frames), fetched + self.FETCH_BATCH)
+
+		self._fetching = True
+		try:
+			self.beginInsertRows(parent, fetched, count - 1)
+			self._fetched[id(sequence)] = count
+			self.endInsertRows()
+		finally:
+			self._fetching = False
+
+	def data(self, index, role=Qt.DisplayRole):
+		if not index.isValid():
+			return None
+
+		if index.internalPointer() is None:
+			if role in (Qt.DisplayRole, Qt.EditRole):
+				return self.sequence(index).name
+			return None
+
+		frame = self.frame(index)
+		if frame is not None and role == Qt.DisplayRole:
+			return "%s  (%s, %s, %s, %s)" % ((index.row(),) + frame.values()[:4])
+		return None
+
+	def setData(self, index, value, role=Qt.EditRole):
+		# Only sequences are renamed
+		if role != Qt.EditRole or self.frame(index) is not None:
+			return False
+
+		sequence = self.sequence(index)
+		if value == sequence.name:
+			return False
+
+		before = (sequence.name, sequence.speed)
+		try:
+			# The row is updated from the change this emits
+			sequence.edit(value, sequence.speed)
+		except ValueError as error:
+			logging.warning(str(error))
+			return False
+		if self.history is not None:
+			self.history.push(editHistory.EditSequence(sequence, before, (sequence.name, sequence.speed), "Rename sequence"))
+		return True
+
+	def flags(self, index):
+		if not index.isValid():
+			return Qt.NoItemFlags
+		if index.internalPointer() is None:
+			return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+		return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemNeverHasChildren
+
+	""" CHANGES """
+	def handle_changes(self, changes):
+		""" Turns Change records into row notifications, in the order they happened """
+		for change in changes:
+			if change.event is AnimationEvent.NEW_SEQUENCE:
+				self.beginInsertRows(QModelIndex(), change.index, change.index)
+				self.sequences.insert(change.index, change.sequence)
+				self._rows = None
+				self.endInsertRows()
+
+			elif change.event is AnimationEvent.SEQUENCE_DELETED:
+				self.beginRemoveRows(QModelIndex(), change.index, change.index)
+				del self.sequences[change.index]
+				self._fetched.pop(id(change.sequence), None)
+				self._rows = None
+				self.endRemoveRows()
+
+			elif change.event is AnimationEvent.SEQUENCE_ALTERED:
+				index = self.sequence_index(change.sequence)
+				if index.isValid():
+					self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+
+			else:
+				self.frames_changed(change)
+
+	def frames_changed(self, change):
+		sequence = change.sequence
+		fetched = self._fetched.get(id(sequence), 0)
+		if fetched == 0:
+			return
+		parent = self.sequence_index(sequence)
+		if not parent.isValid():
+			return
+
+		if change.event is AnimationEvent.FRAME_ALTERED:
+			rows = [sequence.frame_index(frame) for frame in change.frames]
+			rows = [row for row in rows if row is not None and row < fetched]
+			if rows:
+				self.dataChanged.emit(self.index(min(rows), 0, parent), self.index(max(rows), 0, parent), [Qt.DisplayRole])
+			return
+
+		# Frame rows show the position of their frame, after frames come or go the rows are the same
+		# but for the count. Rows past the end are taken out, new frames past fetched rows wait for a fetch
+		count = len(sequence.frames)
+		if count < fetched:
+			self.beginRemoveRows(parent, count, fetched - 1)
+			self._fetched[id(sequence)] = fetched = count
+			self.endRemoveRows()
+		if fetched:
+			self.dataChanged.emit(self.index(0, 0, parent), self.index(fetched - 1, 0, parent), [Qt.DisplayRole])
+
 class SpritesheetAnimationList(QtWidgets.QTreeView):
 
 	animation_data_changed = pyqtSignal()
@@ -23,15 +219,11 @@ class SpritesheetAnimationList(QtWidgets.QTreeView):
 		self.setFocusPolicy(Qt.ClickFocus)
 		self.setSelectionMode(QtWidgets.QTreeView.ExtendedSelection)
 
-		self.model = QtGui.QStandardItemModel()
-		self.model.insertColumn(0)
+		self.model = SequenceModel(self)
 		self.setModel(self.model)
 		
-		#Import available sprite sequences 
-		self.model.setRowCount(0)
-		
 		self.animation_data = None
-		self.clicked_item = None
+		self.history = None
 
 	def init_ui(self):
 		""" How this object looks """
@@ -39,53 +231,54 @@ class SpritesheetAnimationList(QtWidgets.QTreeView):
 		self.setMinimumSize(QSize(200, 0))
 		self.setMaximumSize(QSize(200, 2000))		
 		
-	def load_animation_data(self, animation_data):
+	def load_animation_data(self, animation_data, history=None):
 		self.animation_data = animation_data
-		self.animation_data.data_changed.connect(self.renew)
-		self.update_tree()
-		
-	def renew(self, e):
-		if e == AnimationEvent.NEW_SEQUENCE or e == AnimationEvent.SEQUENCE_DELETED:
-			self.update_tree()
-
-	def update_tree(self):
-		active_seq_item = None
+		self.history = history
+		self.model.set_animation_data(animation_data, history)
+		self.animation_data.changes.connect(self.model.handle_changes)
+		self.animation_data.changes.connect(self.handle_changes)
+		self.show_active_sequence()
 
-		self.model.clear()
-		for sequence in self.animation_data.sequences:
-			sequence_item = QtGui.QStandardItem(sequence.name)
-			if sequence == self.animation_data.active_sequence:
-				active_seq_item = sequence_item
+	def handle_changes(self, changes):
+		# The model has put the rows in already
+		if any(change.event is AnimationEvent.NEW_SEQUENCE and change.sequence is self.animation_data.active_sequence
+			   for change in changes):
+			self.show_active_sequence()
 
-			self.model.appendRow(sequence_item)
-
-		if active_seq_item is not None:
-			self.setCurrentIndex(active_seq_item.index())
+	def show_active_sequence(self):
+		if self.animation_data.active_sequence is not None:
+			self.setCurrentIndex(self.model.sequence_index(self.animation_data.active_sequence))
 
 
 	""" EVENTS """
-	def dataChanged(self, QModelIndex, _, roles, p_int=None, *args, **kwargs):
-		#Something gets renamed or deleted
-		item = self.model.itemFromIndex(QModelIndex)
-		self.animation_data.active_sequence.name = item.text()
-
-
 	def selectionChanged(self, selected: QItemSelection, deselected: QItemSelection) -> None:
 		# WARNING: selectionChanged will be called before init()
 		if not hasattr(self, "animation_data"):
 			return
 
 
-		for index in selected.indexes():
-			name = self.model.itemFromIndex(index).text()
-			self.animation_data.select(name)
-
-		for index in deselected.indexes():
-			name = self.model.itemFromIndex(index).text()
-			self.animation_data.deselect(name)
-
-		for sequence in self.animation_data.selected:
-			sequence.select_all()
+		with self.animation_data.transaction():
+			sequences_changed = False
+			for index in selected.indexes():
+				frame = self.model.frame(index)
+				if frame is None:
+					self.animation_data.select(self.model.sequence(index))
+					sequences_changed = True
+				elif self.model.sequence(index).frame_index(frame) is not None:
+					self.model.sequence(index).select(frame)
+
+			for index in deselected.indexes():
+				frame = self.model.frame(index)
+				if frame is None:
+					self.animation_data.deselect(self.model.sequence(index))
+					sequences_changed = True
+				else:
+					self.model.sequence(index).deselect(frame)
+
+			# Picking sequences picks all of their frames, picking frame rows picks only those
+			if sequences_changed:
+				for sequence in self.animation_data.selected:
+					sequence.select_all()
 
 		self.animation_data_changed.emit()
 
@@ -127,16 +320,16 @@ class SpritesheetAnimationList(QtWidgets.QTreeView):
 	def mousePressEvent(self, mouse):
 
 		index = self.indexAt(mouse.pos())
-		if index is not None:
-			self.clicked_item = self.model.itemFromIndex(index)
-			if self.clicked_item is not None:
-				# Set Sequence as active
-				sequence = self.animation_data.get_sequence(self.clicked_item.text())
-				self.animation_data.active_sequence = sequence
-				self.animation_data.active_sequence.select_all()
-				self.animation_data_changed.emit()
+		if index.isValid():
+			# Set Sequence as active, a frame row makes its frame the active frame
+			sequence = self.model.sequence(index)
+			frame = self.model.frame(index)
+			self.animation_data.active_sequence = sequence
+			if frame is None:
+				sequence.select_all()
 			else:
-				self.animation_data.deselect_all()
+				sequence.set_sole(frame)
+			self.animation_data_changed.emit()
 		else:
 			self.animation_data.deselect_all()
 
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+""" Plays sequences back to back, without any Qt dependency.
+
+	A Sequencer plays steps, each one sequence played a number of times or for a length of time.
+	When a step ends, the first of its transitions whose condition holds picks the next step,
+	or the step after it in the list when none does, so steps can run in order or branch like a state machine.
+	A step starts exactly where the one before it ended in playback time, whenever the tick that notices comes,
+	so there is no gap between them. Time is read from a clock that can be swapped for a virtual one.
+	On entering a step, the frames of the steps it can lead to are handed to a prefetch callback.
+"""
+
+from bisect import bisect_left, bisect_right
+import time
+
+from animationCore import Signal
+from playbackClock import Stopwatch, Timeline
+
+
+class Transition:
+	""" Leads to the step named target. condition is called with the sequencer's variables when the step ends,
+		the transition is taken when it returns True. Without a condition it is always taken """
+
+	__slots__ = ("target", "condition")
+
+	def __init__(self, target, condition=None):
+		self.target = target
+		self.condition = condition
+
+
+class Step:
+	""" A sequence played loops times over, or for duration milliseconds when given.
+		The name, which transitions lead to, defaults to the sequence's name and has to be unique among the steps """
+
+	__slots__ = ("name", "sequence", "loops", "duration", "transitions", "timeline")
+
+	def __init__(self, sequence, loops=1, duration=None, transitions=(), name=None):
+		self.name = name if name is not None else sequence.name
+		self.sequence = sequence
+		self.loops = loops
+		self.duration = duration
+		self.transitions = list(transitions)
+		self.timeline = Timeline(sequence.frame_durations()) # Taken again each time the step is entered
+
+	def length(self):
+		""" Milliseconds the step plays for """
+		if self.duration is not None:
+			return self.duration
+		return self.loops * self.timeline.total
+
+	def frame_step(self, offset):
+		""" Frames come on show from the start of the step up to offset milliseconds in """
+		timeline = self.timeline
+		if not len(timeline) or timeline.total <= 0:
+			return 0
+		loops, rest = divmod(offset, timeline.total)
+		return int(loops) * len(timeline) + bisect_right(timeline.starts, rest) - 1
+
+	def frame_count(self):
+		""" Frames that come on show over the whole step """
+		timeline = self.timeline
+		if not len(timeline) or timeline.total <= 0:
+			return 0
+		loops, rest = divmod(self.length(), timeline.total)
+		return int(loops) * len(timeline) + bisect_left(timeline.starts, rest)
+
+
+class Sequencer(Stopwatch):
+	""" Plays steps one after another. After the last step playback ends on its last frame,
+		or starts over from the first step when loop is set """
+
+	def __init__(self, steps, loop=False, prefetch=None, clock=time.monotonic):
+		super(Sequencer, self).__init__(clock)
+		self.steps = list(steps)
+		self.loop = loop
+		self.prefetch = prefetch # Called with the frames of the step entered and the steps it can lead to
+		self.variables = {} # Handed to the conditions of transitions
+		self.step_changed = Signal() # Emitted with the index of each step entered
+
+		self._positions = {}
+		for i, step in enumerate(self.steps):
+			if step.name in self._positions:
+				raise ValueError("Sequencer steps need unique names, '%s' is given twice" % step.name)
+			self._positions[step.name] = i
+		for step in self.steps:
+			for transition in step.transitions:
+				if transition.target not in self._positions:
+					raise ValueError("Step '%s' leads to '%s', which isn't a step" % (step.name, transition.target))
+		self.restart()
+
+	def restart(self):
+		""" Goes back to the first step """
+		self.step_index = None
+		self.step_start = 0 # Playback time the step started at
+		self.frames_before = 0 # Frames that came on show in the steps before
+		self.finished = False
+		if self.steps:
+			self.enter(0, 0)
+
+	def seek(self, t):
+		""" Moves playback to t milliseconds in. Seeking back plays the steps over from the first """
+		if t < self.step_start:
+			self.restart()
+		super(Sequencer, self).seek(t)
+		self.advance(t)
+
+	def step(self):
+		return self.steps[self.step_index] if self.step_index is not None else None
+
+	def next_step(self, index):
+		""" Index of the step the step at index leads to, None when playback ends after it """
+		for transition in self.steps[index].transitions:
+			if transition.condition is None or transition.condition(self.variables):
+				return self._positions[transition.target]
+
+		if index + 1 < len(self.steps):
+			return index + 1
+		return 0 if self.loop else None
+
+	def following_steps(self, index):
+		""" Indices of every step the step at index can lead to """
+		following = [self._positions[transition.target] for transition in self.steps[index].transitions]
+		if index + 1 < len(self.steps):
+			following.append(index + 1)
+		elif self.loop:
+			following.append(0)
+		return following
+
+	def step_frames(self, index):
+		""" Frames of the step at index followed by those of the steps it can lead to """
+		frames = list(self.steps[index].sequence.frames)
+		for following in self.following_steps(index):
+			if following != index:
+				frames.extend(self.steps[following].sequence.frames)
+		return frames
+
+	def retime(self):
+		""" Takes the frame durations of the step on show again after its sequence changed. The step still starts
+			when it did, other steps are timed afresh as they are entered """
+		step = self.step()
+		if step is not None:
+			step.timeline = Timeline(step.sequence.frame_durations())
+
+	def enter(self, index, start):
+		step = self.steps[index]
+		step.timeline = Timeline(step.sequence.frame_durations())
+		self.step_index = index
+		self.step_start = start
+		self.step_changed.emit(index)
+
+		if self.prefetch is not None:
+			self.prefetch(self.step_frames(index))
+
+	def advance(self, t):
+		""" Follows the transitions of every step that has ended by t """
+		entered = 0
+		while not self.finished and self.step_index is not None:
+			step = self.steps[self.step_index]
+			end = self.step_start + step.length()
+			if t < end:
+				return
+
+			following = self.next_step(self.step_index)
+			# Steps that take no time could lead to each other for ever
+			entered += 1
+			if following is None or entered > len(self.steps) and step.length() <= 0:
+				self.finished = True
+				return
+
+			self.frames_before += step.frame_count()
+			self.enter(following, end)
+
+	def locate(self, t):
+		""" (sequence, frame index, frames shown since time 0, start) at t milliseconds in, following transitions
+			up to t. Start is when the frame came on show """
+		self.advance(t)
+		step = self.step()
+		if step is None or not len(step.timeline):
+			return None, None, self.frames_before, t
+
+		timeline = step.timeline
+		if self.finished:
+			last = len(timeline) - 1
+			return step.sequence, last, self.frames_before + max(step.frame_count() - 1, 0), t
+
+		offset = t - self.step_start
+		if timeline.total <= 0:
+			return step.sequence, 0, self.frames_before, self.step_start
+
+		loops, rest = divmod(offset, timeline.total)
+		index = timeline.index_at(rest)
+		start = self.step_start + loops * timeline.total + timeline.start(index)
+		return step.sequence, index, self.frames_before + step.frame_step(offset), start
+
+	def tick(self):
+		""" (sequence, frame index) to show now, counted in the stats. None when there is nothing to show """
+		t = self.elapsed()
+		sequence, index, frame_step, start = self.locate(t)
+		if index is None:
+			return None
+
+		self.count(frame_step, t, start)
+		return sequence, index
+
+	def until_next(self):
+		""" Milliseconds until the next frame or step is due, None once playback has ended """
+		t = self.elapsed()
+		sequence, index, _, start = self.locate(t)
+		if index is None or self.finished:
+			return None
+
+		step = self.step()
+		timeline = step.timeline
+		step_end = self.step_start + step.length()
+		if timeline.total <= 0:
+			return max(step_end - t, 0)
+		return max(min(start + timeline.durations[index], step_end) - t, 0)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+""" Plays sequences back to back.
+
+	The view plays the steps of a Sequencer, which prefetches the frames of the steps coming up
+	into the view's FrameCache, so a step starts without waiting for its frames to be cut.
+	The window follows edits of the sequences it plays, the way the preview window does.
+"""
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPointF, Qt, QTimer
+import logging
+import math
+import time
+
+from animationCore import AnimationEvent
+import frameCache
+from previewGrid import sequence_extent
+import sequencer
+
+
+def steps_extent(steps):
+	""" (left, top, right, bottom) around the frames of every step, never smaller than a pixel about the axes """
+	extents = [sequence_extent(step.sequence) for step in steps]
+	return (min([left for left, _, _, _ in extents] + [0]), min([top for _, top, _, _ in extents] + [0]),
+			max([right for _, _, right, _ in extents] + [1]), max([bottom for _, _, _, bottom in extents] + [1]))
+
+
+class SequencerView(QtWidgets.QWidget):
+	""" Plays the steps of a Sequencer, drawing frames about the middle of the view like the player """
+
+	MAX_SCALE = 4
+
+	def __init__(self, parent=None, clock=time.monotonic):
+		super(SequencerView, self).__init__(parent)
+		self.clock = clock
+		self.sequencer = None
+		self.shown = None # (sequence, frame index) on show
+		self.scale = 1
+		self.extent = (0, 0, 0, 0)
+
+		self.frame_cache = frameCache.FrameCache(self)
+
+		self.timer = QTimer(self)
+		self.timer.setTimerType(Qt.PreciseTimer)
+		self.timer.setSingleShot(True)
+		self.timer.timeout.connect(self.tick)
+
+	def set_steps(self, steps, image, loop=True):
+		self.stop()
+		self.frame_cache.set_image(image)
+		self.shown = None
+
+		# The scale is settled before the sequencer enters its first step and prefetches its frames
+		self.extent = steps_extent(steps)
+		self.fit_scale()
+		self.sequencer = sequencer.Sequencer(steps, loop=loop, prefetch=self.frame_cache.fill, clock=self.clock)
+		self.update()
+
+	def fit_scale(self):
+		""" Scales the frames of every step to fit the view. Returns True when the scale changed,
+			which empties the frame cache """
+		left, top, right, bottom = self.extent
+		scale = min(self.width() / max(right - left, 1), self.height() / max(bottom - top, 1), self.MAX_SCALE)
+		if scale == self.scale:
+			return False
+		self.scale = scale
+		self.frame_cache.set_scale(scale)
+		return True
+
+	def fit(self):
+		""" Scales the frames to fit the view, rendering the frames of the step on show and the steps it leads to again """
+		if self.fit_scale() and self.sequencer is not None and self.sequencer.step() is not None:
+			self.frame_cache.fill(self.sequencer.step_frames(self.sequencer.step_index))
+		self.update()
+
+	def handle_changes(self, changes):
+		""" Follows frames added to, taken out of or altered in the sequences of the steps, and changes of their speed """
+		if self.sequencer is None:
+			return
+
+		played = set(id(step.sequence) for step in self.sequencer.steps)
+		changed = False
+		for change in changes:
+			if id(change.sequence) not in played:
+				continue
+			if change.event is AnimationEvent.FRAME_ALTERED or change.event is AnimationEvent.FRAME_DELETED:
+				for frame in change.frames:
+					self.frame_cache.discard(frame)
+			changed = True
+
+		if not changed:
+			return
+		self.extent = steps_extent(self.sequencer.steps)
+		self.sequencer.retime()
+		self.fit_scale()
+		# Altered and added frames are rendered again, every frame when the scale changed
+		if self.sequencer.step() is not None:
+			self.frame_cache.fill(self.sequencer.step_frames(self.sequencer.step_index))
+		if self.playing():
+			self.tick()
+		self.update()
+
+	def playing(self):
+		return self.sequencer is not None and self.sequencer.playing()
+
+	def play(self):
+		if self.sequencer is None:
+			return
+		if self.sequencer.finished:
+			self.sequencer.seek(0)
+		self.sequencer.start()
+		self.tick()
+
+	def stop(self):
+		self.timer.stop()
+		if self.sequencer is not None:
+			self.sequencer.stop()
+			logging.debug("Sequencer %s" % self.sequencer.stats())
+
+	def tick(self):
+		shown = self.sequencer.tick()
+		if shown != self.shown:
+			self.shown = shown
+			self.update()
+
+		wait = self.sequencer.until_next()
+		if wait is not None:
+			self.timer.start(math.ceil(wait))
+
+	def resizeEvent(self, event):
+		super(SequencerView, self).resizeEvent(event)
+		self.fit()
+
+	def paintEvent(self, event):
+		qp = QtGui.QPainter()
+		qp.begin(self)
+		qp.fillRect(self.rect(), QtGui.QColor(255, 255, 255))
+
+		if self.shown is not None:
+			sequence, index = self.shown
+			if index < len(sequence.frames):
+				frame = sequence.frames[index]
+				pixmap = self.frame_cache.get(frame)
+				if pixmap is not None:
+					left, top, right, bottom = self.extent
+					_, _, _, height, shift_x, shift_y = frame.values()
+					x = (self.width() - (right - left) * self.scale) / 2 + (shift_x - left) * self.scale
+					y = (self.height() - (bottom - top) * self.scale) / 2 + (shift_y - height - top) * self.scale
+					qp.drawPixmap(QPointF(x, y), pixmap)
+
+		qp.end()
+
+
+class SequencerWindow(QtWidgets.QDialog):
+	""" Plays the selected sequences one after another, in the order they were selected """
+
+	def __init__(self, parent=None):
+		super(SequencerWindow, self).__init__(parent)
+		self.animation_data = None
+		self.sequences = []
+		self.image = None
+		self.init_ui()
+
+	def init_ui(self):
+		self.setWindowTitle("Sequencer")
+		self.resize(400, 400)
+
+		layout = QtWidgets.QVBoxLayout(self)
+
+		self.view = SequencerView()
+		layout.addWidget(self.view, 1)
+
+		self.step_label = QtWidgets.QLabel()
+		layout.addWidget(self.step_label)
+
+		tool_bar = QtWidgets.QHBoxLayout()
+		self.play_btn = QtWidgets.QPushButton("Pause")
+		self.play_btn.clicked.connect(self.toggle_play)
+		tool_bar.addWidget(self.play_btn)
+
+		tool_bar.addWidget(QtWidgets.QLabel("Plays of each"))
+		self.loops_widget = QtWidgets.QSpinBox()
+		self.loops_widget.setRange(1, 100)
+		self.loops_widget.valueChanged.connect(self.restart)
+		tool_bar.addWidget(self.loops_widget)
+		layout.addLayout(tool_bar)
+
+	def show_sequences(self, animation_data, sequences, image):
+		if self.animation_data is not None:
+			self.animation_data.changes.disconnect(self.handle_changes)
+		self.animation_data = animation_data
+		self.animation_data.changes.connect(self.handle_changes)
+
+		self.sequences = list(sequences)
+		self.image = image
+		self.restart()
+
+	def handle_changes(self, changes):
+		""" Plays on without the sequences deleted, shows new names and passes edits of frames and speeds to the view """
+		deleted = [change.sequence for change in changes if change.event is AnimationEvent.SEQUENCE_DELETED]
+		if any(sequence in deleted for sequence in self.sequences):
+			self.sequences = [sequence for sequence in self.sequences if sequence not in deleted]
+			if self.sequences:
+				self.restart()
+			else:
+				self.reject()
+			return
+
+		self.view.handle_changes(changes)
+		if any(change.event is AnimationEvent.SEQUENCE_ALTERED for change in changes):
+			self.step_changed(self.view.sequencer.step_index)
+
+	def restart(self):
+		steps = [sequencer.Step(sequence, loops=self.loops_widget.value()) for sequence in self.sequences]
+		self.view.set_steps(steps, self.image)
+		self.view.sequencer.step_changed.connect(self.step_changed)
+		self.step_changed(0)
+		self.view.play()
+		self.play_btn.setText("Pause")
+
+	def step_changed(self, index):
+		self.step_label.setText("%s (%s of %s)" % (self.sequences[index].name, index + 1, len(self.sequences)))
+
+	def toggle_play(self):
+		if self.view.playing():
+			self.view.stop()
+			self.play_btn.setText("Play")
+		else:
+			self.view.play()
+			self.play_btn.setText("Pause")
+
+	def done(self, result):
+		# Closing the window stops playback and the frame cache's worker
+		self.view.stop()
+		self.view.frame_cache.stop()
+		if self.animation_data is not None:
+			self.animation_data.changes.disconnect(self.handle_changes)
+			self.animation_data = None
+		super(SequencerWindow, self).done(result)
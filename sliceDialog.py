@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QPoint, QSize
+
+
+class GridSliceDialog(QtWidgets.QDialog):
+	""" Asks for the layout of a uniform grid of frames """
+
+	def __init__(self, parent=None, sheet_size=None):
+		super(GridSliceDialog, self).__init__(parent)
+
+		self.sheet_size = sheet_size if sheet_size is not None else QSize(4096, 4096)
+		self.init_ui()
+
+	def init_ui(self):
+		self.setWindowTitle("Slice grid")
+
+		self.form = QtWidgets.QFormLayout(self)
+
+		self.cell_width = self.make_spin_box(1, 32)
+		self.cell_height = self.make_spin_box(1, 32)
+		self.form.addRow("Cell size", self.make_pair(self.cell_width, self.cell_height))
+
+		self.offset_x = self.make_spin_box(0, 0)
+		self.offset_y = self.make_spin_box(0, 0)
+		self.form.addRow("Offset", self.make_pair(self.offset_x, self.offset_y))
+
+		self.spacing_x = self.make_spin_box(0, 0)
+		self.spacing_y = self.make_spin_box(0, 0)
+		self.form.addRow("Spacing", self.make_pair(self.spacing_x, self.spacing_y))
+
+		self.skip_empty_box = QtWidgets.QCheckBox("Skip empty cells")
+		self.skip_empty_box.setChecked(True)
+		self.form.addRow(self.skip_empty_box)
+
+		self.cell_count_label = QtWidgets.QLabel()
+		self.form.addRow(self.cell_count_label)
+
+		self.buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+		self.buttons.accepted.connect(self.accept)
+		self.buttons.rejected.connect(self.reject)
+		self.form.addRow(self.buttons)
+
+		for spin_box in (self.cell_width, self.cell_height, self.offset_x, self.offset_y, self.spacing_x, self.spacing_y):
+			spin_box.valueChanged.connect(self.update_cell_count)
+		self.update_cell_count()
+
+	def make_spin_box(self, minimum, value):
+		spin_box = QtWidgets.QSpinBox()
+		spin_box.setRange(minimum, max(self.sheet_size.width(), self.sheet_size.height()))
+		spin_box.setValue(value)
+		return spin_box
+
+	@staticmethod
+	def make_pair(widget_a, widget_b):
+		layout = QtWidgets.QHBoxLayout()
+		layout.addWidget(widget_a)
+		layout.addWidget(QtWidgets.QLabel("x"))
+		layout.addWidget(widget_b)
+		return layout
+
+	def update_cell_count(self):
+		cols = max(0, (self.sheet_size.width() - self.offset_x.value() + self.spacing_x.value()) // (self.cell_width.value() + self.spacing_x.value()))
+		rows = max(0, (self.sheet_size.height() - self.offset_y.value() + self.spacing_y.value()) // (self.cell_height.value() + self.spacing_y.value()))
+		self.cell_count_label.setText("%s x %s cells" % (cols, rows))
+		self.buttons.button(QtWidgets.QDialogButtonBox.Ok).setEnabled(cols * rows > 0)
+
+	def cell_size(self):
+		return QSize(self.cell_width.value(), self.cell_height.value())
+
+	def offset(self):
+		return QPoint(self.offset_x.value(), self.offset_y.value())
+
+	def spacing(self):
+		return QSize(self.spacing_x.value(), self.spacing_y.value())
+
+	def skip_empty(self):
+		return self.skip_empty_box.isChecked()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import Qt, QPoint, QSize
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+import logging
+import multiprocessing
+import os
+import re
+
+from animationTypes import AnimationFrame
+
+# Any run of non zero mask bytes is a run of sprite pixels
+SPRITE_RUN = re.compile(rb'[^\x00]+')
+
+PARALLEL_MIN_PIXELS = 4096 * 4096 # Smaller sheets are labelled in this process
+MIN_STRIP_HEIGHT = 256
+
+
+def sprite_mask(image, background=None):
+	""" Returns (data, stride) of a one byte per pixel mask of image, zero where there is background.
+		Uses the alpha channel when the sheet has a transparent background,
+		otherwise the most common corner colour is treated as the background. background overrides it """
+	if background is None:
+		corners = [image.pixel(x, y) for x, y in ((0, 0), (image.width() - 1, 0),
+												  (0, image.height() - 1), (image.width() - 1, image.height() - 1))]
+		background = Counter(corners).most_common(1)[0][0]
+
+		if image.hasAlphaChannel() and QtGui.qAlpha(background) == 0:
+			mask = image.convertToFormat(QtGui.QImage.Format_Alpha8)
+			return mask.constBits().asstring(mask.sizeInBytes()), mask.bytesPerLine()
+	elif isinstance(background, QtGui.QColor):
+		background = background.rgba()
+
+	mask = image.createMaskFromColor(background, Qt.MaskOutColor).convertToFormat(QtGui.QImage.Format_Grayscale8)
+	return mask.constBits().asstring(mask.sizeInBytes()), mask.bytesPerLine()
+
+
+def label_strip(data, stride, width, top, height):
+	""" Finds 8-connected components in rows top to top + height of a mask.
+		Returns (boxes, first_runs, last_runs). boxes maps a label to [left, top, right, bottom],
+		first_runs and last_runs are the (start, end, label) runs of the strip's first and last rows,
+		used to stitch components across strip borders """
+	parent = []
+	boxes = {}
+
+	def find(label):
+		while parent[label] != label:
+			parent[label] = parent[parent[label]]
+			label = parent[label]
+		return label
+
+	first_runs = []
+	prev_runs = []
+	for y in range(top, top + height):
+		offset = y * stride
+		row = data[offset:offset + width]
+
+		runs = []
+		j = 0
+		for match in SPRITE_RUN.finditer(row):
+			start, end = match.span()
+
+			# Skip runs of the previous row that end before this one starts (diagonals count as touching)
+			while j < len(prev_runs) and prev_runs[j][1] < start:
+				j += 1
+
+			label = None
+			k = j
+			while k < len(prev_runs) and prev_runs[k][0] <= end:
+				root = find(prev_runs[k][2])
+				if label is None:
+					label = root
+				elif root != label:
+					parent[root] = label
+					box, merged = boxes[label], boxes.pop(root)
+					box[0] = min(box[0], merged[0])
+					box[1] = min(box[1], merged[1])
+					box[2] = max(box[2], merged[2])
+				k += 1
+
+			if label is None:
+				label = len(parent)
+				parent.append(label)
+				boxes[label] = [start, y, end - 1, y]
+			else:
+				box = boxes[label]
+				box[0] = min(box[0], start)
+				box[2] = max(box[2], end - 1)
+				box[3] = y
+
+			runs.append((start, end, label))
+
+		if y == top:
+			first_runs = runs
+		prev_runs = runs
+
+	# Resolve the runs at the edges to their final labels
+	first_runs = [(start, end, find(label)) for start, end, label in first_runs]
+	last_runs = [(start, end, find(label)) for start, end, label in prev_runs]
+
+	return boxes, first_runs, last_runs
+
+
+def stitch_strips(strips):
+	""" Merges the components of neighbouring strips that touch across the strip border """
+	parent = {}
+
+	def find(key):
+		while parent[key] != key:
+			parent[key] = parent[parent[key]]
+			key = parent[key]
+		return key
+
+	for i, (boxes, _, _) in enumerate(strips):
+		for label in boxes:
+			parent[(i, label)] = (i, label)
+
+	for i in range(1, len(strips)):
+		above = strips[i - 1][2]
+		below = strips[i][1]
+		j = 0
+		for start, end, label in below:
+			while j < len(above) and above[j][1] < start:
+				j += 1
+			k = j
+			while k < len(above) and above[k][0] <= end:
+				root_a = find((i - 1, above[k][2]))
+				root_b = find((i, label))
+				if root_a != root_b:
+					parent[root_b] = root_a
+				k += 1
+
+	merged = {}
+	for i, (boxes, _, _) in enumerate(strips):
+		for label, box in boxes.items():
+			root = find((i, label))
+			if root in merged:
+				m_box = merged[root]
+				m_box[0] = min(m_box[0], box[0])
+				m_box[1] = min(m_box[1], box[1])
+				m_box[2] = max(m_box[2], box[2])
+				m_box[3] = max(m_box[3], box[3])
+			else:
+				merged[root] = list(box)
+
+	return list(merged.values())
+
+
+def reading_order(boxes):
+	""" Sorts boxes into rows from top to bottom, then left to right within each row """
+	rows = []
+	for box in sorted(boxes, key=lambda b: (b[1], b[0])):
+		if rows and box[1] <= rows[-1][0]:
+			rows[-1][1].append(box)
+			rows[-1][0] = max(rows[-1][0], box[3])
+		else:
+			rows.append([box[3], [box]])
+
+	ordered = []
+	for _, row in rows:
+		ordered.extend(sorted(row, key=lambda b: b[0]))
+	return ordered
+
+
+def find_sprites(image, background=None, min_size=2, workers=None):
+	""" Returns the bounding boxes of every sprite on the sheet as [left, top, right, bottom] in reading order.
+		Sprites smaller than min_size in both directions are treated as noise.
+		Large sheets are split into horizontal strips that are labelled in a process pool.
+		The workers are spawned rather than forked, forking a process with Qt threads running can deadlock the child """
+	if image.isNull():
+		return []
+
+	width, height = image.width(), image.height()
+	data, stride = sprite_mask(image, background)
+
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	if workers > 1 and width * height >= PARALLEL_MIN_PIXELS:
+		strip_height = max(MIN_STRIP_HEIGHT, -(-height // workers))
+		tops = range(0, height, strip_height)
+		with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+			futures = []
+			for top in tops:
+				strip_rows = min(strip_height, height - top)
+				strip = data[top * stride:(top + strip_rows) * stride]
+				futures.append(executor.submit(label_strip, strip, stride, width, 0, strip_rows))
+
+			strips = []
+			for top, future in zip(tops, futures):
+				boxes, first_runs, last_runs = future.result()
+				for box in boxes.values():
+					box[1] += top
+					box[3] += top
+				strips.append((boxes, first_runs, last_runs))
+	else:
+		strips = [label_strip(data, stride, width, 0, height)]
+
+	boxes = stitch_strips(strips)
+	boxes = [box for box in boxes if box[2] - box[0] + 1 >= min_size or box[3] - box[1] + 1 >= min_size]
+	logging.info("Found %s sprites" % len(boxes))
+
+	return reading_order(boxes)
+
+
+def auto_slice(image, background=None, min_size=2, workers=None):
+	""" Returns an AnimationFrame for every sprite on the sheet """
+	return [AnimationFrame(QPoint(left, top), QSize(right - left + 1, bottom - top + 1))
+			for left, top, right, bottom in find_sprites(image, background, min_size, workers)]
+
+
+def grid_cells(image, cell_size, offset=QPoint(0, 0), spacing=QSize(0, 0), skip_empty=False, background=None):
+	""" Returns [left, top, right, bottom] of every whole cell of a uniform grid over the sheet, row by row.
+		With skip_empty, cells without a single sprite pixel are left out. The test walks the sheet once,
+		marking the cells touched by each run of sprite pixels """
+	cell_w, cell_h = cell_size.width(), cell_size.height()
+	pitch_x, pitch_y = cell_w + spacing.width(), cell_h + spacing.height()
+	if cell_w <= 0 or cell_h <= 0 or pitch_x <= 0 or pitch_y <= 0:
+		return []
+
+	left, top = offset.x(), offset.y()
+	cols = max(0, (image.width() - left + spacing.width()) // pitch_x)
+	rows = max(0, (image.height() - top + spacing.height()) // pitch_y)
+
+	if skip_empty and cols and rows:
+		data, stride = sprite_mask(image, background)
+		occupied = set()
+		grid_right = left + cols * pitch_x
+
+		for row in range(rows):
+			row_occupied = set()
+			cell_top = top + row * pitch_y
+			for y in range(cell_top, cell_top + cell_h):
+				line = data[y * stride + left:y * stride + grid_right]
+				for match in SPRITE_RUN.finditer(line):
+					start, end = match.start(), match.end() - 1
+
+					col_a = start // pitch_x
+					if start % pitch_x >= cell_w:
+						col_a += 1 # Run starts in the spacing after a cell
+					col_b = min(end // pitch_x, cols - 1)
+
+					row_occupied.update(range(col_a, col_b + 1))
+
+				if len(row_occupied) == cols:
+					break # Every cell of this row is occupied already
+
+			occupied.update((col, row) for col in row_occupied)
+	else:
+		occupied = None
+
+	cells = []
+	for row in range(rows):
+		for col in range(cols):
+			if occupied is None or (col, row) in occupied:
+				x = left + col * pitch_x
+				y = top + row * pitch_y
+				cells.append([x, y, x + cell_w - 1, y + cell_h - 1])
+
+	return cells
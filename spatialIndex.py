@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+class SpatialGrid:
+	""" Uniform grid of buckets for answering point and rectangle queries over rectangles.
+		Items are keyed by identity, rectangles are given as (x, y, width, height) in sheet pixels.
+		Rectangles that would cover too many cells are kept in a separate list,
+		so one huge frame can't blow up the number of buckets. """
+
+	CELL_SIZE = 64
+	MAX_CELLS = 64 # Items spanning more cells than this are stored as large items
+
+	def __init__(self, cell_size=CELL_SIZE):
+		self.cell_size = cell_size
+		self._cells = {} # (col, row) -> {id: item}
+		self._large = {} # id -> item
+		self._entries = {} # id -> (item, bounds, cell span)
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, item):
+		return id(item) in self._entries
+
+	def clear(self):
+		self._cells.clear()
+		self._large.clear()
+		self._entries.clear()
+
+	@staticmethod
+	def normalize(x, y, w, h):
+		""" Rectangles being dragged out can have a negative size, flip them and keep at least 1px """
+		if w < 0:
+			x, w = x + w, -w
+		if h < 0:
+			y, h = y + h, -h
+		return x, y, max(w, 1), max(h, 1)
+
+	def cell_span(self, x, y, w, h):
+		size = self.cell_size
+		return x // size, y // size, (x + w - 1) // size, (y + h - 1) // size
+
+	def insert(self, item, x, y, w, h):
+		key = id(item)
+		if key in self._entries:
+			self.remove(item)
+
+		bounds = self.normalize(x, y, w, h)
+		span = self.cell_span(*bounds)
+		col_a, row_a, col_b, row_b = span
+
+		if (col_b - col_a + 1) * (row_b - row_a + 1) > self.MAX_CELLS:
+			self._large[key] = item
+			span = None
+		else:
+			for row in range(row_a, row_b + 1):
+				for col in range(col_a, col_b + 1):
+					self._cells.setdefault((col, row), {})[key] = item
+
+		self._entries[key] = (item, bounds, span)
+
+	def remove(self, item):
+		key = id(item)
+		entry = self._entries.pop(key, None)
+		if entry is None:
+			return
+
+		span = entry[2]
+		if span is None:
+			del self._large[key]
+			return
+
+		col_a, row_a, col_b, row_b = span
+		for row in range(row_a, row_b + 1):
+			for col in range(col_a, col_b + 1):
+				bucket = self._cells[(col, row)]
+				del bucket[key]
+				if not bucket:
+					del self._cells[(col, row)]
+
+	def update(self, item, x, y, w, h):
+		""" Re-buckets an item after its rectangle changed. Cheap when it stays in the same cells """
+		entry = self._entries.get(id(item))
+		if entry is not None:
+			bounds = self.normalize(x, y, w, h)
+			span = self.cell_span(*bounds)
+			if entry[2] is not None and entry[2] == span:
+				self._entries[id(item)] = (item, bounds, span)
+				return
+
+		self.insert(item, x, y, w, h)
+
+	def bounds(self, item):
+		entry = self._entries.get(id(item))
+		return entry[1] if entry is not None else None
+
+	def query_point(self, x, y):
+		""" Returns the items whose rectangle contains the point """
+		size = self.cell_size
+		found = []
+		candidates = list(self._cells.get((x // size, y // size), {}).values())
+		candidates.extend(self._large.values())
+
+		for item in candidates:
+			bx, by, bw, bh = self._entries[id(item)][1]
+			if bx <= x < bx + bw and by <= y < by + bh:
+				found.append(item)
+
+		return found
+
+	def query_rect(self, x, y, w, h):
+		""" Returns the items whose rectangle intersects the given rectangle """
+		x, y, w, h = self.normalize(x, y, w, h)
+		col_a, row_a, col_b, row_b = self.cell_span(x, y, w, h)
+
+		candidates = {}
+		if (col_b - col_a + 1) * (row_b - row_a + 1) > len(self._cells):
+			# Query covers more cells than are occupied, walk the occupied ones instead
+			for (col, row), bucket in self._cells.items():
+				if col_a <= col <= col_b and row_a <= row <= row_b:
+					candidates.update(bucket)
+		else:
+			for row in range(row_a, row_b + 1):
+				for col in range(col_a, col_b + 1):
+					bucket = self._cells.get((col, row))
+					if bucket:
+						candidates.update(bucket)
+		candidates.update(self._large)
+
+		found = []
+		for key, item in candidates.items():
+			bx, by, bw, bh = self._entries[key][1]
+			if bx < x + w and x < bx + bw and by < y + h and y < by + bh:
+				found.append(item)
+
+		return found
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+""" Headless batch processing of animation data files.
+
+	python spriteBatch.py validate projects/
+	python spriteBatch.py stats walk.json run.json
+	python spriteBatch.py export projects/ --out build/
+	python spriteBatch.py slice sheet.json --grid 32x32 --skip-empty
+	python spriteBatch.py atlas projects/ --rotate
+	python spriteBatch.py render walk.json --format gif --out build/
+	python spriteBatch.py convert projects/ --to binary
+
+Qt is only imported by the commands that read images.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import logging
+import os
+import sys
+import time
+
+from animationCore import AnimationData
+import projectFile
+
+
+def find_projects(paths, extensions=(".json", projectFile.EXTENSION)):
+	""" Expands directories into the project files inside them """
+	projects = []
+	for path in paths:
+		if os.path.isdir(path):
+			for root, _, files in os.walk(path):
+				for fname in sorted(files):
+					if fname.lower().endswith(extensions):
+						projects.append(os.path.join(root, fname))
+		else:
+			projects.append(path)
+	return projects
+
+
+def resolve_spritesheet(data, project_path):
+	""" Spritesheet paths are stored as they were opened, try them relative to the project too """
+	path = data['fpath']
+	if not os.path.exists(path):
+		relative = os.path.join(os.path.dirname(project_path), path)
+		if os.path.exists(relative):
+			return relative
+	return path
+
+
+def load_project(path):
+	""" Returns the project as stored, with the path its spritesheet can be read from """
+	data = projectFile.read_project(path)
+	return data, resolve_spritesheet(data, path)
+
+
+def write_project(animation_data, path):
+	projectFile.write_project(animation_data.export_data(), path)
+
+
+def sheet_size(path):
+	""" Returns (width, height) of a spritesheet, read from its header only, or None when it can't be read """
+	from PyQt5 import QtGui
+	reader = QtGui.QImageReader(path)
+	if not reader.canRead():
+		return None
+	size = reader.size()
+	return size.width(), size.height()
+
+
+def load_image(path):
+	from PyQt5 import QtGui
+	image = QtGui.QImage(path)
+	if image.isNull():
+		raise OSError("spritesheet '%s' can't be read" % path)
+	return image
+
+
+def validate(data, sheet_path=None):
+	""" Returns a list of problems found in exported animation data. The spritesheet is read from sheet_path when given """
+	problems = []
+
+	for key in ("fpath", "sequences"):
+		if key not in data:
+			problems.append("missing key '%s'" % key)
+	if problems:
+		return problems
+
+	if sheet_path is None:
+		sheet_path = data['fpath']
+	sheet = sheet_size(sheet_path)
+	if sheet is None:
+		problems.append("spritesheet '%s' can't be read" % sheet_path)
+
+	names = set()
+	for sequence in data['sequences']:
+		name = sequence.get('name')
+		if name in names:
+			problems.append("duplicate sequence name '%s'" % name)
+		names.add(name)
+
+		if not isinstance(sequence.get('speed'), (int, float)) or sequence['speed'] <= 0:
+			problems.append("sequence '%s' has invalid speed %r" % (name, sequence.get('speed')))
+
+		for i, frame in enumerate(sequence.get('frames', [])):
+			try:
+				(x, y), (width, height), (shift_x, shift_y) = frame['pos'], frame['size'], frame['shift']
+				if not all(isinstance(value, int) for value in (x, y, width, height, shift_x, shift_y)):
+					raise TypeError("values are not integers")
+			except (KeyError, TypeError, ValueError) as error:
+				problems.append("sequence '%s' frame %s is malformed (%s)" % (name, i, error))
+				continue
+
+			duration = frame.get('duration', 0)
+			if not isinstance(duration, int) or duration < 0:
+				problems.append("sequence '%s' frame %s has invalid duration %r" % (name, i, duration))
+
+			if width <= 0 or height <= 0:
+				problems.append("sequence '%s' frame %s has an empty size" % (name, i))
+			elif sheet is not None and (x < 0 or y < 0 or x + width > sheet[0] or y + height > sheet[1]):
+				problems.append("sequence '%s' frame %s lies outside of the spritesheet" % (name, i))
+
+	return problems
+
+
+def stats(data, sheet_path=None):
+	frame_count = 0
+	frame_area = 0
+	for sequence in data['sequences']:
+		for frame in sequence['frames']:
+			frame_count += 1
+			frame_area += abs(frame['size'][0] * frame['size'][1])
+
+	sheet = sheet_size(sheet_path if sheet_path is not None else data['fpath'])
+	sheet_area = sheet[0] * sheet[1] if sheet is not None else 0
+
+	return {
+		"sequences": len(data['sequences']),
+		"frames": frame_count,
+		"sheet": "%sx%s" % sheet if sheet is not None else "-",
+		"frame_area": frame_area,
+		"coverage": "%.1f%%" % (100 * frame_area / sheet_area) if sheet_area > 0 else "-"
+	}
+
+
+def parse_pair(text, separator):
+	a, b = text.lower().split(separator)
+	return int(a), int(b)
+
+
+def output_path(path, options):
+	if options.out is None:
+		return path
+	os.makedirs(options.out, exist_ok=True)
+	return os.path.join(options.out, os.path.basename(path))
+
+
+def process_file(path, options):
+	""" Runs one command on one project. Runs in a worker process, so it only returns plain data """
+	start = time.perf_counter()
+	result = {"path": path, "ok": True, "messages": []}
+
+	try:
+		# Projects are written with the spritesheet path as stored, sheet_path is only read from
+		data, sheet_path = load_project(path)
+
+		if options.command == "validate":
+			result["messages"] = validate(data, sheet_path)
+			result["ok"] = not result["messages"]
+
+		elif options.command == "stats":
+			result["messages"] = ["%s: %s" % item for item in stats(data, sheet_path).items()]
+
+		elif options.command == "export":
+			write_project(AnimationData.import_data(data), output_path(path, options))
+
+		elif options.command == "slice":
+			# Imported here, slicing works on the Qt model
+			from PyQt5.QtCore import QPoint, QSize
+			import animationTypes
+			animation_data = animationTypes.AnimationData.import_data(data)
+			image = load_image(sheet_path)
+
+			if options.grid:
+				sequence = animation_data.slice_grid(QSize(*parse_pair(options.grid, "x")),
+													 QPoint(*parse_pair(options.offset, ",")),
+													 QSize(*parse_pair(options.spacing, ",")),
+													 options.skip_empty, image, options.name)
+				frame_count = len(sequence.frames) if sequence is not None else 0
+			else:
+				import slicing
+				frames = slicing.auto_slice(image, workers=1)
+				if frames:
+					animation_data.new_sequence(options.name, frames=frames)
+				frame_count = len(frames)
+
+			write_project(animation_data, output_path(path, options))
+			result["messages"] = ["%s frames sliced" % frame_count]
+
+		elif options.command == "atlas":
+			# Imported here, atlasPacker works on the Qt model
+			import animationTypes
+			import atlasPacker
+			image = load_image(sheet_path)
+
+			packer = atlasPacker.AtlasPacker(options.max_size, options.padding, options.rotate)
+			# Written next to the project, never over it
+			destination = output_path(os.path.splitext(path)[0] + "_atlas.json", options)
+			output = packer.export(animationTypes.AnimationData.import_data(data), image, destination)
+			result["messages"] = ["%s atlas pages -> %s" % (len(output["atlases"]), destination)]
+
+		elif options.command == "convert":
+			extension = projectFile.EXTENSION if options.to == "binary" else ".json"
+			destination = output_path(os.path.splitext(path)[0] + extension, options)
+			projectFile.convert(path, destination)
+			result["messages"] = ["-> " + destination]
+
+		elif options.command == "render":
+			# Imported here, animationRender is only needed by this command
+			import animationRender
+			directory = options.out if options.out is not None else os.path.dirname(path)
+			directory = os.path.join(directory, os.path.splitext(os.path.basename(path))[0])
+			results = animationRender.render_animation(AnimationData.import_data(dict(data, fpath=sheet_path)), directory,
+													   options.format, workers=options.sequence_jobs)
+			result["messages"] = ["%s frames -> %s" % (render["frames"], render["path"]) for render in results]
+
+	except Exception as error:
+		# A malformed project can fail in any number of ways, it fails on its own without stopping the batch
+		result["ok"] = False
+		result["messages"].append("%s: %s" % (type(error).__name__, error))
+
+	result["seconds"] = time.perf_counter() - start
+	return result
+
+
+def run(options):
+	projects = find_projects(options.paths)
+	if not projects:
+		logging.error("No project files found")
+		return 1
+
+	# A single file may use the workers for its sequences, otherwise the files are spread over them
+	options.sequence_jobs = options.jobs if len(projects) == 1 else 1
+
+	start = time.perf_counter()
+	if options.jobs == 1 or len(projects) == 1:
+		results = (process_file(path, options) for path in projects)
+		failures = report(results)
+	else:
+		with ProcessPoolExecutor(max_workers=options.jobs) as executor:
+			results = executor.map(process_file, projects, [options] * len(projects), chunksize=4)
+			failures = report(results)
+
+	print("%s files, %s failed, %.2fs" % (len(projects), failures, time.perf_counter() - start))
+	return 1 if failures else 0
+
+
+def report(results):
+	failures = 0
+	for result in results:
+		if not result["ok"]:
+			failures += 1
+		print("%-4s %7.1fms  %s" % ("ok" if result["ok"] else "FAIL", result["seconds"] * 1000, result["path"]))
+		for message in result["messages"]:
+			print("      " + message)
+	return failures
+
+
+def build_parser():
+	parser = argparse.ArgumentParser(description="Batch process animation data files without opening the editor.")
+	parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+
+	commands = parser.add_subparsers(dest="command")
+	commands.required = True
+
+	command = commands.add_parser("validate", help="check projects for malformed or out of bounds frames")
+	command.add_argument("paths", nargs="+", help="project files or directories")
+
+	command = commands.add_parser("stats", help="print frame and sequence counts")
+	command.add_argument("paths", nargs="+", help="project files or directories")
+
+	command = commands.add_parser("export", help="load and write projects again in the current format")
+	command.add_argument("paths", nargs="+", help="project files or directories")
+	command.add_argument("--out", help="directory to write to (default: overwrite)")
+
+	command = commands.add_parser("slice", help="add a sequence of automatically sliced frames")
+	command.add_argument("paths", nargs="+", help="project files or directories")
+	command.add_argument("--out", help="directory to write to (default: overwrite)")
+	command.add_argument("--name", help="name of the new sequence")
+	command.add_argument("--grid", metavar="WxH", help="slice a uniform grid of cells instead of finding sprites")
+	command.add_argument("--offset", metavar="X,Y", default="0,0", help="grid offset")
+	command.add_argument("--spacing", metavar="X,Y", default="0,0", help="space between grid cells")
+	command.add_argument("--skip-empty", action="store_true", help="leave out grid cells without sprite pixels")
+
+	command = commands.add_parser("atlas", help="pack frames into atlas images and write the repacked frame data")
+	command.add_argument("paths", nargs="+", help="project files or directories")
+	command.add_argument("--out", help="directory to write <name>_atlas.json and its pages to (default: next to the project)")
+	command.add_argument("--max-size", type=int, default=2048, help="maximum atlas width and height")
+	command.add_argument("--padding", type=int, default=1, help="pixels between packed frames")
+	command.add_argument("--rotate", action="store_true", help="allow frames to be rotated to fit")
+
+	command = commands.add_parser("render", help="render every sequence to an animated image or numbered PNGs")
+	command.add_argument("paths", nargs="+", help="project files or directories")
+	command.add_argument("--out", help="directory to write to (default: next to the project)")
+	command.add_argument("--format", choices=("gif", "apng", "png"), default="gif", help="output format (default: gif)")
+
+	command = commands.add_parser("convert", help="convert projects between the JSON and binary formats")
+	command.add_argument("paths", nargs="+", help="project files or directories")
+	command.add_argument("--to", choices=("binary", "json"), default="binary", help="format to write (default: binary)")
+	command.add_argument("--out", help="directory to write to (default: next to the project)")
+
+	return parser
+
+
+def main(argv=None):
+	logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+	parser = build_parser()
+	options = parser.parse_args(argv)
+	if options.jobs is not None and options.jobs < 1:
+		parser.error("--jobs must be at least 1")
+	return run(options)
+
+
+if __name__ == '__main__':
+	sys.exit(main())
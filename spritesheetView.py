@@ -2,11 +2,15 @@
 
 from PyQt5 import QtGui, QtWidgets
 from PyQt5.QtCore import QPoint, QSize, QRect, Qt, pyqtSignal
+from itertools import chain
 import logging
 import math
 from enum import Enum
 
-from animationTypes import AnimationData, AnimationSequence, AnimationFrame
+from animationTypes import AnimationData, AnimationSequence, AnimationFrame, AnimationEvent
+import editHistory
+from tileCache import TileCache
+from imageStore import image_store
 
 btn_rect = QSize(30, 30)
 btn_icon_size = QSize(20, 20)
@@ -84,8 +88,8 @@ class SpritesheetWidget(QtWidgets.QVBoxLayout):
 		self.view.reset_cursor()
 		self.view.update()
 
-	def load_animation_data(self, animation_data):
-		self.view.load_animation_data(animation_data)
+	def load_animation_data(self, animation_data, history=None):
+		self.view.load_animation_data(animation_data, history)
 		self.manip_toolbar.enable_buttons()
 	
 	def renew(self):
@@ -95,7 +99,8 @@ class SpritesheetWidget(QtWidgets.QVBoxLayout):
 		self.zoom_label.setText(str(int(zoom * 10) * 10) + "%")
 
 	def create_new_sequence(self):
-		self.view.animation_data.new_sequence(active=True)
+		sequence = self.view.animation_data.new_sequence(active=True)
+		self.view.record(editHistory.AddSequence(self.view.animation_data, sequence))
 		self.view.animation_data_changed_signal.emit()
 
 
@@ -210,6 +215,8 @@ class SpritesheetViewer(QtWidgets.QFrame):
 	last_mouse_pos = QPoint(0, 0)
 	
 	spritesheet_image = None
+	preview_image = None # Shown stretched to preview_size while the sheet is being decoded
+	preview_size = None
 	animation_data = None
 
 	bg_image = None
@@ -222,6 +229,14 @@ class SpritesheetViewer(QtWidgets.QFrame):
 	SCALE_DEFAULT = 1
 
 	BOX_SIZE = 10
+
+	LABEL_MIN_SIZE = 14 # Frames smaller than this on screen don't get text labels
+	LABEL_MAX_FRAMES = 400 # Labels are skipped when more frames than this are visible
+	LABEL_MARGIN = 24 # Labels are drawn up to this far outside of their frame
+	LABEL_WIDTH = 200 # Labels reach this far right of the left edge of their frame
+	DIRTY_RECTS_MAX = 32 # Past this many altered frames, the area around all of them is redrawn as one
+
+	CURSOR_TEXT_SIZE = QSize(200, 28)
 	
 	isPanning = False
 	camera = QPoint(0, 0)
@@ -268,11 +283,34 @@ class SpritesheetViewer(QtWidgets.QFrame):
 		self._scale = self.SCALE_DEFAULT
 		
 		self.original_frame_positions = []
+
+		# Undo journal, edits of one drag or held key are recorded under one gesture
+		self.history = None
+		self.gesture = 0
+		self.edit_sequences = []
+		self.edit_frames = []
+		self.edit_before = None
+		self.edit_recorded = False
+		self.new_frame = None
+
+		self.tile_cache = TileCache()
+
+		# Render layers, each rebuilt only when its key changes or it is invalidated
+		self.sheet_layer = None
+		self.sheet_layer_key = None
+		self.overlay_layer = None
+		self.overlay_layer_key = None
+		self.overlay_dirty = QtGui.QRegion() # Parts of the overlay layer to redraw on the next paint
+		self.labelled_sequences = set() # Ids of the sequences that got labels in the last full overlay draw
+		self.fill_labels = True # Whether highlights got labels in the last full overlay draw
+		self.cursor_rects = []
 		
-	def load_animation_data(self, animation_data):
+	def load_animation_data(self, animation_data, history=None):
 		self.animation_data = animation_data
+		self.history = history
 		self.animation_data.active_sequence_changed.connect(self.handle_sequence_signal)
 		self.animation_data.active_frame_changed.connect(self.handle_frame_signal)
+		self.animation_data.changes.connect(self.handle_changes)
 		self.reset_spritesheet()
 
 	def renew(self):
@@ -280,14 +318,57 @@ class SpritesheetViewer(QtWidgets.QFrame):
 			return
 
 		self.calc_sizing_handles()
-		self.update()
+		self.invalidate_overlay()
 	
+	def record(self, command):
+		if self.history is not None:
+			self.history.push(command)
+
+	def begin_edit(self, frames, new_gesture=True):
+		""" Remembers the values of frames before they are moved, resized or shifted """
+		if new_gesture:
+			self.gesture += 1
+			self.edit_recorded = False
+
+		self.edit_sequences = list(self.animation_data.selected)
+		if self.animation_data.active_sequence not in self.edit_sequences:
+			self.edit_sequences.append(self.animation_data.active_sequence)
+		self.edit_frames = list(frames)
+		self.edit_before = editHistory.capture(self.edit_frames)
+
+	def record_edit(self):
+		""" Journals the edit since begin_edit, merged with what was already recorded of the same gesture """
+		if not self.edit_frames:
+			return
+
+		after = editHistory.capture(self.edit_frames)
+		if after == self.edit_before and not self.edit_recorded:
+			return
+
+		self.record(editHistory.EditFrames(self.edit_sequences, self.edit_frames, self.edit_before, after,
+										   gesture=self.gesture))
+		self.edit_recorded = True
+
 	def reset_spritesheet(self):
 		self.scale = self.SCALE_DEFAULT
-		self.spritesheet_image = QtGui.QImage(self.animation_data.spritesheet_path)
+
+		# A sheet that is still being decoded is set by set_spritesheet_image once it is ready
+		path = self.animation_data.spritesheet_path
+		self.set_spritesheet_image(image_store.get(path) if image_store.contains(path) else None)
+
+	def set_spritesheet_image(self, image):
+		self.spritesheet_image = image
+		self.preview_image = None
+		self.tile_cache.set_image(image)
 		self.center_sequence()
 		self.update()
 
+	def set_preview(self, image, size):
+		""" Shows a downscaled copy of the sheet, size is the size of the sheet itself """
+		self.preview_image = image
+		self.preview_size = size
+		self.update()
+
 	@property
 	def scale(self):
 		return self._scale
@@ -355,9 +436,75 @@ class SpritesheetViewer(QtWidgets.QFrame):
 
 	def handle_sequence_signal(self):
 		self.center_sequence()
+		self.invalidate_overlay()
 
 	def handle_frame_signal(self):
 		self.calc_sizing_handles()
+		self.invalidate_overlay()
+
+	def invalidate_overlay(self):
+		""" Frames or selection changed, the overlay layer has to be redrawn """
+		self.overlay_layer = None
+		self.overlay_dirty = QtGui.QRegion()
+		self.update()
+
+	def handle_changes(self, changes):
+		""" Frames that were only altered are redrawn where they were and where they are now,
+			anything else redraws the whole overlay """
+		if self.overlay_layer is None:
+			return
+
+		# The shift marker of the active frame is drawn away from the frame
+		if QtWidgets.QApplication.keyboardModifiers() & Qt.ControlModifier:
+			self.invalidate_overlay()
+			return
+
+		rects = []
+		for change in changes:
+			if change.event is AnimationEvent.SEQUENCE_ALTERED:
+				continue # Names and speeds aren't drawn on the sheet
+			if change.event is AnimationEvent.FRAME_ALTERED and change.sequence not in self.animation_data.selected:
+				continue
+			if change.event is not AnimationEvent.FRAME_ALTERED or change.before is None or None in change.before:
+				self.invalidate_overlay()
+				return
+
+			for x, y, width, height in chain(change.before, change.rects()):
+				rect = self.overlay_rect(x, y, width, height)
+				if rect.intersects(self.rect()):
+					rects.append(rect)
+
+		if not rects:
+			return
+
+		if len(rects) > self.DIRTY_RECTS_MAX:
+			bounds = rects[0]
+			for rect in rects:
+				bounds = bounds.united(rect)
+			rects = [bounds]
+
+		for rect in rects:
+			self.overlay_dirty = self.overlay_dirty.united(rect)
+			self.update(rect)
+
+	def overlay_rect(self, x, y, width, height):
+		""" Area of the viewer a frame draws into with its border, highlight, sizing handles and labels """
+		pos = self.sheet2view(QPoint(x, y))
+		rect = QRect(pos.x(), pos.y(), round(width * self.scale), round(height * self.scale)).normalized()
+		margin = self.LABEL_MARGIN
+		return rect.adjusted(-margin, -margin, margin + max(0, self.LABEL_WIDTH - rect.width()), margin)
+
+	def update_cursor(self):
+		""" Repaints only where the crosshair was and where it is now """
+		for rect in self.cursor_rects:
+			self.update(rect)
+
+		self.cursor_rects = []
+		if self.mode == ViewerMode.NEW_FRAME and self.last_mouse_pos is not None and self.underMouse():
+			self.cursor_rects = self.calc_cursor_rects()
+
+		for rect in self.cursor_rects:
+			self.update(rect)
 
 
 	""" EVENTS """
@@ -366,28 +513,14 @@ class SpritesheetViewer(QtWidgets.QFrame):
 		qp = QtGui.QPainter()
 		
 		qp.begin(self)
-		qp.setClipRect(0, 0, self.size().width(), self.size().height())
-
-		# BACKGROUND tiles
-		if self.bg_image:
-			qp.drawImage(0, 0, self.bg_image)
-
-
-		# SPRITESHEET, cut and scaled
-		cutout_size = (math.ceil(self.frameRect().width() / self.scale), math.ceil(self.frameRect().height() / self.scale))
-		if self.spritesheet_image:
-			ss_cut = self.spritesheet_image.copy(self.camera.x(),
-												 self.camera.y(),
-												 cutout_size[0],
-												 cutout_size[1])
-			ss_cut = ss_cut.scaled(cutout_size[0] * self.scale, cutout_size[1] * self.scale)
-			qp.drawImage(0, 0, ss_cut)
-			
+		qp.setClipRegion(event.region())
+
+		# BACKGROUND tiles and SPRITESHEET
+		qp.drawPixmap(0, 0, self.get_sheet_layer())
+
 		# SELECTION BOXES around frames of sequence
-		if self.animation_data and self.animation_data.active_sequence and self.animation_data.active_sequence.frames:
-			self.draw_frames(qp)
+		qp.drawPixmap(0, 0, self.get_overlay_layer())
 
-					
 		#draw MOUSE CROSSHAIR when creating new frames
 		if self.mode == ViewerMode.NEW_FRAME:
 			if self.last_mouse_pos is not None and self.underMouse():
@@ -396,6 +529,76 @@ class SpritesheetViewer(QtWidgets.QFrame):
 
 		qp.end()
 
+	def get_sheet_layer(self):
+		# Changes whenever the camera, zoom, viewer size or spritesheet changes
+		key = (self.camera.x(), self.camera.y(), self.scale, self.width(), self.height(),
+			   self.spritesheet_image.cacheKey() if self.spritesheet_image else None,
+			   self.preview_image.cacheKey() if self.preview_image else None)
+
+		if self.sheet_layer is None or key != self.sheet_layer_key:
+			self.sheet_layer = QtGui.QPixmap(self.size())
+			self.sheet_layer_key = key
+
+			qp = QtGui.QPainter()
+			qp.begin(self.sheet_layer)
+
+			# BACKGROUND tiles
+			if self.bg_image:
+				qp.drawImage(0, 0, self.bg_image)
+
+			# SPRITESHEET, blitted from pre-scaled tiles
+			if self.spritesheet_image:
+				self.tile_cache.draw(qp, self.camera, self.scale, self.rect())
+
+			# PREVIEW, stretched over where the sheet will be
+			elif self.preview_image:
+				qp.drawImage(QRect(self.sheet2view(QPoint(0, 0)), self.preview_size * self.scale), self.preview_image)
+
+			qp.end()
+
+		return self.sheet_layer
+
+	def get_overlay_layer(self):
+		# Changes with the sheet layer, the tool in use and holding ctrl. Model changes invalidate it explicitly
+		key = self.sheet_layer_key + (self.mode, bool(QtWidgets.QApplication.keyboardModifiers() & Qt.ControlModifier))
+
+		if self.overlay_layer is None or key != self.overlay_layer_key:
+			self.overlay_layer = QtGui.QPixmap(self.size())
+			self.overlay_layer.fill(Qt.transparent)
+			self.overlay_layer_key = key
+			self.overlay_dirty = QtGui.QRegion()
+
+			if self.animation_data and self.animation_data.active_sequence and self.animation_data.active_sequence.frames:
+				qp = QtGui.QPainter()
+				qp.begin(self.overlay_layer)
+				self.draw_frames(qp)
+				qp.end()
+
+		elif not self.overlay_dirty.isEmpty():
+			self.redraw_overlay(self.overlay_dirty)
+			self.overlay_dirty = QtGui.QRegion()
+
+		return self.overlay_layer
+
+	def redraw_overlay(self, region):
+		""" Clears and redraws part of the overlay layer, only frames that can draw into region are drawn """
+		qp = QtGui.QPainter()
+		qp.begin(self.overlay_layer)
+		qp.setClipRegion(region)
+
+		bounds = region.boundingRect()
+		qp.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+		qp.fillRect(bounds, Qt.transparent)
+		qp.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+
+		if self.animation_data and self.animation_data.active_sequence and self.animation_data.active_sequence.frames:
+			# Frames whose labels reach into the region from the left are drawn too
+			margin = self.LABEL_MARGIN
+			bounds = bounds.adjusted(-self.LABEL_WIDTH, -margin, margin, margin)
+			self.draw_frames(qp, QRect(self.view2sheet(bounds.topLeft()), self.view2sheet(bounds.bottomRight())))
+
+		qp.end()
+
 	def snap_to_pixels(self, cord):
 		return QPoint(cord.x() - cord.x() % self.scale, cord.y() - cord.y() % self.scale)
 
@@ -412,60 +615,94 @@ class SpritesheetViewer(QtWidgets.QFrame):
 		qp.drawText(cord.x() + 2, cord.y() + 10, "X: %s Y: %s" % (cord.x(), cord.y()))
 		qp.drawText(cord.x() + 2, cord.y() + 20, "rX: %s rY: %s" % (rCord.x(), rCord.y()))
 
-	def draw_frames(self, qp):
-		qp.setBackgroundMode(Qt.OpaqueMode)
+	def calc_cursor_rects(self):
+		""" Areas of the viewer covered by draw_crosshair """
+		cord = self.snap_to_pixels(self.last_mouse_pos)
+		x, y = int(cord.x()), int(cord.y())
+
+		return [
+			QRect(x - 1, 0, 3, self.height()), # Vertical line
+			QRect(0, y - 1, self.width(), 3), # Horizontal line
+			QRect(self.last_mouse_pos.x() - 2, self.last_mouse_pos.y() - 2, 5, 5), # Dot
+			QRect(x, y - 2, self.CURSOR_TEXT_SIZE.width(), self.CURSOR_TEXT_SIZE.height()) # Coordinates
+		]
+
+	def visible_sheet_rect(self, margin=0):
+		""" The area of the spritesheet that is inside the viewer, grown by margin view pixels """
+		margin = math.ceil(margin / self.scale)
+		return QRect(self.camera.x() - margin,
+					 self.camera.y() - margin,
+					 math.ceil(self.width() / self.scale) + margin * 2 + 1,
+					 math.ceil(self.height() / self.scale) + margin * 2 + 1)
+
+	def draw_frames(self, qp, sheet_rect=None):
+		""" Draws the frames inside sheet_rect, or all of the visible ones. Whether labels are drawn
+			is decided when all visible frames are drawn and kept for the redraws of parts of the overlay """
 		black_pen = QtGui.QPen(QtGui.QColor(0, 0, 0))
 		white_pen = QtGui.QPen(QtGui.QColor(255, 255, 255))
-		grey_pen = QtGui.QPen(QtGui.QColor("gray"))
 
-		for sequence in self.animation_data.selected:
-			i = 0
-			for frame in sequence.frames:
-				# Draw frame border
+		# Only frames that intersect the viewer are drawn, the margin keeps labels of frames just off screen
+		full = sheet_rect is None
+		if full:
+			sheet_rect = self.visible_sheet_rect(self.LABEL_MARGIN)
+			self.labelled_sequences = set()
+
+		borders = []
+		selected_fills = []
+		active_fills = []
+		labels = []
 
+		for sequence in self.animation_data.selected:
+			visible = sequence.frames_in_rect(sheet_rect)
+			if full and len(visible) <= self.LABEL_MAX_FRAMES:
+				self.labelled_sequences.add(id(sequence))
+			show_labels = id(sequence) in self.labelled_sequences
 
-				# REPEAT 1
+			for frame in visible:
 				pos = self.sheet2view(frame.topLeft())
 				size = QSize(round(frame.width() * self.scale), round(frame.height() * self.scale))
-				
-				qp.setPen(white_pen)
-				qp.setBackground(QtGui.QBrush(QtGui.QColor(0, 0, 0)))
-
-				#qp.drawText(pos.x(), pos.y() - 2, "POS(%s, %s) SIZE(%s, %s)" % (frame.x(), frame.y(), frame.width(), frame.height()))
-				qp.drawText(pos.x() + 1, pos.y() + 12, str(i))
-				
-				qp.drawText( pos.x() + 1, pos.y() + size.height() + 12,
-							 "WIDTH: %s HEIGHT: %s" % (frame.width(), frame.height()) )
-
-				qp.setPen(black_pen)
-				qp.setBackground(QtGui.QBrush(QtGui.QColor(255, 255, 255)))
-				
-				# Draw frame border
-				qp.setBackgroundMode(Qt.TransparentMode)
-				qp.drawRect(pos.x(), pos.y(), size.width(), size.height()) # Rect
-				qp.setBackgroundMode(Qt.OpaqueMode)
+				borders.append(QRect(pos.x(), pos.y(), size.width(), size.height()))
 
+				# Labels are skipped when there are too many of them, or the frame is too small to read them
+				if show_labels and abs(size.height()) >= self.LABEL_MIN_SIZE and abs(size.width()) >= self.LABEL_MIN_SIZE:
+					labels.append((pos, size, frame, sequence.frame_index(frame)))
 
 				# Highlight the selected frames
-				if self.mode == ViewerMode.ALTER_SELECTION:
-					# REPEAT 3
-					a_pos = self.sheet2view(frame.topLeft())
-					a_size = QSize(round(frame.width() * self.scale), round(frame.height() * self.scale))
-
-					if frame in sequence.selected:
-						
-						if frame == sequence.active_frame:
-							colour = QtGui.QColor(180, 215, 255, 100)
-							qp.drawText(a_pos.x(), a_pos.y() - 10, "ACTIVE")
-						else:
-							colour = QtGui.QColor(255, 255, 0, 100)
-							qp.drawText(a_pos.x(), a_pos.y() - 10, "SELECTED")
-
+				if self.mode == ViewerMode.ALTER_SELECTION and frame in sequence.selected:
+					fill = QRect(pos.x() + 1, pos.y() + 1, size.width() - 1, size.height() - 1)
+					if frame is sequence.active_frame:
+						active_fills.append((fill, pos))
+					else:
+						selected_fills.append((fill, pos))
 
+		# Highlights, borders, then labels on top. One drawRects call per style
+		qp.setPen(Qt.NoPen)
+		qp.setBrush(QtGui.QColor(255, 255, 0, 100))
+		qp.drawRects([fill for fill, _ in selected_fills])
+		qp.setBrush(QtGui.QColor(180, 215, 255, 100))
+		qp.drawRects([fill for fill, _ in active_fills])
 
-						qp.fillRect(a_pos.x() + 1, a_pos.y() + 1, a_size.width() - 1, a_size.height() - 1, colour)
+		qp.setPen(black_pen)
+		qp.setBrush(QtGui.QBrush())
+		qp.drawRects(borders)
 
-				i += 1
+		qp.setBackgroundMode(Qt.OpaqueMode)
+		qp.setPen(white_pen)
+		qp.setBackground(QtGui.QBrush(QtGui.QColor(0, 0, 0)))
+		for pos, size, frame, i in labels:
+			qp.drawText(pos.x() + 1, pos.y() + 12, str(i))
+			qp.drawText( pos.x() + 1, pos.y() + size.height() + 12,
+						 "WIDTH: %s HEIGHT: %s" % (frame.width(), frame.height()) )
+
+		qp.setPen(black_pen)
+		qp.setBackground(QtGui.QBrush(QtGui.QColor(255, 255, 255)))
+		if full:
+			self.fill_labels = len(selected_fills) + len(active_fills) <= self.LABEL_MAX_FRAMES
+		if self.fill_labels:
+			for _, pos in active_fills:
+				qp.drawText(pos.x(), pos.y() - 10, "ACTIVE")
+			for _, pos in selected_fills:
+				qp.drawText(pos.x(), pos.y() - 10, "SELECTED")
 
 		if self.mode == ViewerMode.ALTER_SELECTION:
 			a_frame = self.animation_data.active_frame
@@ -607,6 +844,8 @@ class SpritesheetViewer(QtWidgets.QFrame):
 						if self.sizing_handles[i].contains(mouse.pos()):
 							self.sizing_mode = SizingMode(i)
 							self.original_frame_positions = [self.animation_data.active_frame.translated(0, 0)]
+							self.original_frame = self.original_frame_positions[0]
+							self.begin_edit([self.animation_data.active_frame])
 							return
 
 					if self.animation_data.active_frame.contains(mouse_rel):
@@ -615,6 +854,7 @@ class SpritesheetViewer(QtWidgets.QFrame):
 						self.original_frame_positions = []
 						for frame in self.animation_data.selected_frames():
 							self.original_frame_positions.append(frame.translated(0, 0))
+						self.begin_edit(self.animation_data.selected_frames())
 						return
 
 
@@ -640,8 +880,9 @@ class SpritesheetViewer(QtWidgets.QFrame):
 						index_b = self.animation_data.active_sequence.frame_index(frame)
 						if index_a > index_b:
 							index_a, index_b = index_b, index_a
-						for i in range(index_a, index_b + 1):
-							self.animation_data.active_sequence.select(self.animation_data.active_sequence.frames[i])
+						with self.animation_data.transaction():
+							for i in range(index_a, index_b + 1):
+								self.animation_data.active_sequence.select(self.animation_data.active_sequence.frames[i])
 
 					else:
 						# Clear selection and add new frame
@@ -654,18 +895,20 @@ class SpritesheetViewer(QtWidgets.QFrame):
 					# Click once to select, click once again to move frame
 					self.left_mouse_down = False
 
-				self.update()
+				self.invalidate_overlay()
 
 
 			if self.mode == ViewerMode.NEW_FRAME:
 				# If no active sequence, createa a new one
 				if self.animation_data.active_sequence is None:
-					self.animation_data.new_sequence(active=True)
+					sequence = self.animation_data.new_sequence(active=True)
+					self.record(editHistory.AddSequence(self.animation_data, sequence))
 					logging.info("New sequence created")
 
-				# Create a new frame
+				# Create a new frame, it is journaled once it has been given a size
 				cord = self.view2sheet(mouse.pos())
-				self.animation_data.active_sequence.add_frame(AnimationFrame(cord))
+				self.new_frame = AnimationFrame(cord)
+				self.animation_data.active_sequence.add_frame(self.new_frame)
 				self.animation_data_changed_signal.emit()
 				logging.info("New frame created at X:%s Y:%s" % (cord.x(), cord.y()))
 		
@@ -700,19 +943,32 @@ class SpritesheetViewer(QtWidgets.QFrame):
 			if (self.mode == ViewerMode.ALTER_SELECTION or self.mode == ViewerMode.NEW_FRAME) and self.animation_data.active_frame is not None:
 				self.sizing_mode = None
 				self.animation_data.active_frame.normalize()
+				self.animation_data.active_sequence.update_frame(self.animation_data.active_frame)
+				self.record_edit()
 
 				frame_start = self.view2sheet(self.mouse_press_pos)
 				frame_end = self.view2sheet(mouse)
 
-				self.update()
+				self.invalidate_overlay()
+
+			self.edit_frames = []
 
 		#Delete active frame if size is zero
 		if self.animation_data.active_frame is not None:
 			frame = self.animation_data.active_frame
 			if frame.width() == 0 or frame.height() == 0:
-				del self.animation_data.active_frame
+				if frame is self.new_frame or self.history is None:
+					del self.animation_data.active_frame
+				else:
+					self.history.apply(editHistory.RemoveFrames(self.animation_data.active_sequence, [frame]))
 				self.animation_data_changed_signal.emit()
 
+			elif frame is self.new_frame:
+				self.record(editHistory.AddFrames(self.animation_data.active_sequence, [frame]))
+
+		if mouse.button() == Qt.LeftButton:
+			self.new_frame = None
+
 	def mouseMoveEvent(self, mouse):
 		self.last_mouse_pos = mouse.pos()
 
@@ -724,6 +980,7 @@ class SpritesheetViewer(QtWidgets.QFrame):
 
 			self.constrain_camera()
 			self.calc_sizing_handles()
+			self.update()
 
 		# Creating a new frame
 		if self.mode == ViewerMode.NEW_FRAME:
@@ -735,6 +992,7 @@ class SpritesheetViewer(QtWidgets.QFrame):
 				frame = self.animation_data.active_frame
 				frame.setTopLeft(clicked_pos)
 				frame.setBottomRight(QPoint(mouse_pos.x()-1, mouse_pos.y()-1))
+				self.animation_data.active_sequence.update_frame(frame)
 
 				self.animation_data_changed_signal.emit()
 
@@ -782,11 +1040,18 @@ class SpritesheetViewer(QtWidgets.QFrame):
 					elif self.sizing_mode is SizingMode.LEFT:
 						a_frame.setLeft(self.original_frame.left() - delta_mouse.x())
 
+					if self.sizing_mode is SizingMode.MOVE_FRAME:
+						for sequence in self.animation_data.selected:
+							sequence.update_frames(sequence.selected)
+					else:
+						self.animation_data.active_sequence.update_frame(a_frame)
+					self.record_edit()
+
 					self.animation_data_changed_signal.emit()
 					self.calc_sizing_handles()
 
-
-		self.update()
+		# Only the crosshair follows the mouse, frame changes repaint through animation_data_changed_signal
+		self.update_cursor()
 
 	def keyPressEvent(self, e: QtGui.QKeyEvent) -> None:
 		print("keypress")
@@ -797,16 +1062,27 @@ class SpritesheetViewer(QtWidgets.QFrame):
 		
 		
 		modifiers = QtWidgets.QApplication.keyboardModifiers()
+
+		# Nudges are journaled, a held key repeats into the same gesture
+		nudge = e.key() in (Qt.Key_Up, Qt.Key_Down, Qt.Key_Left, Qt.Key_Right)
+		if nudge:
+			if modifiers & Qt.ControlModifier:
+				self.begin_edit([a_frame] if a_frame is not None else [], not e.isAutoRepeat())
+			else:
+				self.begin_edit(self.animation_data.selected_frames(), not e.isAutoRepeat())
+
 		if modifiers & Qt.ControlModifier:
 			if e.key() == Qt.Key_Up:
-				a_frame.shift.setY(a_frame.shift.y() - 1)
+				a_frame.shift += QPoint(0, -1)
 			if e.key() == Qt.Key_Down:
-				a_frame.shift.setY(a_frame.shift.y() + 1)
+				a_frame.shift += QPoint(0, 1)
 			if e.key() == Qt.Key_Left:
-				a_frame.shift.setX(a_frame.shift.x() - 1)
+				a_frame.shift += QPoint(-1, 0)
 			if e.key() == Qt.Key_Right:
-				a_frame.shift.setX(a_frame.shift.x() + 1)
-				
+				a_frame.shift += QPoint(1, 0)
+			if nudge:
+				self.animation_data.active_sequence.update_frame(a_frame)
+
 		else:
 			# Move all frames selected
 			for sequence in self.animation_data.selected:
@@ -821,17 +1097,22 @@ class SpritesheetViewer(QtWidgets.QFrame):
 						frame.translate(1, 0)
 					elif e.key() == Qt.Key_F:
 						self.focus_selected()
-						
-					self.calc_sizing_handles()
 
-		self.update()
+				sequence.update_frames(sequence.selected)
+
+			self.calc_sizing_handles()
+
+		if nudge:
+			self.record_edit()
+			self.edit_frames = []
+
 		self.animation_data_changed_signal.emit()
 
 	def enterEvent(self, event):
-		self.update()
+		self.update_cursor()
 		
 	def leaveEvent(self, event):
-		self.update()
+		self.update_cursor()
 	
 	def reset_cursor(self):
 		if self.mode == ViewerMode.NEW_FRAME:
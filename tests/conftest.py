@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+""" Tests import the editor's modules from the repository root. Qt ones run without a display """
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import unittest
+
+import animationCore
+from animationCore import AnimationData, AnimationEvent, Change, Selection, Signal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS_MODULES = ["animationCore", "frameTable", "spatialIndex", "playbackClock", "sequencer",
+					"editHistory", "editJournal", "projectFile"]
+
+BLOCK_QT = """
+import sys
+
+class BlockQt:
+	def find_spec(self, name, path=None, target=None):
+		if name.split('.')[0] in ('PyQt5', 'PyQt6', 'PySide2', 'PySide6'):
+			raise ImportError('Qt imported by ' + name)
+
+sys.meta_path.insert(0, BlockQt())
+for name in sys.argv[1:]:
+	__import__(name)
+"""
+
+
+def project_data():
+	return {
+		"fpath": "sheets/walk.png",
+		"sequences": [
+			{"name": "walk", "speed": 12, "frames": [{"pos": [0, 0], "size": [16, 16], "shift": [0, 0]},
+													  {"pos": [16, 0], "size": [16, 16], "shift": [-2, 3]}]},
+			{"name": "idle", "speed": 4, "frames": []}
+		]
+	}
+
+
+class HeadlessTest(unittest.TestCase):
+	""" The model and the modules built on it can be used where Qt isn't installed """
+
+	def test_imports_without_qt(self):
+		result = subprocess.run([sys.executable, "-c", BLOCK_QT] + HEADLESS_MODULES, cwd=ROOT,
+								stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+		self.assertEqual(result.returncode, 0, result.stderr)
+
+	def test_no_qt_loaded(self):
+		self.assertFalse([name for name in vars(animationCore) if name.startswith("Q")])
+
+
+class SignalTest(unittest.TestCase):
+
+	def test_connect_emit(self):
+		signal = Signal()
+		calls = []
+		signal.connect(lambda *args: calls.append(("first",) + args))
+		signal.connect(lambda *args: calls.append(("second",) + args))
+		signal.emit(1, 2)
+		self.assertEqual(calls, [("first", 1, 2), ("second", 1, 2)])
+
+	def test_disconnect_while_emitting(self):
+		signal = Signal()
+		calls = []
+
+		def once():
+			calls.append("once")
+			signal.disconnect(once)
+
+		signal.connect(once)
+		signal.connect(lambda: calls.append("always"))
+		signal.emit()
+		signal.emit()
+		self.assertEqual(calls, ["once", "always", "always"])
+
+		signal.disconnect()
+		signal.emit()
+		self.assertEqual(len(calls), 3)
+
+
+class ModelTest(unittest.TestCase):
+
+	def test_import_export(self):
+		data = AnimationData.import_data(project_data())
+		self.assertEqual(data.spritesheet_fname, "walk")
+		self.assertEqual([sequence.name for sequence in data.sequences], ["walk", "idle"])
+		self.assertEqual(data.get_sequence("walk").frames[1].values(), (16, 0, 16, 16, -2, 3))
+
+		exported = data.export_data()
+		self.assertEqual([[list(field) for field in frame.values()] for sequence in exported['sequences']
+						  for frame in sequence['frames']],
+						 [[list(field) for field in frame.values()] for sequence in project_data()['sequences']
+						  for frame in sequence['frames']])
+		self.assertEqual([sequence['speed'] for sequence in exported['sequences']], [12, 4])
+
+	def test_frame_durations(self):
+		data = project_data()
+		data['sequences'][0]['frames'][1]['duration'] = 20
+		sequence = AnimationData.import_data(data).get_sequence("walk")
+		self.assertEqual(sequence.frame_durations(), [1000 / 12, 20])
+		self.assertEqual([frame.get('duration') for frame in AnimationData.import_data(data).export_data()['sequences'][0]['frames']],
+						 [None, 20])
+
+		# Frames keep their duration as they are moved about
+		frame = sequence.frames[1]
+		sequence.remove_frames([frame])
+		sequence.insert_frames([(0, frame)])
+		self.assertEqual(sequence.frame_durations(), [20, 1000 / 12])
+
+		sequence.speed = 0
+		self.assertEqual(sequence.frame_durations(), [20, 0])
+
+	def test_frame_geometry(self):
+		data = AnimationData("sheet.png")
+		sequence = data.new_sequence("walk", active=True, frames=[animationCore.AnimationFrame(0, 0, 8, 8),
+																 animationCore.AnimationFrame(20, 0, 8, 8)])
+		self.assertIs(sequence.frame_at(22, 4), sequence.frames[1])
+		self.assertIsNone(sequence.frame_at(12, 4))
+		self.assertEqual(sequence.frames_in(0, 0, 10, 10), [sequence.frames[0]])
+		self.assertEqual(sequence.bounds(), (0, 0, 28, 8))
+
+	def test_events(self):
+		data = AnimationData("sheet.png")
+		events = []
+		data.data_changed.connect(events.append)
+		sequence = data.new_sequence("walk", active=True)
+		data.del_sequence(sequence)
+		self.assertIn(AnimationEvent.NEW_SEQUENCE, events)
+		self.assertEqual(events[-1], AnimationEvent.SEQUENCE_DELETED)
+		self.assertIsNone(data.active_sequence)
+
+
+class TransactionTest(unittest.TestCase):
+	""" Signals of the changes made in a transaction go out once, when the outermost transaction ends """
+
+	def setUp(self):
+		self.data = AnimationData("sheet.png")
+		self.sequence = self.data.new_sequence("walk", active=True,
+											   frames=[animationCore.AnimationFrame(i * 10, 0, 8, 8) for i in range(3)])
+		self.sequence.index # Built, so altered frames report their old rectangles
+		self.emitted = []
+		self.data.changes.connect(lambda changes: self.emitted.append(("changes", changes)))
+		self.data.data_changed.connect(lambda event: self.emitted.append(("data_changed", event)))
+		self.data.active_frame_changed.connect(lambda: self.emitted.append(("active_frame_changed",)))
+
+	def test_outside_transaction(self):
+		self.sequence.translate_frames(1, 0, [self.sequence.frames[0]])
+		self.sequence.translate_frames(1, 0, [self.sequence.frames[0]])
+		self.assertEqual([signal[0] for signal in self.emitted], ["changes", "changes"])
+
+	def test_held_back(self):
+		with self.data.transaction():
+			with self.data.transaction():
+				self.sequence.active_frame = self.sequence.frames[0]
+				self.sequence.active_frame = self.sequence.frames[1]
+				self.data.select_all()
+				self.data.select_all()
+			self.assertEqual(self.emitted, [])
+			self.assertTrue(self.data.in_transaction())
+
+		self.assertFalse(self.data.in_transaction())
+		self.assertEqual(self.emitted, [("active_frame_changed",),
+										("data_changed", AnimationEvent.SEQUENCE_SELECTION_CHANGED)])
+
+	def test_changes_first(self):
+		with self.data.transaction():
+			self.data.select_all()
+			self.sequence.remove_frame(self.sequence.frames[2])
+		self.assertEqual(self.emitted[0][0], "changes")
+		self.assertEqual([change.event for change in self.emitted[0][1]], [AnimationEvent.FRAME_DELETED])
+
+	def test_alterations_merged(self):
+		first, second, _ = self.sequence.frames
+		with self.data.transaction():
+			self.sequence.translate_frames(5, 0, [first])
+			self.sequence.translate_frames(5, 0, [first, second])
+			self.sequence.translate_frames(0, 5, [second])
+
+		(kind, changes), = self.emitted
+		change, = changes
+		self.assertEqual(change.event, AnimationEvent.FRAME_ALTERED)
+		self.assertEqual(change.frames, [first, second])
+		# Each frame keeps the rectangle it had before the first alteration
+		self.assertEqual(change.before, [(0, 0, 8, 8), (10, 0, 8, 8)])
+		self.assertEqual(change.rects(), [(10, 0, 8, 8), (15, 5, 8, 8)])
+
+	def test_slot_changes_sent_later(self):
+		def follow_up(changes):
+			if changes[0].event is AnimationEvent.FRAME_DELETED:
+				with self.data.transaction():
+					self.sequence.translate_frames(1, 1, [self.sequence.frames[0]])
+
+		self.data.changes.connect(follow_up)
+		with self.data.transaction():
+			self.sequence.remove_frame(self.sequence.frames[2])
+
+		events = [signal[1][0].event for signal in self.emitted if signal[0] == "changes"]
+		self.assertEqual(events, [AnimationEvent.FRAME_DELETED, AnimationEvent.FRAME_ALTERED])
+
+
+class ChangeTest(unittest.TestCase):
+	""" The records AnimationData.changes carries """
+
+	def setUp(self):
+		self.data = AnimationData("sheet.png")
+		self.changes = []
+		self.data.changes.connect(self.changes.extend)
+
+	def frames(self, count):
+		return [animationCore.AnimationFrame(i * 10, 0, 8, 8) for i in range(count)]
+
+	def test_sequence_records(self):
+		walk = self.data.new_sequence("walk", frames=self.frames(2))
+		idle = self.data.new_sequence("idle")
+		self.data.del_sequence(walk)
+		self.data.insert_sequence(1, walk)
+
+		self.assertEqual([(change.event, change.sequence, change.index) for change in self.changes], [
+			(AnimationEvent.NEW_FRAME, walk, None),
+			(AnimationEvent.NEW_SEQUENCE, walk, 0),
+			(AnimationEvent.NEW_SEQUENCE, idle, 1),
+			(AnimationEvent.SEQUENCE_DELETED, walk, 0),
+			(AnimationEvent.NEW_SEQUENCE, walk, 1)
+		])
+		self.assertEqual(self.changes[0].frames, walk.frames)
+
+	def test_frame_records(self):
+		sequence = self.data.new_sequence("walk", frames=self.frames(3))
+		first, second, third = sequence.frames
+		del self.changes[:]
+
+		sequence.remove_frames([third, first])
+		deleted, = self.changes
+		self.assertEqual(deleted.event, AnimationEvent.FRAME_DELETED)
+		self.assertEqual(deleted.frames, [first, third])
+
+		sequence.add_frame(animationCore.AnimationFrame(1, 1, 1, 1))
+		self.assertEqual(self.changes[-1].event, AnimationEvent.NEW_FRAME)
+		self.assertEqual(self.changes[-1].frames, [sequence.frames[-1]])
+
+	def test_old_rectangles(self):
+		sequence = self.data.new_sequence("walk", frames=self.frames(2))
+		first, second = sequence.frames
+
+		# Without a spatial index the old rectangles aren't known
+		sequence.translate_frames(1, 0, [first])
+		self.assertEqual(self.changes[-1].before, [None])
+
+		sequence.frame_at(0, 0)
+		sequence.translate_frames(0, 2, [first, second])
+		self.assertEqual(self.changes[-1].before, [(1, 0, 8, 8), (10, 0, 8, 8)])
+		self.assertEqual(self.changes[-1].rects(), [(1, 2, 8, 8), (10, 2, 8, 8)])
+
+	def test_merge(self):
+		walk = self.data.new_sequence("walk", frames=self.frames(2))
+		idle = self.data.new_sequence("idle", frames=self.frames(1))
+		first, second = walk.frames
+
+		change = Change(AnimationEvent.FRAME_ALTERED, walk, [first], [(0, 0, 8, 8)])
+		self.assertTrue(change.merge(Change(AnimationEvent.FRAME_ALTERED, walk, [second, first], [(10, 0, 8, 8), (5, 5, 8, 8)])))
+		self.assertEqual(change.frames, [first, second])
+		self.assertEqual(change.before, [(0, 0, 8, 8), (10, 0, 8, 8)])
+
+		self.assertFalse(change.merge(Change(AnimationEvent.FRAME_ALTERED, idle, idle.frames, [(0, 0, 8, 8)])))
+		self.assertFalse(change.merge(Change(AnimationEvent.FRAME_DELETED, walk, [first])))
+		# A change that doesn't know its old rectangles can't be folded in without losing them
+		self.assertFalse(change.merge(Change(AnimationEvent.FRAME_ALTERED, walk, [first], None)))
+		self.assertEqual(len(change.frames), 2)
+
+
+class NameTest(unittest.TestCase):
+	""" Sequence names are unique within a project and looked up in a map """
+
+	def setUp(self):
+		self.data = AnimationData("sheet.png")
+		self.walk = self.data.new_sequence("walk")
+
+	def test_unique_names(self):
+		self.assertEqual(self.data.new_sequence("walk").name, "walk_1")
+		self.assertEqual(self.data.new_sequence("walk").name, "walk_2")
+		self.assertEqual(self.data.unique_name("run"), "run")
+		self.assertEqual(self.data.new_sequence().name, "Sequence_3")
+
+	def test_rename(self):
+		self.walk.name = "stroll"
+		self.assertIs(self.data.get_sequence("stroll"), self.walk)
+		self.assertIsNone(self.data.get_sequence("walk"))
+
+		run = self.data.new_sequence("run")
+		with self.assertRaises(ValueError):
+			run.name = "stroll"
+		self.assertEqual(run.name, "run")
+		self.assertIs(self.data.get_sequence("stroll"), self.walk)
+
+		# Renaming to its own name is no conflict
+		run.name = "run"
+
+	def test_deleted_name_freed(self):
+		self.data.del_sequence(self.walk)
+		self.assertIsNone(self.data.get_sequence("walk"))
+
+		other = self.data.new_sequence("walk")
+		self.data.insert_sequence(0, self.walk)
+		self.assertEqual(self.walk.name, "walk_1")
+		self.assertIs(self.data.get_sequence("walk"), other)
+		# Out of the project, a sequence can be given any name
+		self.data.del_sequence(other)
+		other.name = "walk_1"
+
+	def test_positions(self):
+		idle = self.data.new_sequence("idle")
+		self.assertEqual(self.data.position(idle), 1)
+		self.data.del_sequence(self.walk)
+		self.assertEqual(self.data.position(idle), 0)
+		with self.assertRaises(ValueError):
+			self.data.position(self.walk)
+
+
+class SelectionTest(unittest.TestCase):
+
+	def test_order_and_membership(self):
+		frames = [animationCore.AnimationFrame(i, 0, 1, 1) for i in range(4)]
+		selection = Selection([frames[2], frames[0]])
+		selection.append(frames[3])
+		selection.append(frames[2])
+
+		self.assertEqual(list(selection), [frames[2], frames[0], frames[3]])
+		self.assertEqual(list(reversed(selection)), [frames[3], frames[0], frames[2]])
+		self.assertEqual((selection[0], selection[-1], selection[1]), (frames[2], frames[3], frames[0]))
+		self.assertIn(frames[0], selection)
+		self.assertNotIn(frames[1], selection)
+		self.assertEqual(selection, [frames[2], frames[0], frames[3]])
+
+		selection.remove(frames[0])
+		selection.discard(frames[0])
+		with self.assertRaises(ValueError):
+			selection.remove(frames[0])
+		self.assertEqual(len(selection), 2)
+
+	def test_identity(self):
+		# Frames with the same values are still different frames
+		first, second = animationCore.AnimationFrame(0, 0, 1, 1), animationCore.AnimationFrame(0, 0, 1, 1)
+		self.assertEqual(list(Selection([first, second])), [first, second])
+
+	def test_select_all_copies(self):
+		data = AnimationData("sheet.png")
+		data.new_sequence("walk")
+		data.select_all()
+		data.deselect("walk")
+		self.assertEqual(len(data.sequences), 1)
+		self.assertEqual(list(data.selected), [])
+
+
+if __name__ == '__main__':
+	unittest.main()
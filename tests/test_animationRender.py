@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import struct
+import tempfile
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPoint, QSize
+
+import animationRender
+import animationTypes
+from imageStore import image_store
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def lzw_decode(data, min_code_size):
+	""" Decodes GIF image data, the reference lzw_encode is checked against """
+	clear_code = 1 << min_code_size
+	end_code = clear_code + 1
+	bits = int.from_bytes(data, 'little')
+	position = 0
+	output = bytearray()
+
+	code_size = min_code_size + 1
+	table = None
+	previous = None
+	while True:
+		code = bits >> position & ((1 << code_size) - 1)
+		position += code_size
+		if code == clear_code:
+			table = [bytes((i,)) for i in range(clear_code)] + [b'', b'']
+			code_size = min_code_size + 1
+			previous = None
+			continue
+		if code == end_code:
+			return bytes(output)
+
+		if code < len(table):
+			entry = table[code]
+			if previous is not None:
+				table.append(previous + entry[:1])
+		else:
+			entry = previous + previous[:1]
+			table.append(entry)
+		output += entry
+		previous = entry
+		if len(table) == 1 << code_size and code_size < 12:
+			code_size += 1
+
+
+def read_chunks(path):
+	with open(path, 'rb') as infile:
+		data = infile.read()
+	chunks = []
+	offset = len(animationRender.PNG_SIGNATURE)
+	while offset < len(data):
+		length, chunk_type = struct.unpack(">I4s", data[offset:offset + 8])
+		chunks.append((chunk_type, data[offset + 8:offset + 8 + length]))
+		offset += length + 12
+	return chunks
+
+
+class LzwTest(unittest.TestCase):
+
+	def test_round_trip(self):
+		rng = random.Random(0)
+		cases = [(bytes([0]), 2), (bytes([1, 1, 1, 1, 1, 1, 1, 1]), 2), (bytes(rng.randrange(4) for _ in range(5000)), 2),
+				 (bytes(rng.randrange(256) for _ in range(30000)), 8), # Fills the table and starts over
+				 (bytes(i // 300 % 16 for i in range(60000)), 4)]
+		for pixels, min_code_size in cases:
+			self.assertEqual(lzw_decode(animationRender.lzw_encode(pixels, min_code_size), min_code_size), pixels)
+
+
+class FrameDelaysTest(unittest.TestCase):
+
+	def test_rounding_carried_over(self):
+		delays = list(animationRender.frame_delays(7, 30, 100))
+		self.assertEqual(sum(delays), round(7 * 100 / 30))
+		self.assertEqual(set(delays), {3, 4})
+		self.assertEqual(list(animationRender.frame_delays(4, 10, 100)), [10] * 4)
+
+	def test_frame_durations(self):
+		self.assertEqual(list(animationRender.frame_delays(3, 10, 100, [0, 250, 0])), [10, 25, 10])
+		self.assertEqual(list(animationRender.frame_delays(2, 10, 100, [15, 15])), [2, 1])
+
+
+class RenderTest(unittest.TestCase):
+	""" Three frames of one colour each, shifted so the canvas has to fit all of them """
+
+	COLORS = (0xffff0000, 0xff00ff00, 0xff0000ff)
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		sheet = QtGui.QImage(30, 10, QtGui.QImage.Format_ARGB32)
+		for i, color in enumerate(self.COLORS):
+			for x in range(i * 10, i * 10 + 10):
+				for y in range(10):
+					sheet.setPixel(x, y, color)
+		self.sheet_path = os.path.join(self.directory.name, "sheet.png")
+		sheet.save(self.sheet_path)
+
+		self.data = animationTypes.AnimationData(self.sheet_path)
+		frames = [animationTypes.AnimationFrame(QPoint(i * 10, 0), QSize(10, 10), QPoint(i * 2, 0)) for i in range(3)]
+		sequence = self.data.new_sequence("walk / left", frames=frames)
+		sequence.speed = 10
+
+	def tearDown(self):
+		image_store.release(self.sheet_path)
+		self.directory.cleanup()
+
+	def render(self, output_format):
+		results = animationRender.render_animation(self.data, self.directory.name, output_format, workers=1)
+		self.assertEqual(len(results), 1)
+		self.assertEqual(results[0]["frames"], 3)
+		return results[0]["path"]
+
+	def test_canvas(self):
+		canvas = animationRender.sequence_canvas(self.data.sequences[0].frames)
+		self.assertEqual((canvas.x(), canvas.y(), canvas.width(), canvas.height()), (0, -10, 14, 10))
+
+	def test_gif(self):
+		path = self.render("gif")
+		self.assertEqual(os.path.basename(path), "walk _ left.gif")
+
+		reader = QtGui.QImageReader(path)
+		self.assertEqual(reader.imageCount(), 3)
+		for i, color in enumerate(self.COLORS):
+			image = reader.read()
+			self.assertEqual(image.size(), QSize(14, 10))
+			self.assertEqual(reader.nextImageDelay(), 100)
+			self.assertEqual(image.pixel(i * 2 + 5, 5) | 0xff000000, color)
+			if i:
+				self.assertEqual(QtGui.qAlpha(image.pixel(0, 5)), 0)
+
+	def test_apng(self):
+		path = self.render("apng")
+		chunks = read_chunks(path)
+		types = [chunk_type for chunk_type, _ in chunks]
+		self.assertEqual(types[0], b'IHDR')
+		self.assertEqual(types[-1], b'IEND')
+		self.assertEqual(struct.unpack(">II", dict(chunks)[b'acTL']), (3, 0))
+
+		numbers = [struct.unpack(">I", data[:4])[0] for chunk_type, data in chunks if chunk_type in (b'fcTL', b'fdAT')]
+		self.assertEqual(numbers, list(range(len(numbers))))
+		self.assertEqual(types.count(b'fcTL'), 3)
+
+		# Readers without APNG support show the first frame
+		image = QtGui.QImage(path)
+		self.assertEqual(image.pixel(5, 5), self.COLORS[0])
+
+	def test_frame_durations(self):
+		self.data.sequences[0].frames[1].set_duration(250)
+
+		reader = QtGui.QImageReader(self.render("gif"))
+		delays = []
+		for _ in range(3):
+			reader.read()
+			delays.append(reader.nextImageDelay())
+		self.assertEqual(delays, [100, 250, 100])
+
+		chunks = read_chunks(self.render("apng"))
+		delays = [struct.unpack(">HH", data[20:24]) for chunk_type, data in chunks if chunk_type == b'fcTL']
+		self.assertEqual(delays, [(1, 10), (1, 4), (1, 10)])
+
+	def test_png_sequence(self):
+		path = self.render("png")
+		names = sorted(os.listdir(path))
+		self.assertEqual(names, ["walk _ left_%04d.png" % i for i in range(3)])
+		self.assertEqual(QtGui.QImage(os.path.join(path, names[2])).pixel(9, 5), self.COLORS[2])
+
+	def test_names_kept_apart(self):
+		self.data.new_sequence("walk _ left", frames=[animationTypes.AnimationFrame(QPoint(0, 0), QSize(10, 10))])
+		self.data.new_sequence("empty")
+		results = animationRender.render_animation(self.data, self.directory.name, "gif", workers=2)
+		self.assertEqual([os.path.basename(result["path"]) for result in results], ["walk _ left.gif", "walk _ left_2.gif"])
+
+
+if __name__ == '__main__':
+	unittest.main()
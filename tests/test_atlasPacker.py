@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPoint, QRect, QSize
+
+import animationTypes
+import atlasPacker
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_data(frames):
+	data = animationTypes.AnimationData("sheet.png")
+	data.new_sequence("all", frames=[animationTypes.AnimationFrame(QPoint(x, y), QSize(width, height))
+									 for x, y, width, height in frames])
+	return data
+
+
+def noise_sheet(width, height, seed):
+	""" A sheet where every pixel differs, so no two frames share their pixels """
+	rng = random.Random(seed)
+	image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+	for y in range(height):
+		for x in range(width):
+			image.setPixel(x, y, 0xff000000 | rng.getrandbits(24))
+	return image
+
+
+class SkylineBinTest(unittest.TestCase):
+
+	def test_rects_do_not_overlap(self):
+		rng = random.Random(1)
+		atlas = SkylineBinTest.pack(atlasPacker.SkylineBin(128, 128), rng, 60)
+		placed = atlas[1]
+		for i, a in enumerate(placed):
+			self.assertTrue(QRect(0, 0, 128, 128).contains(a))
+			for b in placed[i + 1:]:
+				self.assertFalse(a.intersects(b), (a, b))
+
+	@staticmethod
+	def pack(atlas, rng, count):
+		placed = []
+		for _ in range(count):
+			width, height = rng.randint(1, 24), rng.randint(1, 24)
+			position = atlas.find_position(width, height)
+			if position is None:
+				continue
+			x, y, rotated = position
+			if rotated:
+				width, height = height, width
+			atlas.place(x, y, width, height)
+			placed.append(QRect(x, y, width, height))
+		return atlas, placed
+
+	def test_rotation_only_when_allowed(self):
+		atlas = atlasPacker.SkylineBin(10, 40)
+		self.assertIsNone(atlas.find_position(30, 5))
+		atlas = atlasPacker.SkylineBin(10, 40, allow_rotate=True)
+		self.assertEqual(atlas.find_position(30, 5), (0, 0, True))
+
+
+class AtlasPackerTest(unittest.TestCase):
+
+	def test_identical_frames_are_shared(self):
+		image = QtGui.QImage(32, 32, QtGui.QImage.Format_ARGB32)
+		image.fill(0xff102030)
+		data = make_data([(0, 0, 8, 8), (8, 8, 8, 8), (0, 0, 4, 8)])
+		sprites, pages, placements, frame_keys = atlasPacker.AtlasPacker(padding=0).pack(data, image)
+
+		self.assertEqual(len(sprites), 2)
+		self.assertEqual(frame_keys[0][0], frame_keys[0][1])
+		self.assertEqual(pages, [(12, 8)])
+
+	def test_frames_off_the_sheet_are_empty(self):
+		data = make_data([(100, 100, 8, 8)])
+		sprites, pages, placements, frame_keys = atlasPacker.AtlasPacker().pack(data, noise_sheet(16, 16, 0))
+		self.assertEqual(frame_keys, [[atlasPacker.AtlasPacker.EMPTY_KEY]])
+		self.assertEqual(pages, [])
+
+	def test_no_rotation_by_default(self):
+		data = make_data([(x * 4, 0, 4, 30) for x in range(4)] + [(0, 30, 30, 2)])
+		_, _, placements, _ = atlasPacker.AtlasPacker(max_size=32).pack(data, noise_sheet(32, 32, 2))
+		self.assertFalse(any(rotated for _, _, _, rotated in placements.values()))
+
+	def test_frame_too_big(self):
+		data = make_data([(0, 0, 20, 20)])
+		with self.assertRaises(ValueError):
+			atlasPacker.AtlasPacker(max_size=16).pack(data, noise_sheet(24, 24, 3))
+
+	def export(self, data, image):
+		""" The atlas data as written """
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "walk_atlas.json")
+			atlasPacker.AtlasPacker().export(data, image, path)
+			with open(path) as infile:
+				return json.load(infile)
+
+	def test_cut_frames_keep_their_place(self):
+		data = animationTypes.AnimationData("sheet.png")
+		data.new_sequence("all", frames=[
+			animationTypes.AnimationFrame(QPoint(-4, 10), QSize(12, 10), QPoint(1, 2)),
+			animationTypes.AnimationFrame(QPoint(2, 2), QSize(4, 4), QPoint(1, 2))
+		])
+		cut, whole = self.export(data, noise_sheet(16, 16, 4))['sequences'][0]['frames']
+
+		# The sheet's pixel (0, 10) was drawn at (1 + 4, 2 - 10), the cut down sprite's top left goes there too
+		self.assertEqual(cut['size'], [8, 6])
+		self.assertEqual(cut['shift'], [5, -2])
+		self.assertEqual((cut['shift'][0], cut['shift'][1] - cut['size'][1]), (5, -8))
+		self.assertEqual(whole['shift'], [1, 2])
+
+	def test_empty_frames_have_no_atlas(self):
+		data = make_data([(100, 100, 8, 8)])
+		output = self.export(data, noise_sheet(16, 16, 0))
+		self.assertEqual(output['atlases'], [])
+		self.assertIsNone(output['sequences'][0]['frames'][0]['atlas'])
+
+		data = make_data([(100, 100, 8, 8), (0, 0, 8, 8)])
+		empty, packed = self.export(data, noise_sheet(16, 16, 0))['sequences'][0]['frames']
+		self.assertIsNone(empty['atlas'])
+		self.assertEqual(packed['atlas'], 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from animationCore import AnimationData, AnimationEvent, AnimationFrame
+import editHistory
+
+
+def make_data():
+	data = AnimationData("sheet.png")
+	data.new_sequence("walk", active=True, frames=[AnimationFrame(i * 8, 0, 8, 8) for i in range(4)])
+	return data
+
+
+class HistoryTest(unittest.TestCase):
+
+	def setUp(self):
+		self.data = make_data()
+		self.sequence = self.data.sequences[0]
+		self.history = editHistory.History()
+
+	def move(self, frames, dx, gesture=None):
+		before = editHistory.capture(frames)
+		for frame in frames:
+			frame.translate(dx, 0)
+		self.history.push(editHistory.EditFrames([self.sequence], frames, before, editHistory.capture(frames),
+												 gesture=gesture))
+
+	def test_undo_redo_frames(self):
+		frame = self.sequence.frames[1]
+		self.move([frame], 3)
+		self.history.apply(editHistory.RemoveFrames(self.sequence, [self.sequence.frames[0]]))
+		self.assertEqual(len(self.sequence.frames), 3)
+
+		self.history.undo()
+		self.assertEqual(len(self.sequence.frames), 4)
+		self.assertEqual(list(self.sequence.selected), [self.sequence.frames[0]])
+		self.history.undo()
+		self.assertEqual(frame.values()[:2], (8, 0))
+		self.assertIsNone(self.history.undo())
+
+		self.history.redo()
+		self.assertEqual(frame.values()[:2], (11, 0))
+
+	def test_undo_redo_duration(self):
+		frame = self.sequence.frames[2]
+		before = editHistory.capture([frame])
+		frame.set_duration(40)
+		self.history.push(editHistory.EditFrames([self.sequence], [frame], before, editHistory.capture([frame])))
+		self.assertEqual(self.sequence.frame_durations()[2], 40)
+
+		self.history.undo()
+		self.assertEqual(frame.duration(), 0)
+		self.history.redo()
+		self.assertEqual(frame.duration(), 40)
+		self.assertEqual(frame.values(), (16, 0, 8, 8, 0, 0))
+
+	def test_changes_go_to_owning_sequence(self):
+		other = self.data.new_sequence("idle", frames=[AnimationFrame(50, 50, 8, 8)])
+		frames = [self.sequence.frames[0], other.frames[0]]
+		before = editHistory.capture(frames)
+		for frame in frames:
+			frame.translate(1, 0)
+		command = editHistory.EditFrames([self.sequence, other], frames, before, editHistory.capture(frames))
+
+		changes = []
+		self.data.changes.connect(changes.extend)
+		self.history.apply(command)
+		self.assertEqual([(change.event, change.sequence, change.frames) for change in changes],
+						 [(AnimationEvent.FRAME_ALTERED, self.sequence, [frames[0]]),
+						  (AnimationEvent.FRAME_ALTERED, other, [frames[1]])])
+
+	def test_gesture_merges(self):
+		frame = self.sequence.frames[0]
+		for _ in range(5):
+			self.move([frame], 1, gesture="drag")
+		self.move([frame], 1, gesture="other drag")
+
+		self.assertEqual(len(self.history.undo_stack), 2)
+		self.history.undo()
+		self.history.undo()
+		self.assertEqual(frame.values()[:2], (0, 0))
+
+	def test_push_clears_redo(self):
+		self.move([self.sequence.frames[0]], 1)
+		self.history.undo()
+		self.assertTrue(self.history.can_redo())
+		self.move([self.sequence.frames[0]], 2)
+		self.assertFalse(self.history.can_redo())
+
+	def test_budget(self):
+		self.history = editHistory.History(budget=3 * editHistory.COMMAND_BYTES)
+		for _ in range(10):
+			self.history.push(editHistory.EditSequence(self.sequence, ("walk", 20), ("walk", 20)))
+		self.assertEqual(len(self.history.undo_stack), 3)
+		self.assertEqual(self.history.bytes, 3 * editHistory.COMMAND_BYTES)
+
+	def test_sizes(self):
+		frames = self.sequence.frames[:3]
+		self.assertEqual(editHistory.RemoveFrames(self.sequence, frames).size(),
+						 editHistory.COMMAND_BYTES + 3 * editHistory.DETACHED_FRAME_BYTES)
+		self.assertEqual(editHistory.RemoveSequence(self.data, self.sequence).size(),
+						 editHistory.COMMAND_BYTES + 4 * editHistory.SEQUENCE_FRAME_BYTES)
+		edit = editHistory.EditFrames([self.sequence], frames, editHistory.capture(frames), editHistory.capture(frames))
+		self.assertEqual(edit.size(), editHistory.COMMAND_BYTES + 3 * editHistory.EDIT_BYTES)
+
+	def test_bytes_follow_stacks(self):
+		self.move([self.sequence.frames[0]], 1)
+		self.history.apply(editHistory.RemoveFrames(self.sequence, [self.sequence.frames[1]]))
+		total = self.history.bytes
+		self.assertEqual(total, sum(command.size() for command in self.history.undo_stack))
+
+		# Undone commands stay counted until a new command drops them
+		self.history.undo()
+		self.assertEqual(self.history.bytes, total)
+		self.assertEqual(self.history.redo_label(), "Delete frames")
+		self.move([self.sequence.frames[0]], 1)
+		self.assertEqual(self.history.bytes, sum(command.size() for command in self.history.undo_stack))
+
+		self.history.clear()
+		self.assertEqual(self.history.bytes, 0)
+		self.assertFalse(self.history.can_undo())
+
+	def test_oversized_command_kept(self):
+		self.history = editHistory.History(budget=editHistory.COMMAND_BYTES)
+		self.move([self.sequence.frames[0]], 1)
+		removal = editHistory.RemoveFrames(self.sequence, self.sequence.frames[:2])
+		self.history.apply(removal)
+
+		self.assertEqual(list(self.history.undo_stack), [removal])
+		self.assertEqual(self.history.bytes, removal.size())
+		self.history.undo()
+		self.assertEqual(len(self.sequence.frames), 4)
+
+	def test_batch_undoes_in_reverse(self):
+		first, second = self.sequence.frames[:2]
+		added = AnimationFrame(1, 1, 2, 2)
+		self.sequence.add_frames([added])
+		replace = [editHistory.AddFrames(self.sequence, [added]), editHistory.RemoveFrames(self.sequence, [first, second])]
+		replace[1].redo()
+		self.history.push(editHistory.Batch(replace, "Replace"))
+		self.assertEqual(len(self.sequence.frames), 3)
+
+		self.history.undo()
+		self.assertEqual(list(self.sequence.frames[:2]), [first, second])
+		self.assertEqual(len(self.sequence.frames), 4)
+
+	def test_remove_sequence(self):
+		self.history.apply(editHistory.RemoveSequence(self.data, self.sequence))
+		self.assertEqual(self.data.sequences, [])
+		self.assertEqual(list(self.data.selected), [])
+
+		self.history.undo()
+		self.assertEqual(self.data.sequences, [self.sequence])
+		self.assertIs(self.data.active_sequence, self.sequence)
+
+	def test_edit_sequence_emits_change(self):
+		changes = []
+		self.data.changes.connect(changes.extend)
+		self.history.apply(editHistory.EditSequence(self.sequence, ("walk", 20), ("stroll", 12)))
+		self.history.undo()
+
+		self.assertEqual([(change.event, change.sequence) for change in changes],
+						 [(AnimationEvent.SEQUENCE_ALTERED, self.sequence)] * 2)
+		self.assertEqual((self.sequence.name, self.sequence.speed), ("walk", 20))
+		self.assertIs(self.data.get_sequence("walk"), self.sequence)
+
+
+if __name__ == '__main__':
+	unittest.main()
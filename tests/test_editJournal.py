@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+import unittest
+
+from animationCore import AnimationData, AnimationFrame
+import editHistory
+import editJournal
+import projectFile
+
+
+def make_data():
+	data = AnimationData("sheet.png")
+	data.new_sequence("walk", active=True, frames=[AnimationFrame(i * 8, 0, 8, 8) for i in range(4)])
+	data.new_sequence("run", active=True, frames=[AnimationFrame(i * 8, 8, 8, 8) for i in range(3)])
+	return data
+
+
+def exported(data):
+	# Binary and JSON projects read pairs back differently
+	return json.loads(json.dumps(data.export_data()))
+
+
+class JournalTest(unittest.TestCase):
+	""" Edits journaled on top of a saved project and replayed onto a fresh load of it """
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name, "walk.json")
+
+		self.data = make_data()
+		projectFile.write_project(self.data.export_data(), self.path)
+		self.journal = editJournal.Journal(self.path, self.data)
+		self.journal.rebase()
+
+		self.history = editHistory.History()
+		self.history.applied.connect(self.journal.record)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def recover(self):
+		self.journal.flush()
+		data = AnimationData.import_data(projectFile.read_project(self.path))
+		count = editJournal.Journal(self.path, data).replay()
+		return data, count
+
+	def test_replay_edits(self):
+		walk, run = self.data.sequences
+		frames = walk.frames[1:3]
+		before = editHistory.capture(frames)
+		for frame in frames:
+			frame.translate(2, 3)
+		self.history.push(editHistory.EditFrames([walk], frames, before, editHistory.capture(frames)))
+		before = editHistory.capture(run.frames[1:2])
+		run.frames[1].set_duration(250)
+		self.history.push(editHistory.EditFrames([run], run.frames[1:2], before, editHistory.capture(run.frames[1:2])))
+
+		self.history.apply(editHistory.RemoveFrames(run, [run.frames[0], run.frames[2]]))
+		self.history.apply(editHistory.EditSequence(walk, (walk.name, walk.speed), ("stroll", 4)))
+		frame = AnimationFrame(1, 2, 3, 4)
+		walk.add_frames([frame])
+		self.history.push(editHistory.AddFrames(walk, [frame]))
+		self.history.undo()
+		self.history.undo()
+		self.history.redo()
+
+		data, count = self.recover()
+		self.assertEqual(count, 8)
+		self.assertEqual(exported(data), exported(self.data))
+		self.assertEqual(data.sequences[1].frames[0].duration(), 250)
+
+	def test_replay_sequences(self):
+		walk, run = self.data.sequences
+		self.history.apply(editHistory.RemoveSequence(self.data, walk))
+		sequence = self.data.new_sequence("jump", frames=[AnimationFrame(0, 16, 8, 8)])
+		self.history.push(editHistory.AddSequence(self.data, sequence))
+
+		data, count = self.recover()
+		self.assertEqual(count, 2)
+		self.assertEqual([sequence.name for sequence in data.sequences], ["run", "jump"])
+		self.assertEqual(exported(data), exported(self.data))
+
+	def test_no_ghost_selection(self):
+		# The last sequence loaded is active and selected, deleting it leaves nothing selected
+		self.history.apply(editHistory.RemoveSequence(self.data, self.data.sequences[1]))
+		self.assertEqual(list(self.data.selected), [])
+
+		data, _ = self.recover()
+		self.assertEqual(list(data.selected), [])
+		self.assertIsNone(data.active_sequence)
+
+	def test_torn_record_is_dropped(self):
+		self.history.apply(editHistory.RemoveFrames(self.data.sequences[0], [self.data.sequences[0].frames[0]]))
+		self.journal.flush()
+		with open(self.journal.path, 'ab') as outfile:
+			outfile.write(editJournal.RECORD.pack(editJournal.REMOVE_SEQUENCE, 4) + b'\x00')
+
+		data, count = self.recover()
+		self.assertEqual(count, 1)
+		self.assertEqual(exported(data), exported(self.data))
+		self.assertEqual(os.path.getsize(self.journal.path), self.journal.size())
+
+	def test_other_save_is_ignored(self):
+		self.history.apply(editHistory.RemoveSequence(self.data, self.data.sequences[0]))
+		self.journal.flush()
+		projectFile.write_project(make_data().export_data(), self.path + ".tmp")
+		os.replace(self.path + ".tmp", self.path)
+		os.utime(self.path, ns=(0, 0))
+
+		data, count = self.recover()
+		self.assertIsNone(count)
+		self.assertEqual(len(data.sequences), 2)
+
+	def test_rebase_keeps_records_after_snapshot(self):
+		self.history.apply(editHistory.RemoveFrames(self.data.sequences[0], [self.data.sequences[0].frames[0]]))
+		self.journal.mark_snapshot()
+		snapshot = self.data.export_data()
+		self.history.apply(editHistory.RemoveFrames(self.data.sequences[1], [self.data.sequences[1].frames[0]]))
+
+		projectFile.write_project(snapshot, self.path)
+		self.journal.rebase()
+
+		data, count = self.recover()
+		self.assertEqual(count, 1)
+		self.assertEqual(exported(data), exported(self.data))
+
+	def test_file_started_by_first_edit(self):
+		path = os.path.join(self.directory.name, "new.json")
+		data = make_data()
+		journal = editJournal.Journal(path, data)
+		journal.record(editHistory.RemoveSequence(data, data.sequences[0]))
+
+		# Never saved, the records wait for the save
+		journal.flush()
+		self.assertFalse(os.path.exists(journal.path))
+
+		projectFile.write_project(make_data().export_data(), path)
+		self.assertEqual(editJournal.Journal(path, data).replay(), None)
+		self.assertFalse(os.path.exists(journal.path))
+		journal.flush()
+		self.assertEqual(editJournal.Journal(path, make_data()).replay(), 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
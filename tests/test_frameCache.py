@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+
+from animationCore import AnimationFrame
+import frameCache
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_sheet():
+	""" 64 x 16 pixels, a column of colour per 16 pixels """
+	image = QtGui.QImage(64, 16, QtGui.QImage.Format_ARGB32_Premultiplied)
+	for i, colour in enumerate((0xffff0000, 0xff00ff00, 0xff0000ff, 0xffffffff)):
+		for x in range(i * 16, i * 16 + 16):
+			for y in range(16):
+				image.setPixel(x, y, colour)
+	return image
+
+
+class FrameCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.cache = frameCache.FrameCache()
+		self.cache.set_image(make_sheet())
+		self.frames = [AnimationFrame(i * 16, 0, 16, 16) for i in range(4)]
+
+	def tearDown(self):
+		self.cache.stop()
+
+	def fill(self, frames):
+		self.cache.fill(frames)
+		self.cache.renderer.wait()
+		app.processEvents()
+
+	def test_render_frame(self):
+		sprite = frameCache.render_frame(make_sheet(), (16, 0, 16, 8, 0, 0), 2)
+		self.assertEqual((sprite.width(), sprite.height()), (32, 16))
+		self.assertEqual(sprite.pixel(31, 15), 0xff00ff00)
+
+	def test_fill_then_hit(self):
+		self.fill(self.frames)
+		self.assertEqual(self.cache.stats()["frames"], 4)
+		self.assertEqual(self.cache.stats()["bytes"], 4 * 16 * 16 * 4)
+
+		pixmap = self.cache.get(self.frames[2])
+		self.assertIsInstance(pixmap, QtGui.QPixmap)
+		self.assertEqual(pixmap.toImage().pixel(0, 0), 0xff0000ff)
+		self.assertEqual((self.cache.hits, self.cache.misses), (1, 0))
+
+	def test_altered_frame_rendered_again(self):
+		frame = self.frames[0]
+		self.cache.get(frame)
+		frame.set_position(48, 0)
+		pixmap = self.cache.get(frame)
+		self.assertEqual(pixmap.toImage().pixel(0, 0), 0xffffffff)
+		self.assertEqual(self.cache.misses, 2)
+		self.assertEqual(self.cache.stats()["frames"], 1)
+
+	def test_stale_render_dropped(self):
+		frame = self.frames[0]
+		self.cache.fill([frame])
+		self.cache.renderer.wait()
+		# Moved while it was rendered, the result no longer fits the frame
+		frame.set_position(16, 0)
+		app.processEvents()
+		self.assertEqual(self.cache.stats()["frames"], 0)
+
+	def test_budget(self):
+		self.cache.budget = 2 * 16 * 16 * 4
+		self.fill(self.frames)
+		self.assertEqual(self.cache.stats()["frames"], 2)
+
+		# Drawing the frames that didn't fit evicts the least recently used
+		for frame in self.frames:
+			self.cache.get(frame)
+		self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+		self.assertLessEqual(self.cache.stats()["bytes"], self.cache.budget)
+
+		self.cache.get(self.frames[3])
+		self.cache.get(self.frames[0])
+		self.assertEqual((self.cache.hits, self.cache.misses), (3, 3))
+
+	def test_discard(self):
+		self.fill(self.frames)
+		self.cache.discard(self.frames[1])
+		self.cache.discard(self.frames[1])
+		self.assertEqual(self.cache.stats()["frames"], 3)
+		self.assertEqual(self.cache.stats()["bytes"], 3 * 16 * 16 * 4)
+
+	def test_scale_clears(self):
+		self.fill(self.frames)
+		self.cache.set_scale(1)
+		self.assertEqual(self.cache.stats()["frames"], 4)
+
+		self.cache.set_scale(0.5)
+		self.assertEqual(self.cache.stats()["frames"], 0)
+		pixmap = self.cache.get(self.frames[0])
+		self.assertEqual((pixmap.width(), pixmap.height()), (8, 8))
+
+	def test_no_image(self):
+		cache = frameCache.FrameCache()
+		cache.fill(self.frames)
+		self.assertIsNone(cache.get(self.frames[0]))
+		self.assertFalse(cache.renderer.isRunning())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from animationCore import AnimationFrame, AnimationSequence
+from frameTable import FrameTable
+
+
+def table_of(rows):
+	table = FrameTable()
+	table.extend(list(zip(*rows)))
+	return table
+
+
+class FrameTableTest(unittest.TestCase):
+
+	def test_extend(self):
+		table = FrameTable()
+		added = table.extend([(1, 2), (3, 4), (5, 6), (7, 8), (9, 10), (11, 12)])
+		self.assertEqual(added, range(0, 2))
+		self.assertEqual(list(table.rows()), [(1, 3, 5, 7, 9, 11), (2, 4, 6, 8, 10, 12)])
+		self.assertEqual(table.handles, [None, None])
+
+		self.assertEqual(table.extend([(0,)] * 6), range(2, 3))
+		self.assertEqual(table.row(2), (0,) * 6)
+
+	def test_extend_uneven_columns(self):
+		with self.assertRaises(ValueError):
+			FrameTable().extend([(1, 2), (3,), (5, 6), (7, 8), (9, 10), (11, 12)])
+
+	def test_insert_remove(self):
+		table = table_of([(0, 0, 1, 1, 0, 0), (1, 0, 1, 1, 0, 0)])
+		table.insert(1, "middle", (5, 5, 2, 2, 1, 1))
+		self.assertEqual(len(table), 3)
+		self.assertEqual(table.row(1), (5, 5, 2, 2, 1, 1))
+		self.assertEqual(table.handles[1], "middle")
+
+		self.assertEqual(table.remove(0), (0, 0, 1, 1, 0, 0))
+		self.assertEqual(list(table.rows()), [(5, 5, 2, 2, 1, 1), (1, 0, 1, 1, 0, 0)])
+		self.assertEqual(table.handles, ["middle", None])
+
+	def test_translate(self):
+		table = table_of([(0, 0, 1, 1, 3, 4), (10, 20, 1, 1, 0, 0), (-5, 7, 1, 1, 0, 0)])
+		table.translate(2, -1)
+		self.assertEqual([row[:2] for row in table.rows()], [(2, -1), (12, 19), (-3, 6)])
+
+		table.translate(1, 1, [1])
+		self.assertEqual([row[:2] for row in table.rows()], [(2, -1), (13, 20), (-3, 6)])
+		# Sizes and shifts stay put
+		self.assertEqual(table.row(0)[2:], (1, 1, 3, 4))
+
+	def test_bounds(self):
+		self.assertIsNone(FrameTable().bounds())
+
+		table = table_of([(0, 0, 4, 4, 0, 0), (10, -2, 3, 5, 0, 0)])
+		self.assertEqual(table.bounds(), (0, -2, 13, 4))
+
+		# A negative size reaches back past its position
+		table = table_of([(10, 10, -4, -6, 0, 0)])
+		self.assertEqual(table.bounds(), (6, 4, 10, 10))
+
+
+class FrameHandleTest(unittest.TestCase):
+	""" Frames view rows of their sequence's table and follow them as rows come and go """
+
+	def setUp(self):
+		self.sequence = AnimationSequence("walk")
+		self.frames = [AnimationFrame(i * 10, 0, 8, 8) for i in range(4)]
+		self.sequence.add_frames(self.frames)
+
+	def test_frames_view_table(self):
+		self.assertIs(self.sequence.table.handles, self.sequence.frames)
+		self.frames[2].set_values((1, 2, 3, 4, 5, 6))
+		self.assertEqual(self.sequence.table.row(2), (1, 2, 3, 4, 5, 6))
+
+	def test_add_columns(self):
+		frames = self.sequence.add_columns([(100, 110), (0, 0), (8, 8), (8, 8), (0, 0), (0, 0)])
+		self.assertEqual([frame.x() for frame in frames], [100, 110])
+		self.assertEqual(self.sequence.frames[-2:], frames)
+
+	def test_remove_keeps_values(self):
+		self.sequence.remove_frames([self.frames[0], self.frames[2]])
+		self.assertEqual(self.sequence.frames, [self.frames[1], self.frames[3]])
+		self.assertEqual([frame.x() for frame in self.sequence.frames], [10, 30])
+		self.assertEqual([self.sequence.frame_index(frame) for frame in self.sequence.frames], [0, 1])
+
+		# Removed frames hold on to their values
+		self.assertEqual(self.frames[2].values(), (20, 0, 8, 8, 0, 0))
+		self.sequence.insert_frames([(0, self.frames[0]), (2, self.frames[2])])
+		self.assertEqual([frame.x() for frame in self.sequence.frames], [0, 10, 20, 30])
+		self.assertEqual(self.sequence.frames, self.frames)
+
+	def test_translate_some(self):
+		self.sequence.translate_frames(5, 5, [self.frames[1]])
+		self.assertEqual([frame.values()[:2] for frame in self.frames], [(0, 0), (15, 5), (20, 0), (30, 0)])
+		self.assertEqual(self.sequence.bounds(), (0, 0, 38, 13))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+
+from imageLoader import ImageLoader, PREVIEW_SIZE
+from imageStore import ImageStore
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class ImageLoaderTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.loader = ImageLoader()
+		self.signals = []
+		self.loader.preview.connect(lambda path, image, size: self.signals.append(("preview", path, image, size)))
+		self.loader.progress.connect(lambda path, percent: self.signals.append(("progress", path, percent)))
+		self.loader.loaded.connect(lambda path, image: self.signals.append(("loaded", path, image)))
+		self.loader.failed.connect(lambda path, message: self.signals.append(("failed", path, message)))
+		self.loader.cancelled.connect(lambda path: self.signals.append(("cancelled", path)))
+
+	def tearDown(self):
+		self.loader.wait()
+		self.directory.cleanup()
+
+	def image_file(self, name, width, height, fmt=None):
+		image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+		image.fill(0xff336699)
+		path = os.path.join(self.directory.name, name)
+		self.assertTrue(image.save(path, fmt))
+		return path
+
+	def load(self, path):
+		""" Loads path on the worker thread and delivers its signals """
+		self.loader.load(path)
+		self.loader.wait()
+		app.processEvents()
+		return [signal[0] for signal in self.signals]
+
+	def test_load(self):
+		path = self.image_file("sheet.png", 64, 32)
+		kinds = self.load(path)
+		self.assertEqual(kinds[-1], "loaded")
+		self.assertNotIn("preview", kinds)
+
+		_, loaded_path, image = self.signals[-1]
+		self.assertEqual(loaded_path, path)
+		self.assertEqual(image.size().width(), 64)
+		self.assertEqual(image.format(), ImageStore.IMAGE_FORMAT)
+
+		# The reader goes back over the header while working out the format, progress can run back
+		percents = [signal[2] for signal in self.signals if signal[0] == "progress"]
+		self.assertTrue(percents)
+		self.assertTrue(all(0 <= percent <= 100 for percent in percents))
+		self.assertTrue(all(a != b for a, b in zip(percents, percents[1:])))
+
+	def test_preview(self):
+		path = self.image_file("sheet.jpg", PREVIEW_SIZE.width() * 2, 64, "JPG")
+		kinds = self.load(path)
+		self.assertEqual(kinds[-1], "loaded")
+		self.assertLess(kinds.index("preview"), kinds.index("loaded"))
+
+		_, _, preview, size = self.signals[kinds.index("preview")]
+		self.assertEqual((size.width(), size.height()), (PREVIEW_SIZE.width() * 2, 64))
+		self.assertEqual(preview.width(), PREVIEW_SIZE.width())
+
+	def test_missing_file(self):
+		path = os.path.join(self.directory.name, "missing.png")
+		self.assertEqual(self.load(path), ["failed"])
+		self.assertEqual(self.signals[0][1], path)
+
+	def test_not_an_image(self):
+		path = os.path.join(self.directory.name, "notes.png")
+		with open(path, 'wb') as outfile:
+			outfile.write(b'not an image' * 100)
+		self.assertEqual(self.load(path)[-1], "failed")
+
+	def test_cancelled(self):
+		self.loader.path = self.image_file("sheet.png", 64, 32)
+		self.loader.cancel()
+		self.loader.run()
+		self.assertEqual([signal[0] for signal in self.signals], ["cancelled"])
+
+		# The next load starts afresh
+		self.signals = []
+		self.assertEqual(self.load(self.loader.path)[-1], "loaded")
+
+
+if __name__ == '__main__':
+	unittest.main()
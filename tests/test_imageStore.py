@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+
+import imageStore
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class ImageStoreTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name, "sheet.png")
+		self.save_sheet(16, 8)
+		self.store = imageStore.ImageStore()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def save_sheet(self, width, height):
+		image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+		image.fill(0xff204060)
+		image.save(self.path)
+
+	def test_decoded_once_and_shared(self):
+		image = self.store.get(self.path)
+		self.assertEqual(image.format(), imageStore.ImageStore.IMAGE_FORMAT)
+		self.assertIs(self.store.get(os.path.join(self.directory.name, ".", "sheet.png")), image)
+		self.assertTrue(self.store.contains(self.path))
+		self.assertEqual(self.store.total_bytes(), 16 * 8 * 4)
+
+	def test_changed_file_is_decoded_again(self):
+		self.store.get(self.path)
+		self.save_sheet(32, 8)
+		stat = os.stat(self.path)
+		os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+		self.assertFalse(self.store.contains(self.path))
+		self.assertEqual(self.store.get(self.path).width(), 32)
+
+	def test_insert_and_release(self):
+		image = QtGui.QImage(4, 4, QtGui.QImage.Format_RGB32)
+		self.store.insert(self.path, image)
+		self.assertEqual(self.store.get(self.path).size(), image.size())
+
+		self.store.release(self.path)
+		self.assertFalse(self.store.contains(self.path))
+
+	def test_unreadable_file_is_not_held(self):
+		missing = os.path.join(self.directory.name, "missing.png")
+		self.assertTrue(self.store.get(missing).isNull())
+		self.assertFalse(self.store.contains(missing))
+
+
+if __name__ == '__main__':
+	unittest.main()
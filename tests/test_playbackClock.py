@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from animationCore import AnimationData, AnimationFrame
+from playbackClock import BACK_AND_FORTH, LOOP, PlaybackClock, Timeline
+
+
+class VirtualClock:
+	""" Seconds that only pass when told to """
+
+	def __init__(self):
+		self.now = 100.0
+
+	def __call__(self):
+		return self.now
+
+	def advance(self, ms):
+		self.now += ms / 1000
+
+
+class TimelineTest(unittest.TestCase):
+
+	def test_index_at(self):
+		timeline = Timeline([100, 50, 200])
+		self.assertEqual(timeline.total, 350)
+		self.assertEqual([timeline.index_at(t) for t in (0, 99.9, 100, 149, 150, 349, 350, 1000)], [0, 0, 1, 1, 2, 2, 2, 2])
+		self.assertIsNone(Timeline().index_at(0))
+
+	def test_index_before(self):
+		timeline = Timeline([100, 50, 200])
+		self.assertEqual([timeline.index_before(t) for t in (1, 100, 101, 150, 151)], [0, 0, 1, 1, 2])
+
+
+class PlaybackClockTest(unittest.TestCase):
+
+	def setUp(self):
+		self.time = VirtualClock()
+
+	def play(self, durations, repeat_mode=LOOP):
+		clock = PlaybackClock(durations, repeat_mode, clock=self.time)
+		clock.start()
+		return clock
+
+	def frames_at(self, clock, times):
+		indices = []
+		for t in times:
+			clock.seek(t)
+			indices.append(clock.index())
+		return indices
+
+	def test_loop(self):
+		clock = self.play([100] * 4)
+		self.assertEqual(self.frames_at(clock, (0, 150, 399, 400, 950)), [0, 1, 3, 0, 1])
+
+	def test_back_and_forth(self):
+		clock = self.play([100] * 4, BACK_AND_FORTH)
+		self.assertEqual(clock.period(), 600)
+		indices = self.frames_at(clock, range(0, 1200, 100))
+		self.assertEqual(indices, [0, 1, 2, 3, 2, 1] * 2)
+
+		clock.seek(450)
+		self.assertFalse(clock.going_forwards())
+		clock.seek(150)
+		self.assertTrue(clock.going_forwards())
+
+	def test_stands_still_while_stopped(self):
+		clock = self.play([100] * 4)
+		self.time.advance(250)
+		clock.stop()
+		self.time.advance(1000)
+		self.assertEqual(clock.elapsed(), 250)
+		clock.start()
+		self.time.advance(100)
+		self.assertEqual(clock.index(), 3)
+
+	def test_until_next(self):
+		clock = self.play([100, 40, 60])
+		self.time.advance(30)
+		self.assertAlmostEqual(clock.until_next(), 70)
+		self.time.advance(70)
+		self.assertAlmostEqual(clock.until_next(), 40)
+		self.assertIsNone(PlaybackClock([], clock=self.time).until_next())
+
+	def test_late_ticks_drop_frames(self):
+		clock = self.play([10] * 10)
+		self.assertEqual(clock.tick(), 0)
+		self.time.advance(10)
+		self.assertEqual(clock.tick(), 1)
+		self.time.advance(35)
+		self.assertEqual(clock.tick(), 4)
+
+		stats = clock.stats()
+		self.assertEqual((stats["shown"], stats["dropped"], stats["late"]), (2, 2, 1))
+		self.assertEqual(stats["max_late_ms"], 5)
+
+	def test_on_time_ticks(self):
+		clock = self.play([16, 17, 17] * 10)
+		for _ in range(29):
+			clock.tick()
+			self.time.advance(clock.until_next())
+		self.assertEqual(clock.stats(), {"shown": 28, "late": 0, "dropped": 0, "max_late_ms": 0})
+
+	def test_set_durations_keeps_frame(self):
+		clock = self.play([100] * 4)
+		self.time.advance(250)
+		clock.set_durations([50] * 4, clock.index())
+		self.assertEqual(clock.index(), 2)
+		self.assertEqual(clock.elapsed(), 100)
+
+	def test_set_repeat_mode_keeps_frame(self):
+		clock = self.play([100] * 4)
+		self.time.advance(350)
+		clock.set_repeat_mode(BACK_AND_FORTH)
+		self.assertEqual(clock.index(), 3)
+
+
+class FrameDurationsTest(unittest.TestCase):
+
+	def test_from_speed(self):
+		data = AnimationData("sheet.png")
+		sequence = data.new_sequence("walk", frames=[AnimationFrame(0, 0, 4, 4) for _ in range(3)])
+		sequence.speed = 8
+		self.assertEqual(sequence.frame_durations(), [125] * 3)
+		sequence.speed = 0
+		self.assertEqual(sequence.frame_durations(), [0] * 3)
+		self.assertIsNone(PlaybackClock(sequence.frame_durations()).until_next())
+
+
+if __name__ == '__main__':
+	unittest.main()
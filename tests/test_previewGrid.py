@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPoint, QSize
+
+import animationTypes
+import previewGrid
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_sequence(data, name, sizes):
+	return data.new_sequence(name, frames=[animationTypes.AnimationFrame(QPoint(0, 0), QSize(width, height))
+										   for width, height in sizes])
+
+
+class PreviewGridTest(unittest.TestCase):
+
+	def setUp(self):
+		self.data = animationTypes.AnimationData("sheet.png")
+		self.walk = make_sequence(self.data, "walk", [(32, 32), (16, 16)])
+		self.blink = make_sequence(self.data, "blink", [(8, 8)])
+
+		image = QtGui.QImage(64, 64, QtGui.QImage.Format_ARGB32)
+		image.fill(0xff808080)
+		self.grid = previewGrid.PreviewGrid()
+		self.grid.resize(400, 300)
+		self.grid.set_sequences([self.walk, self.blink], image)
+		self.data.changes.connect(self.grid.handle_changes)
+
+	def tearDown(self):
+		self.grid.frame_cache.stop()
+
+	def alter(self, sequence, frame, values):
+		frame.set_values(values)
+		sequence.update_frames([frame])
+
+	def assert_fitted(self):
+		""" The grid is laid out as a grid shown the sequences afresh would be """
+		fresh = previewGrid.PreviewGrid()
+		fresh.resize(self.grid.size())
+		fresh.set_sequences([cell.sequence for cell in self.grid.cells], self.grid.frame_cache.image)
+		self.assertEqual(self.grid.scale, fresh.scale)
+		self.assertEqual([cell.anchor for cell in self.grid.cells], [cell.anchor for cell in fresh.cells])
+		self.assertEqual([cell.rect for cell in self.grid.cells], [cell.rect for cell in fresh.cells])
+		fresh.frame_cache.stop()
+
+	def test_scale_fits_largest(self):
+		self.assertEqual(self.grid.scale, 4)
+		self.assert_fitted()
+
+	def test_frame_grows(self):
+		self.alter(self.walk, self.walk.frames[1], (0, 0, 64, 16, 0, 0))
+		self.assertEqual(self.grid.scale, 2)
+		self.assert_fitted()
+
+	def test_frame_shifted(self):
+		self.alter(self.blink, self.blink.frames[0], (0, 0, 8, 8, 3, -2))
+		self.assertEqual(self.grid.scale, 4)
+		self.assert_fitted()
+
+	def test_frames_added_and_deleted(self):
+		self.blink.add_frames([animationTypes.AnimationFrame(QPoint(0, 0), QSize(40, 40))])
+		self.assertEqual(self.grid.scale, 128 / 40)
+		self.assert_fitted()
+
+		self.blink.remove_frames([self.blink.frames[1]])
+		self.assertEqual(self.grid.scale, 4)
+		self.assert_fitted()
+
+	def test_sequence_deleted(self):
+		self.data.del_sequence(self.walk)
+		self.assertEqual([cell.sequence for cell in self.grid.cells], [self.blink])
+		self.assert_fitted()
+
+	def test_unshown_sequence_ignored(self):
+		run = make_sequence(self.data, "run", [(64, 64)])
+		self.alter(run, run.frames[0], (0, 0, 60, 60, 0, 0))
+		self.assertEqual(self.grid.scale, 4)
+
+
+if __name__ == '__main__':
+	unittest.main()
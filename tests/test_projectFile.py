@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+from animationCore import AnimationData
+import projectFile
+
+
+def frame(x, y, width, height, shift_x=0, shift_y=0, duration=0):
+	data = {"pos": (x, y), "size": (width, height), "shift": (shift_x, shift_y)}
+	if duration:
+		data["duration"] = duration
+	return data
+
+
+def normalized(data):
+	""" Tuples of the binary reader compare equal to the lists of JSON """
+	return json.loads(json.dumps(data))
+
+
+class ProjectFileTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.data = {
+			"fpath": "sheets/héros.png",
+			"sequences": [
+				{"name": "walk", "speed": 12, "frames": [frame(0, 0, 16, 16), frame(16, 0, 16, 16, -3, 7, 250)]},
+				{"name": "empty", "speed": 2.5, "frames": []},
+				{"name": "saut ✓", "speed": 0, "frames": [frame(-4, 100000, 1, 2, 5, -6)]}
+			]
+		}
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def path(self, name):
+		return os.path.join(self.directory.name, name)
+
+	def test_binary_round_trip(self):
+		path = self.path("project.spb")
+		projectFile.write_project(self.data, path)
+
+		self.assertTrue(projectFile.is_binary(path))
+		self.assertEqual(normalized(projectFile.read_project(path)), normalized(self.data))
+
+	def test_json_project(self):
+		path = self.path("project.json")
+		projectFile.write_project(self.data, path)
+
+		self.assertFalse(projectFile.is_binary(path))
+		with open(path) as infile:
+			self.assertEqual(json.load(infile), normalized(self.data))
+
+	def test_convert_both_ways(self):
+		source = self.path("project.json")
+		binary = self.path("project.spb")
+		back = self.path("back.json")
+		projectFile.write_project(self.data, source)
+
+		projectFile.convert(source, binary)
+		projectFile.convert(binary, back)
+		with open(source) as original, open(back) as converted:
+			self.assertEqual(json.load(converted), json.load(original))
+
+	def test_load_binary_matches_import(self):
+		path = self.path("project.spb")
+		projectFile.write_project(self.data, path)
+
+		loaded = projectFile.load_binary(path)
+		self.assertIsInstance(loaded, AnimationData)
+		self.assertEqual(normalized(loaded.export_data()), normalized(AnimationData.import_data(self.data).export_data()))
+		self.assertEqual([sequence.speed for sequence in loaded.sequences], [12, 2.5, 0])
+		self.assertEqual(loaded.sequences[0].frame_durations(), [1000 / 12, 250])
+
+	def test_snapshot_of_data(self):
+		animation_data = AnimationData.import_data(self.data)
+		snapshot = projectFile.Snapshot.of(animation_data)
+		self.assertEqual(snapshot.frame_count, 3)
+
+		# Later edits don't reach the snapshot
+		animation_data.sequences[0].translate_frames(1, 1)
+		path = self.path("snapshot.json")
+		projectFile.write_snapshot(snapshot, path)
+		self.assertEqual(normalized(projectFile.read_project(path)), normalized(self.data))
+
+	def test_snapshot_progress(self):
+		sequence = {"name": "long", "speed": 1,
+					"frames": [frame(i, 0, 1, 1) for i in range(projectFile.WRITE_CHUNK + 10)]}
+		snapshot = projectFile.Snapshot.from_data({"fpath": "sheet.png", "sequences": [sequence]})
+
+		for name in ("long.spb", "long.json"):
+			progress = []
+			projectFile.write_snapshot(snapshot, self.path(name), lambda done, total: progress.append((done, total)))
+			total = projectFile.WRITE_CHUNK + 10
+			self.assertEqual(progress, [(projectFile.WRITE_CHUNK, total), (total, total)])
+			self.assertEqual(len(projectFile.read_project(self.path(name))['sequences'][0]['frames']), total)
+
+	def test_failed_write_keeps_old_file(self):
+		path = self.path("project.json")
+		projectFile.write_project(self.data, path)
+		with open(path) as infile:
+			before = infile.read()
+
+		with self.assertRaises(RuntimeError):
+			with projectFile.replace_file(path) as outfile:
+				outfile.write("half written")
+				raise RuntimeError("disk full")
+
+		with open(path) as infile:
+			self.assertEqual(infile.read(), before)
+		self.assertEqual(os.listdir(self.directory.name), ["project.json"])
+
+	def test_not_binary(self):
+		path = self.path("project.spb")
+		projectFile.write_project(self.data, path)
+		with open(path, 'rb') as infile:
+			content = bytearray(infile.read())
+
+		content[:4] = b'JUNK'
+		with open(path, 'wb') as outfile:
+			outfile.write(content)
+		with self.assertRaises(ValueError):
+			projectFile.read_binary(path)
+
+	def test_version_1(self):
+		""" Frames of files written before durations were kept last 1 / speed """
+		path = self.path("old.spb")
+		with open(path, 'wb') as outfile:
+			outfile.write(projectFile.HEADER.pack(projectFile.MAGIC, 1, 0, 1, 2, 0, 9))
+			outfile.write(projectFile.SEQUENCE.pack(9, 4, 12, 0, 2))
+			outfile.write(struct.pack("<12i", 0, 0, 16, 16, 0, 0, 16, 0, 16, 16, -3, 7))
+			outfile.write(b"sheet.pngwalk")
+
+		self.assertEqual(normalized(projectFile.read_project(path)), normalized({"fpath": "sheet.png", "sequences": [
+			{"name": "walk", "speed": 12, "frames": [frame(0, 0, 16, 16), frame(16, 0, 16, 16, -3, 7)]}
+		]}))
+		loaded = projectFile.load_binary(path)
+		self.assertEqual(loaded.sequences[0].frames[1].values(), (16, 0, 16, 16, -3, 7))
+		self.assertEqual(loaded.sequences[0].frame_durations(), [1000 / 12] * 2)
+
+	def test_truncated(self):
+		path = self.path("project.spb")
+		projectFile.write_project(self.data, path)
+		with open(path, 'rb') as infile:
+			content = infile.read()
+
+		with self.assertRaises(ValueError):
+			projectFile.read_sections(content[:projectFile.HEADER.size + 10])
+		with self.assertRaises(ValueError):
+			projectFile.read_sections(content[:8])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QEventLoop, QPoint, QSize, QTimer
+
+import animationTypes
+import projectFile
+import projectSaver
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_data(frame_count):
+	data = animationTypes.AnimationData("sheet.png")
+	data.new_sequence("walk", frames=[animationTypes.AnimationFrame(QPoint(i, 0), QSize(8, 8)) for i in range(frame_count)])
+	return data
+
+
+class ProjectSaverTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.saver = projectSaver.ProjectSaver()
+		self.loop = QEventLoop()
+
+	def tearDown(self):
+		self.saver.wait()
+		self.directory.cleanup()
+
+	def wait_for(self, signal):
+		signal.connect(self.loop.quit)
+		QTimer.singleShot(5000, self.loop.quit)
+		self.loop.exec_()
+		signal.disconnect(self.loop.quit)
+
+	def test_save_again_from_saved(self):
+		# A save queued while one runs is started from the slot of saved
+		path = os.path.join(self.directory.name, "walk.json")
+		saved, restarted = [], []
+
+		def save_finished(saved_path):
+			saved.append(saved_path)
+			self.assertFalse(self.saver.isRunning())
+			if len(saved) == 1:
+				restarted.append(self.saver.save(make_data(3), path))
+
+		self.saver.saved.connect(save_finished)
+		self.assertTrue(self.saver.save(make_data(2), path))
+		self.assertFalse(self.saver.save(make_data(3), path))
+		self.wait_for(self.saver.saved)
+		if len(saved) < 2:
+			self.wait_for(self.saver.saved)
+
+		self.assertEqual(restarted, [True])
+		self.assertEqual(saved, [path, path])
+		self.assertEqual(len(projectFile.read_project(path)['sequences'][0]['frames']), 3)
+
+	def test_failed_after_finishing(self):
+		path = os.path.join(self.directory.name, "missing", "walk.json")
+		failed = []
+		self.saver.failed.connect(lambda failed_path, message: failed.append((failed_path, self.saver.isRunning())))
+
+		self.assertTrue(self.saver.save(make_data(1), path))
+		self.wait_for(self.saver.failed)
+		self.assertEqual(failed, [(path, False)])
+		self.assertIsNotNone(self.saver.error)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QModelIndex, QPoint, QSize, Qt
+
+import animationTypes
+import editHistory
+import sequenceTree
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_frames(count):
+	return [animationTypes.AnimationFrame(QPoint(i, 0), QSize(4, 4)) for i in range(count)]
+
+
+class SequenceModelTest(unittest.TestCase):
+
+	def setUp(self):
+		self.data = animationTypes.AnimationData("sheet.png")
+		self.data.new_sequence("walk", active=True, frames=make_frames(3))
+		self.data.new_sequence("run", frames=make_frames(600))
+
+		self.history = editHistory.History()
+		self.model = sequenceTree.SequenceModel()
+		self.model.set_animation_data(self.data, self.history)
+		self.data.changes.connect(self.model.handle_changes)
+
+		self.changed_rows = []
+		self.model.dataChanged.connect(lambda first, last, roles: self.changed_rows.append((first.row(), first.parent().isValid())))
+
+	def names(self):
+		return [self.model.data(self.model.index(row, 0)) for row in range(self.model.rowCount())]
+
+	def test_rename_undo_redo(self):
+		index = self.model.index(1, 0)
+		self.assertTrue(self.model.setData(index, "sprint"))
+		self.assertEqual(self.names(), ["walk", "sprint"])
+		self.assertEqual(self.history.undo_label(), "Rename sequence")
+
+		self.changed_rows.clear()
+		self.history.undo()
+		self.assertEqual(self.changed_rows, [(1, False)])
+		self.assertEqual(self.names(), ["walk", "run"])
+
+		self.history.redo()
+		self.assertEqual(self.changed_rows, [(1, False), (1, False)])
+		self.assertEqual(self.names(), ["walk", "sprint"])
+
+	def test_rename_to_taken_name(self):
+		self.assertFalse(self.model.setData(self.model.index(1, 0), "walk"))
+		self.assertEqual(self.names(), ["walk", "run"])
+		self.assertFalse(self.history.can_undo())
+
+	def test_rows_follow_sequences(self):
+		self.data.new_sequence("jump", frames=make_frames(1))
+		self.assertEqual(self.names(), ["walk", "run", "jump"])
+
+		self.data.del_sequence(self.data.sequences[0])
+		self.assertEqual(self.names(), ["run", "jump"])
+
+	def test_frame_rows_fetched_in_batches(self):
+		parent = self.model.index(1, 0)
+		self.assertEqual(self.model.rowCount(parent), 0)
+		self.assertTrue(self.model.canFetchMore(parent))
+
+		self.model.fetchMore(parent)
+		self.assertEqual(self.model.rowCount(parent), sequenceTree.SequenceModel.FETCH_BATCH)
+
+		sequence = self.data.sequences[1]
+		sequence.remove_frames(sequence.frames[10:])
+		self.assertEqual(self.model.rowCount(parent), 10)
+		self.assertFalse(self.model.canFetchMore(parent))
+
+
+if __name__ == '__main__':
+	unittest.main()
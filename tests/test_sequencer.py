@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from animationCore import AnimationData, AnimationFrame
+from sequencer import Sequencer, Step, Transition
+
+
+class VirtualClock:
+	""" Seconds that only pass when told to """
+
+	def __init__(self):
+		self.now = 50.0
+
+	def __call__(self):
+		return self.now
+
+	def advance(self, ms):
+		self.now += ms / 1000
+
+
+def make_sequences():
+	""" walk has 4 frames of 100ms, run 2 of 50ms and jump 1 of 200ms """
+	data = AnimationData("sheet.png")
+	sequences = []
+	for name, count, speed in (("walk", 4, 10), ("run", 2, 20), ("jump", 1, 5)):
+		sequence = data.new_sequence(name, frames=[AnimationFrame(i, 0, 4, 4) for i in range(count)])
+		sequence.speed = speed
+		sequences.append(sequence)
+	return sequences
+
+
+class SequencerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.walk, self.run, self.jump = make_sequences()
+		self.time = VirtualClock()
+
+	def play(self, steps, **options):
+		player = Sequencer(steps, clock=self.time, **options)
+		player.start()
+		return player
+
+	def shown_at(self, player, times):
+		shown = []
+		for t in times:
+			player.seek(t)
+			sequence, index, _, _ = player.locate(t)
+			shown.append((sequence.name, index))
+		return shown
+
+	def test_back_to_back(self):
+		player = self.play([Step(self.walk), Step(self.run, loops=2)])
+		self.assertEqual(self.shown_at(player, (0, 399, 400, 450, 500, 599)),
+						 [("walk", 0), ("walk", 3), ("run", 0), ("run", 1), ("run", 0), ("run", 1)])
+
+		# Playback ends on the last frame of the last step
+		self.assertEqual(self.shown_at(player, (600, 5000)), [("run", 1), ("run", 1)])
+		self.assertTrue(player.finished)
+		self.assertIsNone(player.until_next())
+
+	def test_loop(self):
+		player = self.play([Step(self.walk), Step(self.jump)], loop=True)
+		self.assertEqual(self.shown_at(player, (450, 600, 650, 1200)), [("jump", 0), ("walk", 0), ("walk", 0), ("walk", 0)])
+		self.assertFalse(player.finished)
+
+	def test_duration(self):
+		player = self.play([Step(self.walk, duration=250), Step(self.jump)])
+		self.assertEqual(self.shown_at(player, (249, 250)), [("walk", 2), ("jump", 0)])
+
+	def test_transitions(self):
+		steps = [Step(self.walk, transitions=[Transition("jump", lambda variables: variables.get("jumping"))]),
+				 Step(self.run, transitions=[Transition("walk")]),
+				 Step(self.jump, transitions=[Transition("walk")])]
+		player = self.play(steps)
+		self.assertEqual(self.shown_at(player, (400, 500)), [("run", 0), ("walk", 0)])
+
+		player.variables["jumping"] = True
+		self.assertEqual(self.shown_at(player, (900, 1100)), [("jump", 0), ("walk", 0)])
+
+	def test_step_names(self):
+		# Transitions find steps by name, two steps can't share one
+		with self.assertRaises(ValueError):
+			Sequencer([Step(self.walk), Step(self.walk)])
+		with self.assertRaises(ValueError):
+			Sequencer([Step(self.walk, transitions=[Transition("run")])])
+
+		player = self.play([Step(self.walk, transitions=[Transition("again")]), Step(self.walk, loops=2, name="again")])
+		self.assertEqual(player.following_steps(0), [1, 1])
+		self.assertEqual(self.shown_at(player, (400, 1199)), [("walk", 0), ("walk", 3)])
+
+	def test_seek_back_restarts(self):
+		changed = []
+		player = self.play([Step(self.walk), Step(self.run)])
+		player.step_changed.connect(changed.append)
+		player.seek(450)
+		player.seek(100)
+		self.assertEqual(changed, [1, 0])
+		self.assertEqual(player.step_index, 0)
+
+	def test_ticks_keep_time(self):
+		player = self.play([Step(self.walk), Step(self.run, loops=3)])
+		shown = []
+		while True:
+			shown.append(player.tick())
+			wait = player.until_next()
+			if wait is None:
+				break
+			self.time.advance(wait)
+
+		# The last tick comes when the last step ends and finds the last frame still on show
+		self.assertEqual([(sequence.name, index) for sequence, index in shown],
+						 [("walk", i) for i in range(4)] + [("run", i % 2) for i in range(6)] + [("run", 1)])
+		self.assertEqual(player.stats(), {"shown": 9, "late": 0, "dropped": 0, "max_late_ms": 0})
+
+	def test_late_tick_drops_frames_across_steps(self):
+		player = self.play([Step(self.walk), Step(self.run)])
+		player.tick()
+		self.time.advance(420)
+		self.assertEqual(player.tick(), (self.run, 0))
+		self.assertEqual(player.stats()["dropped"], 3)
+
+	def test_prefetch(self):
+		fetched = []
+		steps = [Step(self.walk, transitions=[Transition("jump", lambda variables: False)]), Step(self.run), Step(self.jump)]
+		self.play(steps, prefetch=fetched.append)
+		self.assertEqual(fetched, [list(self.walk.frames) + list(self.jump.frames) + list(self.run.frames)])
+
+	def test_no_time_steps_end(self):
+		self.walk.speed = 0
+		player = self.play([Step(self.walk, transitions=[Transition("walk")])])
+		player.seek(10)
+		self.assertTrue(player.finished)
+
+
+if __name__ == '__main__':
+	unittest.main()
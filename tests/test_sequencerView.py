@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import mock
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPoint, QSize
+
+import animationTypes
+import sequencer
+import sequencerView
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_sequence(data, name, sizes, speed=10):
+	sequence = data.new_sequence(name, frames=[animationTypes.AnimationFrame(QPoint(0, 0), QSize(width, height))
+											   for width, height in sizes])
+	sequence.speed = speed
+	return sequence
+
+
+def make_image():
+	image = QtGui.QImage(64, 64, QtGui.QImage.Format_ARGB32)
+	image.fill(0xff808080)
+	return image
+
+
+class SequencerViewTest(unittest.TestCase):
+
+	def setUp(self):
+		self.data = animationTypes.AnimationData("sheet.png")
+		self.walk = make_sequence(self.data, "walk", [(32, 32), (16, 16)])
+		self.jump = make_sequence(self.data, "jump", [(8, 8)])
+
+		self.view = sequencerView.SequencerView()
+		self.view.resize(128, 66) # The extent reaches a pixel below the axis
+		self.filled = [] # (scale, frames) of each fill of the frame cache
+		fill = self.view.frame_cache.fill
+		self.view.frame_cache.fill = lambda frames: (self.filled.append((self.view.scale, list(frames))), fill(frames))
+
+	def tearDown(self):
+		self.view.stop()
+		self.view.frame_cache.stop()
+
+	def steps(self):
+		return [sequencer.Step(self.walk), sequencer.Step(self.jump)]
+
+	def test_scale_set_before_prefetch(self):
+		self.view.set_steps(self.steps(), make_image())
+		self.assertEqual(self.view.scale, 2)
+		self.assertEqual([scale for scale, _ in self.filled], [2])
+		self.assertEqual(self.filled[0][1], self.walk.frames + self.jump.frames)
+
+	def test_resize_keeps_prefetched_steps(self):
+		self.view.set_steps(self.steps(), make_image())
+		self.filled = []
+		self.view.resize(32, 33)
+		self.view.fit()
+		self.assertEqual(self.view.scale, 1)
+		self.assertEqual(self.filled, [(1, self.walk.frames + self.jump.frames)])
+
+		# The same scale renders nothing again
+		self.view.fit()
+		self.assertEqual(len(self.filled), 1)
+
+
+class SequencerWindowTest(unittest.TestCase):
+
+	def setUp(self):
+		self.data = animationTypes.AnimationData("sheet.png")
+		self.walk = make_sequence(self.data, "walk", [(32, 32), (16, 16)])
+		self.jump = make_sequence(self.data, "jump", [(8, 8)])
+
+		self.window = sequencerView.SequencerWindow()
+		self.window.show_sequences(self.data, [self.walk, self.jump], make_image())
+
+	def tearDown(self):
+		self.window.done(0)
+
+	def test_frames_followed(self):
+		extent = self.window.view.extent
+		frame = self.jump.frames[0]
+		frame.set_values((0, 0, 64, 8, 0, 0))
+		self.jump.update_frames([frame])
+		self.assertNotEqual(self.window.view.extent, extent)
+		self.assertEqual(self.window.view.extent, sequencerView.steps_extent(self.window.view.sequencer.steps))
+
+	def test_speed_and_name_followed(self):
+		self.walk.edit("stroll", 20)
+		self.assertEqual(self.window.view.sequencer.step().timeline.durations, [50, 50])
+		self.assertTrue(self.window.step_label.text().startswith("stroll"))
+
+	def test_deleted_sequences_dropped(self):
+		self.data.del_sequence(self.walk)
+		self.assertEqual(self.window.sequences, [self.jump])
+		self.assertEqual([step.sequence for step in self.window.view.sequencer.steps], [self.jump])
+
+		with mock.patch.object(self.window, "reject", wraps=self.window.reject) as closed:
+			self.data.del_sequence(self.jump)
+		self.assertTrue(closed.called)
+		self.assertIsNone(self.window.animation_data)
+
+	def test_done_disconnects(self):
+		self.window.done(0)
+		self.assertIsNone(self.window.animation_data)
+		self.walk.edit("stroll", 20)
+		self.assertTrue(self.window.step_label.text().startswith("walk"))
+
+		self.window.show_sequences(self.data, [self.walk], make_image())
+		self.assertIs(self.window.animation_data, self.data)
+
+
+if __name__ == '__main__':
+	unittest.main()
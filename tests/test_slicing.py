@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+import random
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPoint, QSize
+
+import animationCore
+import animationTypes
+import frameView
+import slicing
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_sheet(width, height, seed):
+	""" A transparent sheet with random blobs of opaque pixels on it """
+	rng = random.Random(seed)
+	image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+	image.fill(0)
+	for _ in range(width * height // 60):
+		x, y = rng.randrange(width), rng.randrange(height)
+		for _ in range(rng.randrange(1, 8)):
+			image.setPixel(min(max(x, 0), width - 1), min(max(y, 0), height - 1), 0xff336699)
+			x += rng.choice((-1, 0, 1))
+			y += rng.choice((-1, 0, 1))
+	return image
+
+
+def reference_sprites(image, min_size=2):
+	""" Bounding boxes of the 8-connected components of opaque pixels, found by breadth first search """
+	width, height = image.width(), image.height()
+	opaque = [[QtGui.qAlpha(image.pixel(x, y)) != 0 for x in range(width)] for y in range(height)]
+	seen = [[False] * width for _ in range(height)]
+
+	boxes = []
+	for y in range(height):
+		for x in range(width):
+			if not opaque[y][x] or seen[y][x]:
+				continue
+			seen[y][x] = True
+			box = [x, y, x, y]
+			queue = deque([(x, y)])
+			while queue:
+				px, py = queue.popleft()
+				box = [min(box[0], px), min(box[1], py), max(box[2], px), max(box[3], py)]
+				for nx in range(px - 1, px + 2):
+					for ny in range(py - 1, py + 2):
+						if 0 <= nx < width and 0 <= ny < height and opaque[ny][nx] and not seen[ny][nx]:
+							seen[ny][nx] = True
+							queue.append((nx, ny))
+			if box[2] - box[0] + 1 >= min_size or box[3] - box[1] + 1 >= min_size:
+				boxes.append(box)
+	return boxes
+
+
+class FindSpritesTest(unittest.TestCase):
+
+	def test_matches_reference(self):
+		for seed in range(5):
+			image = make_sheet(80, 60, seed)
+			found = slicing.find_sprites(image, workers=1)
+			self.assertEqual(sorted(found), sorted(reference_sprites(image)))
+
+	def test_strips_stitch_like_one_pass(self):
+		image = make_sheet(64, 96, 7)
+		limits = slicing.PARALLEL_MIN_PIXELS, slicing.MIN_STRIP_HEIGHT
+		slicing.PARALLEL_MIN_PIXELS, slicing.MIN_STRIP_HEIGHT = 0, 8
+		try:
+			found = slicing.find_sprites(image, workers=4)
+		finally:
+			slicing.PARALLEL_MIN_PIXELS, slicing.MIN_STRIP_HEIGHT = limits
+		self.assertEqual(sorted(found), sorted(reference_sprites(image)))
+
+	def test_reading_order(self):
+		boxes = [[10, 0, 12, 4], [0, 1, 3, 3], [0, 10, 2, 12]]
+		self.assertEqual(slicing.reading_order(boxes), [[0, 1, 3, 3], [10, 0, 12, 4], [0, 10, 2, 12]])
+
+	def test_opaque_background(self):
+		image = QtGui.QImage(20, 20, QtGui.QImage.Format_RGB32)
+		image.fill(0xffffffff)
+		for x in range(5, 9):
+			image.setPixel(x, 6, 0xff000000)
+		self.assertEqual(slicing.find_sprites(image, workers=1), [[5, 6, 8, 6]])
+
+
+def reference_cells(image, cell_size, offset, spacing):
+	""" Cells of the grid with at least one opaque pixel, checked pixel by pixel """
+	cells = []
+	y = offset.y()
+	while y + cell_size.height() <= image.height():
+		x = offset.x()
+		while x + cell_size.width() <= image.width():
+			if any(QtGui.qAlpha(image.pixel(px, py))
+				   for px in range(x, x + cell_size.width()) for py in range(y, y + cell_size.height())):
+				cells.append([x, y, x + cell_size.width() - 1, y + cell_size.height() - 1])
+			x += cell_size.width() + spacing.width()
+		y += cell_size.height() + spacing.height()
+	return cells
+
+
+class GridCellsTest(unittest.TestCase):
+
+	def test_whole_cells_only(self):
+		image = make_sheet(50, 30, 1)
+		cells = slicing.grid_cells(image, QSize(16, 16), QPoint(1, 0), QSize(1, 0))
+		self.assertEqual(cells, [[1, 0, 16, 15], [18, 0, 33, 15]])
+
+	def test_skip_empty_matches_reference(self):
+		for seed in range(4):
+			image = make_sheet(70, 50, seed)
+			for size, offset, spacing in ((QSize(8, 8), QPoint(0, 0), QSize(0, 0)),
+										  (QSize(5, 7), QPoint(2, 3), QSize(2, 1))):
+				found = slicing.grid_cells(image, size, offset, spacing, skip_empty=True)
+				self.assertEqual(found, reference_cells(image, size, offset, spacing))
+
+	def test_empty_size(self):
+		self.assertEqual(slicing.grid_cells(make_sheet(10, 10, 0), QSize(0, 4)), [])
+
+
+class AutoSliceSequenceTest(unittest.TestCase):
+	""" Frames of a new active sequence are added after it is made active """
+
+	def test_frame_signal_sees_active_sequence(self):
+		data = animationCore.AnimationData("sheet.png")
+		seen = []
+		data.active_frame_changed.connect(lambda: seen.append((data.active_sequence, data.active_sequence in data.selected)))
+
+		sequence = data.new_sequence(active=True, frames=[animationCore.AnimationFrame(0, 0, 4, 4),
+														  animationCore.AnimationFrame(4, 0, 4, 4)])
+		self.assertTrue(seen)
+		self.assertEqual(seen[-1], (sequence, True))
+		self.assertIs(data.active_frame, sequence.frames[0])
+
+	def test_auto_slice_into_player(self):
+		# Used to raise inside the player's slot, which aborts the application
+		data = animationTypes.AnimationData("sheet.png")
+		player = frameView.SpriteAnimatorWidget()
+		player.load_animation_data(data)
+
+		frames = slicing.auto_slice(make_sheet(40, 40, 3), workers=1)
+		sequence = data.new_sequence(active=True, frames=frames)
+		self.assertEqual(len(sequence.frames), len(frames))
+		self.assertEqual(player.view.current_index, 0)
+
+	def test_slice_grid_into_player(self):
+		# Grid slicing an empty project makes the first sequence through the same path as auto-slice
+		data = animationTypes.AnimationData("sheet.png")
+		player = frameView.SpriteAnimatorWidget()
+		player.load_animation_data(data)
+
+		sequence = data.slice_grid(QSize(10, 10), image=make_sheet(40, 30, 2))
+		self.assertIs(data.active_sequence, sequence)
+		self.assertEqual(len(sequence.frames), 12)
+		self.assertEqual((sequence.frames[5].x(), sequence.frames[5].y()), (10, 10))
+		self.assertEqual(player.view.current_index, 0)
+
+	def test_slice_grid_without_cells(self):
+		data = animationTypes.AnimationData("sheet.png")
+		image = QtGui.QImage(20, 20, QtGui.QImage.Format_ARGB32)
+		image.fill(0)
+		self.assertIsNone(data.slice_grid(QSize(10, 10), skip_empty=True, image=image))
+		self.assertEqual(data.sequences, [])
+
+	def test_player_reset_without_sequence(self):
+		data = animationTypes.AnimationData("sheet.png")
+		player = frameView.SpriteAnimatorWidget()
+		player.load_animation_data(data)
+		player.view.reset()
+		self.assertIsNone(player.view.current_index)
+
+
+if __name__ == '__main__':
+	unittest.main()
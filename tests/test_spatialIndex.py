@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+
+from animationCore import AnimationData, AnimationFrame
+from spatialIndex import SpatialGrid
+
+
+class Item:
+	pass
+
+
+def contains(rect, x, y):
+	bx, by, bw, bh = SpatialGrid.normalize(*rect)
+	return bx <= x < bx + bw and by <= y < by + bh
+
+
+def intersects(rect, query):
+	bx, by, bw, bh = SpatialGrid.normalize(*rect)
+	x, y, w, h = SpatialGrid.normalize(*query)
+	return bx < x + w and x < bx + bw and by < y + h and y < by + bh
+
+
+class SpatialGridTest(unittest.TestCase):
+	""" Queries checked against testing every rectangle """
+
+	def setUp(self):
+		self.rng = random.Random(4)
+		self.grid = SpatialGrid(cell_size=16)
+		self.rects = {}
+
+	def random_rect(self):
+		if self.rng.random() < 0.05:
+			return self.rng.randrange(-50, 50), self.rng.randrange(-50, 50), 400, 300 # Spans too many cells
+		return (self.rng.randrange(-40, 300), self.rng.randrange(-40, 300),
+				self.rng.randrange(-30, 60), self.rng.randrange(-30, 60))
+
+	def put(self, item, rect):
+		self.grid.update(item, *rect)
+		self.rects[item] = rect
+
+	def check_queries(self):
+		for _ in range(200):
+			x, y = self.rng.randrange(-60, 360), self.rng.randrange(-60, 360)
+			expected = set(item for item, rect in self.rects.items() if contains(rect, x, y))
+			self.assertEqual(set(self.grid.query_point(x, y)), expected)
+
+			query = (x, y, self.rng.randrange(-100, 200), self.rng.randrange(-100, 200))
+			expected = set(item for item, rect in self.rects.items() if intersects(rect, query))
+			self.assertEqual(set(self.grid.query_rect(*query)), expected)
+
+	def test_queries(self):
+		for _ in range(150):
+			self.put(Item(), self.random_rect())
+		self.check_queries()
+
+	def test_updates_and_removes(self):
+		items = [Item() for _ in range(100)]
+		for item in items:
+			self.put(item, self.random_rect())
+		for item in items[:50]:
+			# Small moves stay in their cells, the others move buckets or become large items
+			x, y, w, h = self.rects[item]
+			self.put(item, (x + 1, y, w, h) if self.rng.random() < 0.5 else self.random_rect())
+		for item in items[50:70]:
+			self.grid.remove(item)
+			del self.rects[item]
+
+		self.assertEqual(len(self.grid), 80)
+		self.assertNotIn(items[60], self.grid)
+		self.check_queries()
+
+	def test_normalize(self):
+		self.assertEqual(SpatialGrid.normalize(10, 10, -4, 0), (6, 10, 4, 1))
+		self.grid.insert("frame", 10, 10, -4, 0)
+		self.assertEqual(self.grid.bounds("frame"), (6, 10, 4, 1))
+
+
+class SequenceHitTest(unittest.TestCase):
+	""" The index of a sequence follows its frames as they are edited """
+
+	def setUp(self):
+		data = AnimationData("sheet.png")
+		self.sequence = data.new_sequence("walk", frames=[AnimationFrame(x, 0, 10, 10) for x in (0, 5, 40)])
+		self.first, self.second, self.third = self.sequence.frames
+
+	def test_first_frame_wins(self):
+		self.assertIs(self.sequence.frame_at(7, 5), self.first)
+		self.assertIs(self.sequence.frame_at(12, 5), self.second)
+		self.assertIsNone(self.sequence.frame_at(30, 5))
+		self.assertEqual(set(self.sequence.frames_in(0, 0, 45, 1)), {self.first, self.second, self.third})
+
+	def test_follows_edits(self):
+		self.sequence.frame_at(0, 0)
+		self.sequence.translate_frames(100, 0, [self.first])
+		self.assertIs(self.sequence.frame_at(7, 5), self.second)
+		self.assertIs(self.sequence.frame_at(105, 5), self.first)
+
+		self.sequence.remove_frames([self.second])
+		self.assertIsNone(self.sequence.frame_at(7, 5))
+
+		frame = AnimationFrame(0, 20, 5, 5)
+		self.sequence.add_frames([frame])
+		self.assertIs(self.sequence.frame_at(2, 22), frame)
+
+		self.sequence.translate_frames(0, 50)
+		self.assertIs(self.sequence.frame_at(2, 72), frame)
+		self.assertIsNone(self.sequence.frame_at(2, 22))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+
+import projectFile
+import spriteBatch
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def run_quietly(*argv):
+	with contextlib.redirect_stdout(io.StringIO()):
+		return spriteBatch.main(["-j", "1"] + list(argv))
+
+
+class SpriteBatchTest(unittest.TestCase):
+	""" A project next to its spritesheet, which is stored relative to the project """
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		root = self.directory.name
+
+		image = QtGui.QImage(32, 16, QtGui.QImage.Format_ARGB32)
+		image.fill(0)
+		for x in range(2, 6):
+			image.setPixel(x, 3, 0xff000000)
+		image.setPixel(20, 10, 0xff000000)
+		image.setPixel(21, 11, 0xff000000)
+		image.save(os.path.join(root, "sheet.png"))
+
+		self.project = os.path.join(root, "walk.json")
+		projectFile.write_project({
+			"fpath": "sheet.png",
+			"sequences": [{"name": "walk", "speed": 8, "frames": [{"pos": (0, 0), "size": (16, 16), "shift": (0, 0)}]}]
+		}, self.project)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def read(self, path):
+		with open(path) as infile:
+			return json.load(infile)
+
+	def test_resolve_spritesheet(self):
+		data, sheet_path = spriteBatch.load_project(self.project)
+		self.assertEqual(data['fpath'], "sheet.png")
+		self.assertEqual(sheet_path, os.path.join(self.directory.name, "sheet.png"))
+
+	def test_validate_relative_sheet(self):
+		self.assertEqual(run_quietly("validate", self.project), 0)
+
+	def test_validate_durations(self):
+		data, sheet_path = spriteBatch.load_project(self.project)
+		frames = data['sequences'][0]['frames']
+		frames[0]['duration'] = 120
+		self.assertEqual(spriteBatch.validate(data, sheet_path), [])
+		frames[0]['duration'] = -1
+		self.assertEqual(spriteBatch.validate(data, sheet_path), ["sequence 'walk' frame 0 has invalid duration -1"])
+
+	def test_export_keeps_stored_path(self):
+		self.assertEqual(run_quietly("export", self.project), 0)
+		self.assertEqual(self.read(self.project)['fpath'], "sheet.png")
+
+	def test_slice_keeps_stored_path(self):
+		out = os.path.join(self.directory.name, "out")
+		self.assertEqual(run_quietly("slice", self.project, "--out", out, "--name", "found"), 0)
+
+		data = self.read(os.path.join(out, "walk.json"))
+		self.assertEqual(data['fpath'], "sheet.png")
+		self.assertEqual([sequence['name'] for sequence in data['sequences']], ["walk", "found"])
+		self.assertEqual([frame['pos'] for frame in data['sequences'][1]['frames']], [[2, 3], [20, 10]])
+
+	def test_grid_slice_keeps_stored_path(self):
+		self.assertEqual(run_quietly("slice", self.project, "--grid", "16x16", "--skip-empty"), 0)
+
+		data = self.read(self.project)
+		self.assertEqual(data['fpath'], "sheet.png")
+		self.assertEqual(len(data['sequences'][1]['frames']), 2)
+
+	def test_atlas_next_to_project(self):
+		self.assertEqual(run_quietly("atlas", self.project), 0)
+
+		self.assertEqual(self.read(self.project)['sequences'][0]['frames'][0]['pos'], [0, 0])
+		atlas = self.read(os.path.join(self.directory.name, "walk_atlas.json"))
+		self.assertEqual(atlas['atlases'], ["walk_atlas_0.png"])
+		self.assertFalse(atlas['sequences'][0]['frames'][0]['rotated'])
+
+	def test_convert_round_trip(self):
+		self.assertEqual(run_quietly("convert", self.project), 0)
+		binary = os.path.splitext(self.project)[0] + projectFile.EXTENSION
+		# Binary projects read pairs back as tuples
+		self.assertEqual(json.loads(json.dumps(projectFile.read_project(binary))), self.read(self.project))
+
+	def test_malformed_project_fails_alone(self):
+		broken = os.path.join(self.directory.name, "broken.json")
+		with open(broken, 'w') as outfile:
+			json.dump({"fpath": "sheet.png", "sequences": [{"name": "walk", "speed": 8,
+															 "frames": [{"pos": [0], "size": [16, 16], "shift": [0, 0]}]}]}, outfile)
+
+		output = io.StringIO()
+		with contextlib.redirect_stdout(output):
+			self.assertEqual(spriteBatch.main(["-j", "1", "export", self.directory.name]), 1)
+		lines = output.getvalue().splitlines()
+		self.assertTrue(any(line.startswith("FAIL") and line.endswith("broken.json") for line in lines))
+		self.assertTrue(any(line.startswith("ok") and line.endswith("walk.json") for line in lines))
+		self.assertIn("IndexError", output.getvalue())
+
+	def test_jobs_at_least_one(self):
+		with contextlib.redirect_stderr(io.StringIO()):
+			with self.assertRaises(SystemExit) as raised:
+				spriteBatch.main(["-j", "0", "stats", self.project])
+		self.assertEqual(raised.exception.code, 2)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PyQt5 import QtGui, QtWidgets
+
+import editHistory
+import editJournal
+import projectFile
+import SpriteEditor
+import spritesheetView
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class ProjectJournalTest(unittest.TestCase):
+	""" A journal is only recovered when a crash left it behind """
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		sheet = os.path.join(self.directory.name, "sheet.png")
+		image = QtGui.QImage(32, 32, QtGui.QImage.Format_ARGB32)
+		image.fill(0xff336699)
+		image.save(sheet)
+
+		self.projects = []
+		for name in ("walk", "run"):
+			path = os.path.join(self.directory.name, name + ".json")
+			projectFile.write_project({"fpath": sheet, "sequences": [
+				{"name": name, "speed": 8, "frames": [{"pos": (0, 0), "size": (16, 16), "shift": (0, 0)}]}
+			]}, path)
+			self.projects.append(path)
+
+		# Showing the spritesheet has nothing to do with the journal
+		for patcher in (mock.patch.object(SpriteEditor.MainWindow, "load_spritesheet"),
+						mock.patch.object(spritesheetView.SpritesheetViewer, "reset_spritesheet")):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+		self.window = SpriteEditor.MainWindow()
+
+	def tearDown(self):
+		self.window.shut_down()
+		self.window.image_loader.wait()
+		self.directory.cleanup()
+
+	def open(self, path, answer=QtWidgets.QMessageBox.No):
+		with mock.patch.object(QtWidgets.QFileDialog, "getOpenFileName", return_value=(path, "")), \
+				mock.patch.object(QtWidgets.QMessageBox, "exec_", return_value=answer) as asked:
+			self.window.open_spritesheet_sequence_file()
+		return asked.called
+
+	def edit(self):
+		sequence = self.window.animation_data.sequences[0]
+		self.window.history.apply(editHistory.EditSequence(sequence, (sequence.name, sequence.speed), (sequence.name, 3)))
+		self.window.unsaved_changes = True
+		self.window.write_journal()
+
+	def journal_exists(self, path):
+		return os.path.exists(editJournal.journal_path(path))
+
+	def test_open_makes_no_journal(self):
+		self.open(self.projects[0])
+		self.assertIsNotNone(self.window.journal)
+		self.assertFalse(self.window.unsaved_changes)
+		self.assertFalse(self.journal_exists(self.projects[0]))
+
+		self.edit()
+		self.assertTrue(self.journal_exists(self.projects[0]))
+
+	def test_switching_discards_journal(self):
+		self.open(self.projects[0])
+		self.edit()
+
+		self.assertTrue(self.open(self.projects[1], QtWidgets.QMessageBox.No))
+		self.assertFalse(self.journal_exists(self.projects[0]))
+
+		# Edits thrown away aren't brought back as if the editor had crashed
+		self.assertFalse(self.open(self.projects[0]))
+		self.assertEqual(self.window.animation_data.sequences[0].speed, 8)
+
+	def test_switching_can_save(self):
+		self.open(self.projects[0])
+		self.edit()
+
+		self.open(self.projects[1], QtWidgets.QMessageBox.Yes)
+		self.assertEqual(self.window.save_location, self.projects[1])
+		self.assertFalse(self.journal_exists(self.projects[0]))
+		self.assertEqual(projectFile.read_project(self.projects[0])['sequences'][0]['speed'], 3)
+
+	def test_cancel_keeps_project(self):
+		self.open(self.projects[0])
+		self.edit()
+		data = self.window.animation_data
+
+		self.open(self.projects[1], QtWidgets.QMessageBox.Cancel)
+		self.assertIs(self.window.animation_data, data)
+		self.assertTrue(self.journal_exists(self.projects[0]))
+
+	def test_crash_is_recovered(self):
+		self.open(self.projects[0])
+		self.edit()
+		# A crash leaves the journal behind, a new window picks it up
+		self.window.journal = None
+		self.window.shut_down()
+		self.window = SpriteEditor.MainWindow()
+
+		self.open(self.projects[0])
+		self.assertEqual(self.window.animation_data.sequences[0].speed, 3)
+		self.assertTrue(self.window.unsaved_changes)
+
+
+if __name__ == '__main__':
+	unittest.main()
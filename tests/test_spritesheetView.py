@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPoint, QRect, QSize
+
+import animationTypes
+import spritesheetView
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_viewer(frame_count=30):
+	""" A viewer at 2x zoom looking at part of a row of frames, set up without going through the zoom setter """
+	data = animationTypes.AnimationData("sheet.png")
+	data.new_sequence("walk", active=True, frames=[animationTypes.AnimationFrame(QPoint(i * 20, 10), QSize(16, 16))
+												   for i in range(frame_count)])
+	sequence = data.active_sequence
+	sequence.selected = sequence.frames[3:6]
+	sequence.active_frame = sequence.frames[4]
+
+	image = QtGui.QImage(frame_count * 20, 100, QtGui.QImage.Format_ARGB32)
+	image.fill(0xff30a030)
+
+	viewer = spritesheetView.SpritesheetViewer()
+	viewer.resize(300, 200)
+	viewer.animation_data = data
+	viewer.spritesheet_image = image
+	viewer.tile_cache.set_image(image)
+	viewer._scale = 2
+	viewer.camera = QPoint(50, 0)
+	viewer.mode = spritesheetView.ViewerMode.ALTER_SELECTION
+	data.changes.connect(viewer.handle_changes)
+	return viewer
+
+
+def overlay(viewer):
+	viewer.get_sheet_layer()
+	return viewer.get_overlay_layer().toImage()
+
+
+class OverlayTest(unittest.TestCase):
+
+	def setUp(self):
+		self.viewer = make_viewer()
+
+	def full_overlay(self):
+		self.viewer.invalidate_overlay()
+		return overlay(self.viewer)
+
+	def test_culling_draws_the_same(self):
+		culled = overlay(self.viewer)
+		everything = QRect(-10000, -10000, 20000, 20000)
+		self.viewer.visible_sheet_rect = lambda margin=0: everything
+		self.assertEqual(self.full_overlay(), culled)
+
+	def test_only_visible_frames_drawn(self):
+		sequence = self.viewer.animation_data.active_sequence
+		visible = sequence.frames_in_rect(self.viewer.visible_sheet_rect(self.viewer.LABEL_MARGIN))
+		self.assertEqual([sequence.frame_index(frame) for frame in sorted(visible, key=sequence.frame_index)],
+						 list(range(2, 11)))
+
+	def test_altered_frames_redraw_in_place(self):
+		overlay(self.viewer)
+		layer = self.viewer.overlay_layer
+		sequence = self.viewer.animation_data.active_sequence
+		frame = sequence.frames[4]
+		frame.set_values((frame.x() + 3, frame.y() + 5) + frame.values()[2:])
+		sequence.update_frames([frame])
+
+		self.assertIs(self.viewer.overlay_layer, layer)
+		self.assertFalse(self.viewer.overlay_dirty.isEmpty())
+		partial = overlay(self.viewer)
+		self.assertIs(self.viewer.overlay_layer, layer)
+		self.assertEqual(partial, self.full_overlay())
+
+	def test_other_changes_redraw_everything(self):
+		overlay(self.viewer)
+		sequence = self.viewer.animation_data.active_sequence
+		sequence.edit("stroll", 12)
+		self.assertIsNotNone(self.viewer.overlay_layer)
+
+		sequence.remove_frames([sequence.frames[5]])
+		self.assertIsNone(self.viewer.overlay_layer)
+
+	def test_sheet_layer_kept_until_camera_moves(self):
+		self.viewer.get_sheet_layer()
+		layer = self.viewer.sheet_layer
+		self.viewer.get_sheet_layer()
+		self.assertIs(self.viewer.sheet_layer, layer)
+
+		self.viewer.camera = QPoint(60, 0)
+		self.viewer.get_sheet_layer()
+		self.assertIsNot(self.viewer.sheet_layer, layer)
+
+
+if __name__ == '__main__':
+	unittest.main()
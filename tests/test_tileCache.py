@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import QPoint, QRect, Qt
+
+import tileCache
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def noise_sheet(width, height, seed=0):
+	rng = random.Random(seed)
+	image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+	for y in range(height):
+		for x in range(0, width, 7):
+			color = 0xff000000 | rng.getrandbits(24)
+			for dx in range(min(7, width - x)):
+				image.setPixel(x + dx, y, color)
+	return image
+
+
+class TileCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.image = noise_sheet(300, 200)
+		self.cache = tileCache.TileCache(self.image)
+
+	def test_visible_tiles(self):
+		self.assertEqual(list(self.cache.visible_tiles(QRect(100, 100, 60, 20))), [(0, 0), (1, 0)])
+		self.assertEqual(len(list(self.cache.visible_tiles(QRect(-50, -50, 1000, 1000)))), 6)
+		self.assertEqual(list(self.cache.visible_tiles(QRect(400, 0, 10, 10))), [])
+
+	def test_tiles_meet_without_gaps(self):
+		for scale in (0.3, 1, 1.7, 3):
+			width = sum(self.cache.tile(scale, col, 0).width() for col in range(3))
+			height = sum(self.cache.tile(scale, 0, row).height() for row in range(2))
+			self.assertEqual((width, height), (int(300 * scale), int(200 * scale)))
+
+	def test_draw_matches_scaled_sheet(self):
+		scale = 2
+		camera = QPoint(50, 20)
+		view = QtGui.QImage(240, 160, QtGui.QImage.Format_ARGB32)
+		view.fill(0)
+		qp = QtGui.QPainter(view)
+		self.cache.draw(qp, camera, scale, view.rect())
+		qp.end()
+
+		expected = self.image.copy(QRect(camera, view.size() / scale)).scaled(view.size(), Qt.IgnoreAspectRatio,
+																			   Qt.FastTransformation)
+		self.assertEqual(view, expected.convertToFormat(view.format()))
+
+	def test_lru_budget(self):
+		tile_bytes = tileCache.TileCache.pixmap_bytes(self.cache.tile(1, 0, 0))
+		self.cache = tileCache.TileCache(self.image, budget=2 * tile_bytes)
+		self.cache.tile(1, 0, 0)
+		self.cache.tile(1, 1, 0)
+		self.cache.tile(1, 0, 0)
+		self.cache.tile(1, 0, 1) # Evicts (1, 0), the least recently used
+
+		self.cache.tile(1, 0, 0)
+		stats = self.cache.stats()
+		self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 3, 1))
+		self.cache.tile(1, 1, 0)
+		self.assertEqual(self.cache.stats()["misses"], 4)
+		self.assertLessEqual(self.cache.stats()["bytes"], 2 * tile_bytes)
+
+	def test_new_image_clears(self):
+		self.cache.tile(1, 0, 0)
+		self.cache.set_image(noise_sheet(10, 10, 1))
+		self.assertEqual(self.cache.stats()["tiles"], 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import QRect, Qt
+from collections import OrderedDict
+import math
+
+
+class TileCache:
+	""" Splits a spritesheet into fixed size tiles and keeps scaled copies of them.
+		Tiles are scaled once per zoom level and held in an LRU cache with a memory budget,
+		so painting only has to blit the tiles that are visible. """
+
+	TILE_SIZE = 128 # Spritesheet pixels per tile side
+	DEFAULT_BUDGET = 64 * 1024 * 1024 # Bytes
+
+	def __init__(self, image=None, budget=DEFAULT_BUDGET):
+		self.image = None
+		self.budget = budget
+
+		self._tiles = OrderedDict()
+		self._bytes = 0
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+		self.set_image(image)
+
+	def set_image(self, image):
+		self.image = image
+		self.clear()
+
+	def clear(self):
+		self._tiles.clear()
+		self._bytes = 0
+
+	def reset_stats(self):
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def stats(self):
+		return {
+			"tiles": len(self._tiles),
+			"bytes": self._bytes,
+			"budget": self.budget,
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions
+		}
+
+	@staticmethod
+	def scaled_edge(scale, sheet_px):
+		""" Returns the view offset of a sheet pixel edge, relative to the sheet origin """
+		return math.floor(sheet_px * scale)
+
+	def tile(self, scale, col, row):
+		""" Returns the tile at col, row scaled to scale, building it if it isn't cached """
+		key = (scale, col, row)
+		pixmap = self._tiles.get(key)
+		if pixmap is not None:
+			self.hits += 1
+			self._tiles.move_to_end(key)
+			return pixmap
+
+		self.misses += 1
+
+		source = QRect(col * self.TILE_SIZE, row * self.TILE_SIZE, self.TILE_SIZE, self.TILE_SIZE)
+		source = source.intersected(self.image.rect())
+
+		# Scaled size is taken from the tile edges so neighbouring tiles meet without gaps
+		width = self.scaled_edge(scale, source.left() + source.width()) - self.scaled_edge(scale, source.left())
+		height = self.scaled_edge(scale, source.top() + source.height()) - self.scaled_edge(scale, source.top())
+
+		scaled = self.image.copy(source).scaled(width, height, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+		pixmap = QtGui.QPixmap.fromImage(scaled)
+
+		self._tiles[key] = pixmap
+		self._bytes += self.pixmap_bytes(pixmap)
+		self.evict()
+
+		return pixmap
+
+	def evict(self):
+		# Always keep the most recent tile, even if it's over budget by itself
+		while self._bytes > self.budget and len(self._tiles) > 1:
+			_, pixmap = self._tiles.popitem(last=False)
+			self._bytes -= self.pixmap_bytes(pixmap)
+			self.evictions += 1
+
+	@staticmethod
+	def pixmap_bytes(pixmap):
+		return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+	def visible_tiles(self, sheet_rect):
+		""" Yields (col, row) of every tile that intersects sheet_rect """
+		sheet_rect = sheet_rect.intersected(self.image.rect())
+		if sheet_rect.isEmpty():
+			return
+
+		for row in range(sheet_rect.top() // self.TILE_SIZE, sheet_rect.bottom() // self.TILE_SIZE + 1):
+			for col in range(sheet_rect.left() // self.TILE_SIZE, sheet_rect.right() // self.TILE_SIZE + 1):
+				yield col, row
+
+	def draw(self, qp, camera, scale, view_rect):
+		""" Blits the visible tiles of the spritesheet.
+			camera is the top left of the view in sheet coordinates, view_rect is the area to paint """
+		if self.image is None or self.image.isNull():
+			return
+
+		# Sheet area covered by view_rect
+		sheet_rect = QRect(math.floor(view_rect.left() / scale) + camera.x(),
+						   math.floor(view_rect.top() / scale) + camera.y(),
+						   math.ceil(view_rect.width() / scale) + 1,
+						   math.ceil(view_rect.height() / scale) + 1)
+
+		origin_x = math.floor(camera.x() * scale)
+		origin_y = math.floor(camera.y() * scale)
+
+		for col, row in self.visible_tiles(sheet_rect):
+			qp.drawPixmap(self.scaled_edge(scale, col * self.TILE_SIZE) - origin_x,
+						  self.scaled_edge(scale, row * self.TILE_SIZE) - origin_y,
+						  self.tile(scale, col, row))